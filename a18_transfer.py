@@ -0,0 +1,221 @@
+"""
+Motor de transferência de arquivos A18 por BLE (upload de sons customizados).
+
+O esboço antigo parava num NotImplementedError, com blocos fixos de 20 bytes.
+Para cada bloco, uma escrita com resposta seria uma ida e volta inteira pelo
+link. Agora:
+
+  - MTU negociado: cada pacote leva MTU - 3 bytes (ATT), não 20;
+  - write-without-response: vários pacotes por intervalo de conexão;
+  - controle de fluxo por janela: depois de `window` pacotes sem resposta
+    vem uma sincronização (`sync`), uma escrita com resposta que serve de
+    barreira. Ela confirma até onde o periférico recebeu. Janela confirmada:
+    a janela cresce +1. Buraco detectado: volta ao último byte confirmado
+    (go-back-N) e a janela cai pela metade;
+  - verificação no fim: bytes recebidos + CRC32, quando o periférico informa;
+  - progresso (bytes confirmados) e vazão (bytes/s) em `info()`.
+
+O transporte é plugável. Por enquanto só existe o `SimulatedPeripheral`
+(modela MTU, buffer do controlador, tempo de ar e perda de pacotes), usado
+no modo simulado e no benchmark. O transporte do Furby real ainda falta: os
+comandos e as confirmações de arquivo do firmware não são conhecidos, e sem
+confirmação não há como saber se o arquivo chegou.
+
+`begin(size, name, offset)` retorna quantos bytes o periférico já tem (para
+retomar), `sync()` quantos bytes ele recebeu em ordem, e `end()` o total e o
+CRC32 do que recebeu. Um transporte com `slot_addressing = True` grava no
+slot para o qual foi criado e respeita o `offset` do begin; só esses servem
+para o cache de slots (sound_slots) e para retomar uploads.
+"""
+import asyncio
+import random
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+ATT_HEADER = 3  # opcode + handle de uma escrita ATT
+
+SCRATCH_SLOT = 0xFF  # área temporária do Furby: arquivo avulso, fora do cache de slots
+
+
+class TransferError(RuntimeError):
+    pass
+
+
+class SimulatedPeripheral:
+    """
+    Periférico BLE simulado: MTU máximo, `buffer` pacotes sem resposta antes
+    de estourar o buffer do controlador, perda aleatória `loss` e tempo de
+    ar por intervalo de conexão. Recebe em ordem; um pacote fora de ordem
+    (depois de uma perda) é descartado. Com `fail_at`, o link "cai" uma vez
+    quando o periférico já tem esse tanto de bytes (para testar a retomada).
+    Cada instância é o arquivo de um slot (ver SimulatedFurby).
+    """
+
+    slot_addressing = True
+
+    def __init__(self, max_mtu: int = 185, loss: float = 0.0, buffer: int = 16,
+                 interval: float = 0.0075, packets_per_interval: int = 4,
+                 time_scale: float = 1.0, seed: Optional[int] = None, fail_at: Optional[int] = None):
+        self.max_mtu = max_mtu
+        self.fail_at = fail_at
+        self.loss = loss
+        self.buffer = buffer
+        self.interval = interval * time_scale
+        self.packets_per_interval = packets_per_interval
+        self.received = bytearray()
+        self.size = 0
+        self.name = ""
+        self._in_flight = 0
+        self._debt = 0.0
+        self._rng = random.Random(seed)
+        self.stats = {"packets": 0, "dropped": 0, "overflow": 0, "outOfOrder": 0, "syncs": 0}
+
+    async def negotiate_mtu(self) -> int:
+        return self.max_mtu
+
+    async def begin(self, size: int, name: str, offset: int = 0) -> int:
+        self.size, self.name = size, name
+        if offset == 0 or len(self.received) > size:
+            self.received = bytearray()
+        else:
+            del self.received[offset:]  # retoma do último byte confirmado pelo remetente
+        return len(self.received)
+
+    async def write(self, offset: int, data: bytes, response: bool = False) -> None:
+        if len(data) > self.max_mtu - ATT_HEADER:
+            raise TransferError(f"Pacote de {len(data)} bytes maior que o MTU ({self.max_mtu})")
+        if self.fail_at is not None and len(self.received) >= self.fail_at:
+            self.fail_at = None
+            raise TransferError("Link BLE perdido (simulado)")
+        self.stats["packets"] += 1
+        if response:
+            await self._spend(2 * self.interval)  # ida e volta: pedido e resposta em intervalos diferentes
+            self._in_flight = 0
+        else:
+            await self._spend(self.interval / self.packets_per_interval)
+            self._in_flight += 1
+            if self._in_flight > self.buffer:
+                self.stats["overflow"] += 1
+                return
+            if self._rng.random() < self.loss:
+                self.stats["dropped"] += 1
+                return
+        if offset != len(self.received):
+            self.stats["outOfOrder"] += 1
+            return
+        self.received += data
+
+    async def _spend(self, seconds: float) -> None:
+        """Tempo de ar acumulado e dormido em blocos de >= 2 ms (sleeps curtos demais são imprecisos)"""
+        self._debt += seconds
+        if self._debt >= 0.002:
+            started = time.monotonic()
+            await asyncio.sleep(self._debt)
+            self._debt -= time.monotonic() - started
+
+    async def sync(self, offset: int) -> int:
+        self.stats["syncs"] += 1
+        await self._spend(2 * self.interval)
+        self._in_flight = 0
+        return len(self.received)
+
+    async def end(self) -> Optional[Dict[str, Any]]:
+        return {"received": len(self.received), "crc32": zlib.crc32(bytes(self.received))}
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.size) and len(self.received) == self.size
+
+
+class A18Transfer:
+    """Upload com MTU negociado, write-without-response e janela adaptativa"""
+
+    def __init__(self, transport: Any, window: int = 8, max_window: int = 32, retries: int = 8,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.transport = transport
+        self.window = window
+        self.max_window = max_window
+        self.retries = retries
+        self.on_progress = on_progress
+        self.size = 0
+        self.start = 0
+        self.confirmed = 0
+        self.payload = 0
+        self.mtu = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stats = {"packets": 0, "bytesSent": 0, "syncs": 0, "rewinds": 0}
+        self.verified: Optional[bool] = None
+
+    async def upload(self, data: bytes, name: str = "sound.a18", start: int = 0) -> Dict[str, Any]:
+        """Envia `data` a partir de `start` (bytes já confirmados antes) e verifica no fim"""
+        self.size = len(data)
+        self.start = self.confirmed = start
+        self.started_at = time.monotonic()
+        self.mtu = await self.transport.negotiate_mtu()
+        self.payload = self.mtu - ATT_HEADER - getattr(self.transport, "packet_header", 0)
+        try:
+            await self._send(data, name)
+        finally:
+            close = getattr(self.transport, "close", None)
+            if close is not None:
+                await close()
+        return self.info()
+
+    async def _send(self, data: bytes, name: str) -> None:
+        held = await self.transport.begin(self.size, name, self.start)
+        if held is not None and held < self.start:
+            # O periférico tem menos do que achávamos: retoma de onde ele está
+            self.start = self.confirmed = held
+        stalls = 0
+        while self.confirmed < self.size:
+            sent = self.confirmed
+            for _ in range(self.window):
+                chunk = data[sent:sent + self.payload]
+                if not chunk:
+                    break
+                await self.transport.write(sent, chunk, response=False)
+                sent += len(chunk)
+                self.stats["packets"] += 1
+                self.stats["bytesSent"] += len(chunk)
+            got = await self.transport.sync(sent)
+            self.stats["syncs"] += 1
+            if got >= sent:
+                self.window = min(self.window + 1, self.max_window)
+                stalls = 0
+            else:
+                # Buraco na janela: recomeça do último byte confirmado com janela menor
+                self.window = max(self.window // 2, 1)
+                self.stats["rewinds"] += 1
+                stalls = stalls + 1 if got <= self.confirmed else 0
+                if stalls > self.retries:
+                    raise TransferError(f"Transferência parada em {got}/{self.size} bytes")
+            self.confirmed = sent if got >= sent else max(got, self.confirmed)
+            if self.on_progress:
+                self.on_progress(self.info())
+        status = await self.transport.end()
+        self.finished_at = time.monotonic()
+        if status is not None:
+            self.verified = status.get("received") == self.size and status.get("crc32") == zlib.crc32(data)
+            if not self.verified:
+                raise TransferError(f"Verificação falhou: {status} (esperado {self.size} bytes, "
+                                    f"crc32 {zlib.crc32(data)})")
+
+    def info(self) -> Dict[str, Any]:
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "size": self.size,
+            "confirmed": self.confirmed,
+            "progress": round(self.confirmed / self.size, 4) if self.size else 0.0,
+            "mtu": self.mtu,
+            "payload": self.payload,
+            "window": self.window,
+            "seconds": round(elapsed, 3),
+            "resumedFrom": self.start,
+            "bytesPerSec": round((self.confirmed - self.start) / elapsed, 1) if elapsed > 0 else None,
+            "verified": self.verified,
+            "done": self.finished_at is not None,
+            **self.stats,
+        }
@@ -0,0 +1,148 @@
+"""
+Catálogo de ações do Furby, carregado uma vez de action_catalog.json.
+
+Cada ação tem combinação (input, index, subindex, specific), categoria, peso
+e duração medida (segundos, ou null enquanto não foi medida):
+
+    {"combo": [5, 0, 0, 0], "category": "hugs", "weight": 1.0, "duration": null}
+
+O sorteio usa tabelas de alias (método de Vose), uma para o catálogo inteiro
+e uma por categoria. Cada sorteio custa O(1), qualquer que seja o tamanho da
+lista. Uma janela "sem repetição" evita tocar a mesma ação de novo logo em
+seguida.
+"""
+import json
+import random
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+Combo = Tuple[int, int, int, int]
+
+ACTION_CATALOG_PATH = Path(__file__).parent / "action_catalog.json"
+
+
+class AliasTable:
+    """Sorteio ponderado O(1) (alias de Vose)"""
+
+    def __init__(self, weights: Sequence[float]):
+        count = len(weights)
+        total = float(sum(weights))
+        if not count or total <= 0:
+            raise ValueError("Pesos devem ter soma > 0")
+        scaled = [w * count / total for w in weights]
+        self.prob = [1.0] * count
+        self.alias = list(range(count))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng: random.Random) -> int:
+        column = rng.randrange(len(self.prob))
+        return column if rng.random() < self.prob[column] else self.alias[column]
+
+
+class ActionCatalog:
+    """Ações por categoria com sorteio ponderado e janela sem repetição"""
+
+    def __init__(self, actions: List[Dict[str, Any]], no_repeat: int = 5,
+                 path: Optional[Path] = None, seed: Optional[int] = None):
+        self.path = path
+        self.no_repeat = no_repeat
+        self.actions: List[Dict[str, Any]] = []
+        self._by_combo: Dict[Combo, Dict[str, Any]] = {}
+        for entry in actions:
+            combo = tuple(int(x) for x in entry["combo"])
+            if len(combo) != 4:
+                raise ValueError(f"Combinação inválida no catálogo: {entry['combo']}")
+            if combo in self._by_combo:
+                continue
+            action = {
+                "combo": combo,
+                "category": entry.get("category") or "other",
+                "weight": float(entry.get("weight", 1.0)),
+                "duration": entry.get("duration"),
+            }
+            self.actions.append(action)
+            self._by_combo[combo] = action  # type: ignore[index]
+        pools: Dict[str, List[int]] = {}
+        for i, action in enumerate(self.actions):
+            if action["weight"] > 0:
+                pools.setdefault(action["category"], []).append(i)
+        # Por categoria: índices das ações + tabela de alias sobre os pesos delas
+        self._pools: Dict[str, Tuple[List[int], AliasTable]] = {
+            category: (members, AliasTable([self.actions[i]["weight"] for i in members]))
+            for category, members in pools.items()
+        }
+        everything = [i for members in pools.values() for i in members]
+        self._all = (everything, AliasTable([self.actions[i]["weight"] for i in everything]))
+        self._recent: Deque[Combo] = deque(maxlen=max(no_repeat, 1))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"samples": 0, "redraws": 0}
+
+    @classmethod
+    def load(cls, path: Path = ACTION_CATALOG_PATH, **kwargs: Any) -> "ActionCatalog":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("actions", []), path=path, **kwargs)
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._pools)
+
+    def get(self, combo: Sequence[int]) -> Optional[Dict[str, Any]]:
+        return self._by_combo.get(tuple(combo))  # type: ignore[arg-type]
+
+    def sample(self, category: Optional[str] = None) -> Combo:
+        """Sorteia uma ação (do catálogo ou da categoria) evitando as últimas tocadas"""
+        if category is None:
+            members, table = self._all
+        elif category in self._pools:
+            members, table = self._pools[category]
+        else:
+            raise ValueError(f"Categoria de ação desconhecida: {category}")
+        with self._lock:
+            # Numa categoria pequena a janela encolhe, para sempre sobrar opção
+            window = min(self.no_repeat, len(members) - 1)
+            if window <= 0:
+                recent: Any = ()
+            elif window >= len(self._recent):
+                recent = self._recent
+            else:
+                recent = list(self._recent)[-window:]
+            for _ in range(16):
+                combo = self.actions[members[table.draw(self._rng)]]["combo"]
+                if combo not in recent:
+                    break
+                self.stats["redraws"] += 1
+            else:
+                # Pesos muito concentrados: pega a primeira fora da janela
+                combo = next((self.actions[i]["combo"] for i in members if self.actions[i]["combo"] not in recent), combo)
+            self._recent.append(combo)
+            self.stats["samples"] += 1
+            return combo
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "file": str(self.path) if self.path else None,
+            "actions": len(self.actions),
+            "noRepeat": self.no_repeat,
+            "categories": {
+                category: {
+                    "actions": len(members),
+                    "weight": round(sum(self.actions[i]["weight"] for i in members), 3),
+                    "measured": sum(1 for i in members if self.actions[i]["duration"] is not None),
+                }
+                for category, (members, _) in self._pools.items()
+            },
+            **self.stats,
+        }
@@ -0,0 +1,115 @@
+"""
+Controle de admissão (backpressure) para os comandos que chegam pela API.
+
+Cada Furby tem uma fila de comandos com profundidade máxima e um balde de
+fichas (token bucket) que limita a taxa. Um pedido que chega com a fila cheia,
+ou sem ficha disponível, é recusado na hora (HTTP 429). A resposta diz a
+posição que ele teria na fila e quanto esperar. Assim, um cliente com
+problema ou uma criança clicando sem parar não enfileira centenas de
+comandos BLE que levariam minutos para tocar.
+"""
+import math
+import threading
+import time
+from typing import Any, Dict
+
+
+class AdmissionRejected(Exception):
+    """Pedido recusado: fila cheia ou taxa excedida"""
+
+    def __init__(self, reason: str, position: int, depth: int, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.position = position
+        self.depth = depth
+        self.retry_after = retry_after
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "error": self.reason,
+            "queuePosition": self.position,
+            "queueDepth": self.depth,
+            "retryAfter": round(self.retry_after, 3),
+        }
+
+
+class Ticket:
+    """Vaga na fila; libera ao sair do `with`"""
+
+    def __init__(self, control: "AdmissionControl", position: int):
+        self.control = control
+        self.position = position
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.control._leave()
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionControl:
+    """Fila limitada + token bucket de um dispositivo"""
+
+    def __init__(self, depth: int = 8, rate: float = 5.0, burst: float = 10.0):
+        self.depth = depth
+        self.rate = rate  # fichas por segundo (0 = sem limite de taxa)
+        self.burst = burst
+        self._tokens = burst
+        self._refilled = time.monotonic()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rejectedFull": 0, "rejectedRate": 0, "maxQueued": 0}
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def admit(self, cost: float = 1.0) -> Ticket:
+        """Reserva uma vaga (e `cost` fichas) ou levanta AdmissionRejected imediatamente"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            position = self._queued + 1
+            if self._queued >= self.depth:
+                self.stats["rejectedFull"] += 1
+                # estimativa: a fila anda no ritmo do balde
+                retry = 1.0 / self.rate if self.rate > 0 else 1.0
+                raise AdmissionRejected("Fila de comandos cheia", position, self._queued, retry)
+            if self.rate > 0 and self._tokens < cost:
+                self.stats["rejectedRate"] += 1
+                raise AdmissionRejected("Taxa de comandos excedida", position, self._queued,
+                                        (cost - self._tokens) / self.rate)
+            if self.rate > 0:
+                self._tokens -= cost
+            self._queued += 1
+            self.stats["admitted"] += 1
+            self.stats["maxQueued"] = max(self.stats["maxQueued"], self._queued)
+            return Ticket(self, position)
+
+    def _leave(self) -> None:
+        with self._lock:
+            self._queued -= 1
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "queued": self._queued,
+                "depth": self.depth,
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                **self.stats,
+            }
+
+
+def retry_after_header(rejection: AdmissionRejected) -> Dict[str, str]:
+    """Cabeçalho HTTP Retry-After (segundos inteiros, arredondado para cima)"""
+    return {"Retry-After": str(max(1, math.ceil(rejection.retry_after)))}
@@ -0,0 +1,223 @@
+"""
+Animações da antena (fades, pulsos, "respiração") renderizadas no servidor.
+
+Uma animação é uma lista de keyframes com curva de suavização:
+
+    {"keyframes": [
+        {"at": 0.0, "color": [128, 0, 128]},
+        {"at": 1.5, "color": [255, 192, 203], "easing": "ease_in_out"},
+        {"at": 3.0, "color": [128, 0, 128], "easing": "ease_in_out"}
+     ], "loop": true}
+
+A `easing` de um keyframe vale para o trecho que termina nele.
+
+O link BLE é o gargalo. Cada frame calcula a cor do instante atual, sem fila.
+Se a escrita anterior demorou, os frames perdidos são descartados, não
+acumulados. O intervalo entre frames se adapta à latência medida das escritas
+de cor (Controller.write_latency["color"]). Assim a animação ocupa no máximo
+`link_share` do tempo do link e sobra espaço para outros comandos. Frames com
+a cor igual à anterior não geram escrita (sombra de estado).
+
+Com `compensate=True` cada frame mostra a cor do instante em que a escrita vai
+chegar ao Furby (agora + latência medida), para acompanhar um relógio externo
+como o do áudio.
+
+A animação para sozinha quando um comando de prioridade maior que a dela
+passa pelo escalonador (ou está esperando a vez).
+"""
+import asyncio
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+EASINGS = {
+    "step": lambda x: 0.0 if x < 1.0 else 1.0,
+    "linear": lambda x: x,
+    "ease_in": lambda x: x * x,
+    "ease_out": lambda x: 1.0 - (1.0 - x) ** 2,
+    "ease_in_out": lambda x: 0.5 - 0.5 * math.cos(math.pi * x),
+}
+
+Color = Tuple[int, int, int]
+
+
+def _color(value: Sequence[int]) -> Color:
+    if len(value) != 3 or not all(0 <= int(c) <= 255 for c in value):
+        raise ValueError("Cor deve ser [r, g, b] com valores entre 0 e 255")
+    return int(value[0]), int(value[1]), int(value[2])
+
+
+def normalize_keyframes(keyframes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Valida e ordena os keyframes ({"at", "color", "easing"})"""
+    if not keyframes:
+        raise ValueError("Animação sem keyframes")
+    frames = []
+    for frame in keyframes:
+        easing = frame.get("easing") or "linear"
+        if easing not in EASINGS:
+            raise ValueError(f"Easing inválida: {easing} (use {', '.join(EASINGS)})")
+        at = float(frame.get("at", 0.0))
+        if at < 0:
+            raise ValueError("Offsets ('at') devem ser >= 0")
+        frames.append({"at": at, "color": _color(frame["color"]), "easing": easing})
+    return sorted(frames, key=lambda f: f["at"])
+
+
+def color_at(keyframes: List[Dict[str, Any]], t: float) -> Color:
+    """Cor interpolada no instante `t` (keyframes já normalizados)"""
+    if t <= keyframes[0]["at"]:
+        return keyframes[0]["color"]
+    for start, end in zip(keyframes, keyframes[1:]):
+        if t < end["at"]:
+            span = end["at"] - start["at"]
+            x = EASINGS[end["easing"]]((t - start["at"]) / span) if span > 0 else 1.0
+            return tuple(int(round(a + (b - a) * x)) for a, b in zip(start["color"], end["color"]))  # type: ignore[return-value]
+    return keyframes[-1]["color"]
+
+
+def preset(name: str, color: Sequence[int], period: float = 2.0, base: Sequence[int] = (0, 0, 0)) -> List[Dict[str, Any]]:
+    """Keyframes prontos: breathing (sobe e desce suave), pulse (flash e decaimento) e fade (base -> cor)"""
+    color, base = list(_color(color)), list(_color(base))
+    if period <= 0:
+        raise ValueError("'period' deve ser > 0")
+    if name == "breathing":
+        return [{"at": 0.0, "color": base}, {"at": period / 2, "color": color, "easing": "ease_in_out"},
+                {"at": period, "color": base, "easing": "ease_in_out"}]
+    if name == "pulse":
+        return [{"at": 0.0, "color": base}, {"at": period * 0.15, "color": color, "easing": "ease_out"},
+                {"at": period, "color": base, "easing": "ease_in"}]
+    if name == "fade":
+        return [{"at": 0.0, "color": base}, {"at": period, "color": color, "easing": "ease_in_out"}]
+    raise ValueError(f"Preset desconhecido: {name} (use breathing, pulse ou fade)")
+
+
+class AntennaAnimation:
+    """Renderização de uma animação de keyframes na antena de um Controller"""
+
+    def __init__(
+        self,
+        aid: str,
+        ctrl: Any,
+        keyframes: List[Dict[str, Any]],
+        loop: bool = False,
+        duration: Optional[float] = None,
+        priority: str = "random",
+        max_fps: float = 30.0,
+        link_share: float = 0.8,
+        name: Optional[str] = None,
+        compensate: bool = False,
+    ):
+        self.id = aid
+        self.ctrl = ctrl
+        self.keyframes = normalize_keyframes(keyframes)
+        self.period = self.keyframes[-1]["at"]
+        if loop and self.period <= 0:
+            raise ValueError("Animação em loop precisa de keyframes com duração > 0")
+        self.loop = loop
+        self.duration = duration  # tempo total (None: uma passada, ou infinito em loop)
+        self.priority = priority
+        self.max_fps = max(max_fps, 1.0)
+        self.link_share = min(max(link_share, 0.1), 1.0)
+        self.name = name
+        self.compensate = compensate  # renderiza adiantado pela latência da escrita (sincronia com áudio)
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.stopped_by: Optional[str] = None
+        self.frames = 0  # frames renderizados (com ou sem escrita BLE)
+        self.writes = 0
+        self.dropped = 0  # frames de max_fps descartados porque o link não comporta
+        self.started_at: Optional[float] = None
+        self.ended_at: Optional[float] = None
+        self.future: Optional[Any] = None  # concurrent.futures.Future do DEVICE_LOOP
+
+    def frame_interval(self) -> float:
+        """Intervalo entre frames: limite de FPS ou a fatia do link que a latência medida permite"""
+        latency = self.ctrl.write_latency.get("color", 0.0)
+        return max(1.0 / self.max_fps, latency / self.link_share)
+
+    def _preempted(self, served_before: int) -> bool:
+        scheduler = self.ctrl.scheduler
+        return scheduler.should_yield(self.priority) or scheduler.served_above(self.priority) > served_before
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        scheduler = self.ctrl.scheduler
+        self.state = "running"
+        self.started_at = time.time()
+        origin = loop.time()
+        slot = 1.0 / self.max_fps
+        missed = 0.0
+        try:
+            # Comandos mais prioritários atendidos a partir daqui encerram a animação
+            served = scheduler.served_above(self.priority)
+            while True:
+                if self._preempted(served):
+                    self.state, self.stopped_by = "preempted", "prioridade maior"
+                    return
+                t = loop.time() - origin
+                finished = (self.duration is not None and t >= self.duration) or (not self.loop and t >= self.period)
+                if finished:
+                    t = self.duration if self.duration is not None else self.period
+                if self.compensate:
+                    # A cor só aparece no Furby depois da escrita: renderiza o instante em que ela vai chegar
+                    t = min(t + self.ctrl.write_latency.get("color", 0.0), self.duration or math.inf)
+                position = t % self.period if self.loop and self.period > 0 else t
+                frame_started = loop.time()
+                if await self.ctrl.set_color(*color_at(self.keyframes, position), priority=self.priority):
+                    self.writes += 1
+                self.frames += 1
+                if finished:
+                    self.state = "done"
+                    return
+                # Próximo frame no relógio, sem fila: o que passou durante a escrita é descartado
+                interval = self.frame_interval()
+                elapsed = loop.time() - frame_started
+                missed += max(interval, elapsed) / slot - 1.0
+                self.dropped = int(missed + 1e-9)
+                await asyncio.sleep(max(interval - elapsed, 0.0))
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state, self.error = "error", str(e)
+        finally:
+            self.ended_at = time.time()
+
+    def cancel(self) -> bool:
+        if self.future is None or self.future.done():
+            return False
+        return self.future.cancel()
+
+    def on_stop(self, callback: Callable[[], Any]) -> None:
+        """Chama `callback()` quando a animação termina, é cancelada ou preemptada (na hora, se já terminou)"""
+        if self.future is None:
+            callback()
+        else:
+            self.future.add_done_callback(lambda _future: callback())
+
+    def fps(self) -> float:
+        """FPS alcançado (frames renderizados por segundo de animação)"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.ended_at or time.time()) - self.started_at
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "error": self.error,
+            "stoppedBy": self.stopped_by,
+            "priority": self.priority,
+            "loop": self.loop,
+            "period": self.period,
+            "duration": self.duration,
+            "frames": self.frames,
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "fps": round(self.fps(), 2),
+            "targetFps": round(1.0 / self.frame_interval(), 2),
+            "maxFps": self.max_fps,
+            "compensate": self.compensate,
+        }
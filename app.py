@@ -1,10 +1,11 @@
 import os
 import asyncio
 import tempfile
-import random
 import threading
 import time
-from typing import Optional, List, Dict, Any
+import contextlib
+from typing import Optional, List, Dict, Any, Deque, Tuple, Callable
+from collections import deque
 from pathlib import Path
 import requests
 import json
@@ -21,8 +22,31 @@ except ImportError:
     def is_a18_file(file_path: str) -> bool:
         return False
 
+import combo_index
+from combo_index import ComboIndex
+from audio_fingerprint import SoundCatalog
+from clip_archive import ClipArchive
+from noise_floor import NoiseFloor
+from device_loop import DEVICE_LOOP, on_device_loop
+from command_scheduler import CommandScheduler
+from admission import AdmissionControl, AdmissionRejected, retry_after_header
+from choreography import Choreography
+from antenna_animation import AntennaAnimation, preset
+from lip_sync import amplitude_envelope, lip_sync_keyframes
+from reaction import select_category
+from action_catalog import ActionCatalog
+from duration_model import DurationModel, sound_duration
+from ble_discovery import BackgroundDiscovery, DeviceTable, is_furby
+from reconnect import Backoff, LastDevice, ReconnectStats
+from link_events import LinkEvents
+from connect_race import ConnectHistory, race_connect
+from device_pool import DevicePool
+from a18_transfer import SCRATCH_SLOT, A18Transfer, SimulatedPeripheral
+from sound_slots import SlotCache, content_digest
+from scan_planner import ScanPlan, combo_dict, DIMENSIONS as SCAN_DIMENSIONS
+
 from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Carregar variáveis de ambiente (.env)
@@ -36,6 +60,30 @@ MOCK_MODE = os.getenv("MOCK_MODE", "true").lower() == "true"
 DEFAULT_PORT = int(os.getenv("PORT", "8000"))
 PREFERRED_ADDRESS = os.getenv("FURBY_ADDRESS", "").strip() or None
 
+# Controle de admissão dos comandos vindos da API (por Furby)
+COMMAND_QUEUE_DEPTH = int(os.getenv("COMMAND_QUEUE_DEPTH", "8"))  # comandos aceitos aguardando/executando
+COMMAND_RATE = float(os.getenv("COMMAND_RATE", "5"))  # comandos por segundo (0 = sem limite)
+COMMAND_BURST = float(os.getenv("COMMAND_BURST", "10"))  # rajada máxima
+ANTENNA_COMMAND_COST = 0.1  # cores são coalescidas, então custam uma fração de ficha
+ANTENNA_MAX_FPS = float(os.getenv("ANTENNA_MAX_FPS", "30"))  # teto das animações da antena (a latência BLE limita abaixo)
+CONVERSATION_ANIMATIONS = os.getenv("CONVERSATION_ANIMATIONS", "true").lower() == "true"  # antena "respira" ouvindo/pensando
+LIPSYNC_ENABLED = os.getenv("LIPSYNC_ENABLED", "true").lower() == "true"  # brilho da antena segue o volume da resposta
+LIPSYNC_MAX_FPS = float(os.getenv("LIPSYNC_MAX_FPS", "20"))  # teto de atualizações de brilho por segundo
+ACTION_NO_REPEAT = int(os.getenv("ACTION_NO_REPEAT", "5"))  # ações aleatórias recentes que não se repetem
+ACTION_DEFAULT_DURATION = float(os.getenv("ACTION_DEFAULT_DURATION", "2.0"))  # duração assumida de ação nunca medida (s)
+BLE_DISCOVERY = os.getenv("BLE_DISCOVERY", "true").lower() == "true"  # scanner BLE contínuo em segundo plano
+BLE_DISCOVERY_TTL = float(os.getenv("BLE_DISCOVERY_TTL", "30"))  # some da lista quem não anuncia há X segundos
+RECONNECT_DIRECT_ATTEMPTS = int(os.getenv("RECONNECT_DIRECT_ATTEMPTS", "4"))  # tentativas diretas antes de voltar a escanear
+RECONNECT_BASE_DELAY = float(os.getenv("RECONNECT_BASE_DELAY", "0.25"))  # primeira espera entre tentativas (s)
+RECONNECT_MAX_DELAY = float(os.getenv("RECONNECT_MAX_DELAY", "8"))  # teto da espera exponencial (s)
+RECONNECT_TIMEOUT = float(os.getenv("RECONNECT_TIMEOUT", "5"))  # desiste de uma tentativa de conexão após X segundos
+CONNECT_RACE_WIDTH = int(os.getenv("CONNECT_RACE_WIDTH", "3"))  # candidatos tentados em paralelo quando há vários Furbies
+SIMULATED_FLEET = int(os.getenv("SIMULATED_FLEET", "0"))  # Furbies simulados extras no pool (grupo "simulados")
+SIMULATED_UPLOAD_AIRTIME = os.getenv("SIMULATED_UPLOAD_AIRTIME", "false").lower() == "true"  # upload simulado gasta o tempo de ar do BLE
+A18_WINDOW = int(os.getenv("A18_WINDOW", "8"))  # pacotes sem resposta por janela no início do upload (cresce até 32)
+FURBY_SOUND_SLOTS = int(os.getenv("FURBY_SOUND_SLOTS", "10"))  # slots de som no Furby (cache de uploads)
+FURBY_SOUND_STORAGE_KB = int(os.getenv("FURBY_SOUND_STORAGE_KB", "512"))  # espaço para sons no Furby (KB)
+
 # Configurações do Porcupine Wake Word
 PORCUPINE_ACCESS_KEY = os.getenv("PORCUPINE_ACCESS_KEY", "").strip()
 PORCUPINE_ENABLED = os.getenv("PORCUPINE_ENABLED", "false").lower() == "true"
@@ -52,9 +100,21 @@ CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY", "").strip()
 CARTESIA_VOICE_ID = os.getenv("CARTESIA_VOICE_ID", "04c9c150-e6e8-40d7-91b2-b5ff2b68dc7a")  # Voice ID padrão
 
 SCAN_STATE_PATH = Path("scan_state.json")
+SCAN_PLAN_PATH = Path("scan_plan.json")  # assinatura do plano da varredura (gravada só quando o plano muda)
+SCAN_STATE_SAVE_INTERVAL = 2.0  # grava o progresso da varredura no máximo a cada X segundos...
+SCAN_STATE_SAVE_UNITS = 50  # ...ou a cada N unidades concluídas
 SILENT_RESULTS_PATH = Path("silent_candidates.json")
-
-def load_scan_state() -> Dict[str, int]:
+COMBO_INDEX_PATH = Path("combo_index.bin")
+SOUND_CATALOG_PATH = Path("sound_catalog.json")
+CLIP_DATA_PATH = Path("scan_clips.pcm")
+CLIP_INDEX_PATH = Path("scan_clips.idx")
+ACTION_DURATIONS_PATH = Path("action_durations.json")
+LAST_DEVICE_PATH = Path("last_device.json")
+CONNECT_HISTORY_PATH = Path("connect_history.json")
+SOUND_SLOTS_PATH = Path("sound_slots.json")
+FLEET_PATH = Path("fleet.json")  # Furbies extras do pool: {"devices": [{"id", "address", "groups"}]}
+
+def load_scan_state() -> Dict[str, Any]:
     if SCAN_STATE_PATH.exists():
         try:
             return json.loads(SCAN_STATE_PATH.read_text())
@@ -62,9 +122,20 @@ def load_scan_state() -> Dict[str, int]:
             pass
     return {"input": 1, "index": 0, "subindex": 0, "specific": 0}
 
-def save_scan_state(state: Dict[str, int]) -> None:
+def save_scan_state(state: Dict[str, Any]) -> None:
     SCAN_STATE_PATH.write_text(json.dumps(state))
 
+def load_scan_plan() -> Optional[Dict[str, Any]]:
+    if SCAN_PLAN_PATH.exists():
+        try:
+            return json.loads(SCAN_PLAN_PATH.read_text())
+        except Exception:
+            pass
+    return None
+
+def save_scan_plan(signature: Dict[str, Any]) -> None:
+    SCAN_PLAN_PATH.write_text(json.dumps(signature))
+
 def append_silent_candidate(entry: Dict[str, int], notes: str = "") -> None:
     data = []
     if SILENT_RESULTS_PATH.exists():
@@ -87,28 +158,38 @@ def list_silent_candidates(max_items: int = 20) -> List[Dict[str, Any]]:
         return []
     return data[-max_items:]
 
-def measure_environment_volume(duration: float = 1.0) -> float:
-    """Captura áudio do microfone para medir volume médio."""
+def scan_ranges(params: Dict[str, Any]) -> Dict[str, tuple]:
+    """Extrai as faixas (início, fim) de cada dimensão das configurações do scanner"""
+    return {dim: (params[f"{dim}_start"], params[f"{dim}_end"]) for dim in SCAN_DIMENSIONS}
+
+def record_clip(duration: float = 1.0, rate: int = 16000, input_device_index: Optional[int] = None) -> np.ndarray:
+    """Grava um clipe PCM int16 mono do microfone (padrão do sistema ou `input_device_index`)"""
     import pyaudio
-    RATE = 16000
     CHUNK = 512
-    frames = int(RATE / CHUNK * duration)
+    frames = int(rate / CHUNK * duration)
     pa = pyaudio.PyAudio()
-    stream = pa.open(rate=RATE, channels=1, format=pyaudio.paInt16,
-                     input=True, frames_per_buffer=CHUNK)
-    volumes = []
+    stream = pa.open(rate=rate, channels=1, format=pyaudio.paInt16,
+                     input=True, frames_per_buffer=CHUNK,
+                     input_device_index=input_device_index)
+    chunks = []
     try:
         for _ in range(frames):
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            pcm = struct.unpack_from("h" * CHUNK, data)
-            volumes.append(np.abs(pcm).mean())
+            chunks.append(stream.read(CHUNK, exception_on_overflow=False))
     finally:
         stream.stop_stream()
         stream.close()
         pa.terminate()
-    if not volumes:
+    return np.frombuffer(b"".join(chunks), dtype=np.int16)
+
+def clip_volume(clip: np.ndarray) -> float:
+    """Volume médio (média do valor absoluto das amostras) de um clipe"""
+    if not len(clip):
         return 0.0
-    return float(sum(volumes) / len(volumes))
+    return float(np.abs(clip.astype(np.int32)).mean())
+
+def measure_environment_volume(duration: float = 1.0) -> float:
+    """Captura áudio do microfone para medir volume médio."""
+    return clip_volume(record_clip(duration))
 
 # BLE scan via Bleak (escaneia mesmo em modo simulado, se quiser)
 from bleak import BleakScanner
@@ -133,29 +214,28 @@ class ConversationManager:
     def __init__(self):
         self.recording = False
     
-    def _run_random_action_background(self):
-        """Dispara CTRL.random_action() em uma thread separada e reseta antena para rosa após ação"""
-        def runner():
-            loop = None
+    def _run_random_action_background(self, category: Optional[str] = None):
+        """Agenda CTRL.random_action() no loop do dispositivo (sem esperar) e reseta antena para rosa após ação"""
+        async def restore_pink():
             try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(CTRL.random_action())
-                # Reset antena para rosa após ação (conversação ainda está ativa)
-                try:
-                    loop.run_until_complete(CTRL.set_color(255, 192, 203))  # Pink
-                    LOG.add("[openai] 🌸 Antena resetada para rosa após ação")
-                except Exception as color_exc:
-                    LOG.add(f"[openai] ⚠️ Erro ao resetar antena para rosa: {color_exc}")
+                await CTRL.set_color(255, 192, 203, priority="conversation")  # Pink
+                LOG.add("[openai] 🌸 Antena resetada para rosa após ação")
+            except Exception as color_exc:
+                LOG.add(f"[openai] ⚠️ Erro ao resetar antena para rosa: {color_exc}")
+
+        async def runner():
+            try:
+                await CTRL.random_action(priority="conversation", category=category)
+                # Reset antena para rosa após ação (conversação ainda está ativa). Com o lip-sync
+                # ainda na antena, o rosa espera ele terminar em vez de disputar a mesma característica
+                lip_sync = active_animation(CTRL, "lip-sync")
+                if lip_sync is not None:
+                    lip_sync.on_stop(lambda: DEVICE_LOOP.submit(restore_pink()))
+                else:
+                    await restore_pink()
             except Exception as exc:
                 LOG.add(f"[openai] ⚠️ Erro na ação aleatória em background: {exc}")
-            finally:
-                try:
-                    if loop:
-                        loop.close()
-                except:
-                    pass
-        threading.Thread(target=runner, daemon=True).start()
+        DEVICE_LOOP.submit(runner())
 
     async def _record_and_respond(self, turn_index: int, is_followup: bool) -> bool:
         """
@@ -184,10 +264,18 @@ class ConversationManager:
             frames_per_buffer=CHUNK
         )
         
+        def record():
+            for _ in range(0, int(RATE / CHUNK * CONVERSATION_TIMEOUT)):
+                data = stream.read(CHUNK, exception_on_overflow=False)
+                frames.append(data)
+        
         LOG.add("[openai] 🎙️ Gravando... Fale agora!")
-        for _ in range(0, int(RATE / CHUNK * CONVERSATION_TIMEOUT)):
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            frames.append(data)
+        if CONVERSATION_ANIMATIONS:
+            # Respiração rosa enquanto ouve; na classe da conversa, uma ação aleatória na fila não a interrompe
+            start_animation(CTRL, preset("breathing", (255, 192, 203), 2.0, base=(90, 30, 60)), loop=True,
+                            priority="conversation", name="ouvindo")
+        # Leitura do microfone bloqueia: roda no executor para não travar o loop do dispositivo
+        await DEVICE_LOOP.run_blocking(record)
         LOG.add("[openai] ✓ Gravação concluída")
         
         stream.stop_stream()
@@ -210,11 +298,15 @@ class ConversationManager:
             headers_json = {**headers_auth, "Content-Type": "application/json"}
             
             LOG.add("[openai] 📤 Enviando para OpenAI (REST)...")
+            if CONVERSATION_ANIMATIONS:
+                start_animation(CTRL, preset("pulse", (255, 192, 203), 0.8, base=(90, 30, 60)), loop=True,
+                                priority="conversation", name="pensando")
             LOG.add("[openai] 📝 Transcrevendo áudio via /audio/transcriptions ...")
             with open(audio_filename, "rb") as audio_file:
                 files = {"file": ("audio.wav", audio_file, "audio/wav")}
                 data = {"model": "whisper-1", "response_format": "json"}
-                resp = requests.post(
+                resp = await DEVICE_LOOP.run_blocking(
+                    requests.post,
                     "https://api.openai.com/v1/audio/transcriptions",
                     headers=headers_auth,
                     data=data,
@@ -263,7 +355,8 @@ class ConversationManager:
     "temperature": 0.7, # Lowered slightly to reduce randomness/craziness
     "max_tokens": 50
 }
-            resp = requests.post(
+            resp = await DEVICE_LOOP.run_blocking(
+                requests.post,
                 "https://api.openai.com/v1/chat/completions",
                 headers=headers_json,
                 json=chat_payload,
@@ -275,6 +368,8 @@ class ConversationManager:
             response_data = resp.json()
             assistant_text = response_data["choices"][0]["message"]["content"].strip()
             LOG.add(f"[openai] 🤖 Furby responde: '{assistant_text}'")
+            # Escolhe a reação pelo texto enquanto o TTS é gerado (léxico local, sem rede)
+            reaction = asyncio.ensure_future(DEVICE_LOOP.run_blocking(select_category, assistant_text))
             
             LOG.add("[cartesia] 🔊 Gerando áudio da resposta via Cartesia TTS...")
             if not CARTESIA_API_KEY:
@@ -306,7 +401,8 @@ class ConversationManager:
                 "Content-Type": "application/json"
             }
             
-            speech_resp = requests.post(
+            speech_resp = await DEVICE_LOOP.run_blocking(
+                requests.post,
                 "https://api.cartesia.ai/tts/bytes",
                 headers=cartesia_headers,
                 json=cartesia_payload,
@@ -322,20 +418,23 @@ class ConversationManager:
                 response_filename = temp_response.name
                 temp_response.write(speech_resp.content)
             
+            category, scores = await reaction
+            LOG.add(f"[openai] 🎭 Reação escolhida: {category} {scores or '(sem pistas)'}")
             LOG.add("[cartesia] 🔊 Tocando resposta no computador...")
-            LOG.add("[openai] 🎲 Disparando ação aleatória no Furby (em paralelo com o áudio)...")
+            stop_animation(CTRL, ("ouvindo", "pensando"))  # o lip-sync, se ativo, começa junto com o áudio
             
-            # Dispara ação aleatória em thread separada (em paralelo com o áudio)
-            self._run_random_action_background()
-            
-            # Toca o áudio (bloqueia até terminar) - acontece ao mesmo tempo que a ação
-            audio_duration = self._play_audio_on_computer(response_filename)
+            # Toca o áudio no executor (bloqueia até terminar); a reação dispara quando o áudio começa
+            audio_duration = await DEVICE_LOOP.run_blocking(
+                self._play_audio_on_computer, response_filename, LIPSYNC_ENABLED,
+                lambda: self._run_random_action_background(category),
+            )
             LOG.add("[cartesia] ✓ Resposta tocada!")
             
             LOG.add("[openai] ✅ Turno concluído!")
             return True
         
         finally:
+            stop_animation(CTRL, ("ouvindo", "pensando"))  # não sobrevivem ao turno (saída, erro, silêncio)
             for fname in [audio_filename, response_filename]:
                 if fname:
                     try:
@@ -352,7 +451,7 @@ class ConversationManager:
         try:
             # Define antena como rosa quando está ouvindo/falando
             try:
-                await CTRL.set_color(255, 192, 203)  # Pink
+                await CTRL.set_color(255, 192, 203, priority="conversation")  # Pink
                 LOG.add("[openai] 🌸 Antena definida como rosa (ouvindo/falando)")
             except Exception as e:
                 LOG.add(f"[openai] ⚠️ Erro ao definir cor da antena: {e}")
@@ -362,7 +461,7 @@ class ConversationManager:
             if not keep_running:
                 # Reset para roxa quando conversação termina
                 try:
-                    await CTRL.set_color(128, 0, 128)  # Purple
+                    await CTRL.set_color(128, 0, 128, priority="conversation")  # Purple
                     LOG.add("[openai] 🟣 Antena resetada para roxa (aguardando wake word)")
                 except Exception as e:
                     LOG.add(f"[openai] ⚠️ Erro ao resetar cor da antena: {e}")
@@ -378,7 +477,7 @@ class ConversationManager:
             
             # Reset para roxa quando conversação termina
             try:
-                await CTRL.set_color(128, 0, 128)  # Purple
+                await CTRL.set_color(128, 0, 128, priority="conversation")  # Purple
                 LOG.add("[openai] 🟣 Antena resetada para roxa (aguardando wake word)")
             except Exception as e:
                 LOG.add(f"[openai] ⚠️ Erro ao resetar cor da antena: {e}")
@@ -389,15 +488,37 @@ class ConversationManager:
             LOG.add(f"[openai] {traceback.format_exc()}")
             # Reset para roxa em caso de erro também
             try:
-                loop_reset = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop_reset)
-                loop_reset.run_until_complete(CTRL.set_color(128, 0, 128))  # Purple
-                loop_reset.close()
+                await CTRL.set_color(128, 0, 128, priority="conversation")  # Purple
             except:
                 pass
     
-    def _play_audio_on_computer(self, audio_file):
-        """Toca áudio no computador usando pydub + pyaudio. Retorna a duração do áudio em segundos."""
+    def _start_lip_sync(self, audio):
+        """Calcula o envelope da resposta e inicia o brilho da antena no relógio do áudio (não bloqueia)"""
+        if not CTRL.device.connected:
+            return
+        try:
+            samples = np.array(audio.get_array_of_samples())
+            envelope = amplitude_envelope(samples, audio.frame_rate, audio.channels, fps=LIPSYNC_MAX_FPS)
+            keyframes = lip_sync_keyframes(envelope, LIPSYNC_MAX_FPS, (255, 192, 203))  # Pink
+            # Mesma classe da conversa: a ação disparada junto com o áudio não interrompe o lip-sync
+            start_animation(CTRL, keyframes, priority="conversation", max_fps=LIPSYNC_MAX_FPS,
+                            name="lip-sync", compensate=True)
+        except Exception as e:
+            LOG.add(f"[cartesia] ⚠️ lip-sync indisponível: {e}")
+
+    def _play_audio_on_computer(self, audio_file, lip_sync: bool = False, on_start=None):
+        """
+        Toca áudio no computador usando pydub + pyaudio. Retorna a duração do áudio em segundos.
+        `on_start` é chamado uma vez, imediatamente antes de a reprodução começar.
+        """
+        started = False
+
+        def begin():
+            nonlocal started
+            if on_start is not None and not started:
+                started = True
+                on_start()
+
         try:
             from pydub import AudioSegment
             from pydub.playback import play
@@ -407,7 +528,12 @@ class ConversationManager:
             audio = AudioSegment.from_file(audio_file)
             duration_seconds = len(audio) / 1000.0  # pydub retorna duração em milissegundos
             
+            if lip_sync:
+                # Envelope calculado antes; a animação começa junto com a reprodução
+                self._start_lip_sync(audio)
+            
             # Toca o áudio (bloqueia até terminar)
+            begin()
             play(audio)
             
             return duration_seconds
@@ -428,6 +554,7 @@ class ConversationManager:
                 except:
                     pass
                 
+                begin()
                 if platform.system() == "Darwin":  # macOS
                     # afplay bloqueia até terminar
                     subprocess.run(["afplay", audio_file], check=True)
@@ -447,6 +574,35 @@ class ConversationManager:
 # Instância global do gerenciador de conversação
 CONVERSATION_MANAGER = ConversationManager()
 
+class ScanWorker:
+    """Um Furby (+ microfone) participando de uma varredura distribuída"""
+
+    def __init__(self, wid: int, ctrl: "Controller", owned: bool, mic_device: Optional[int] = None):
+        self.id = wid
+        self.ctrl = ctrl
+        self.owned = owned  # conexão aberta/fechada pelo próprio scanner
+        self.mic_device = mic_device
+        self.lo = 0  # próxima unidade (em andamento) do intervalo [lo, hi)
+        self.hi = 0
+        self.current: Optional[Dict[str, int]] = None
+        self.processed = 0
+        self.steals = 0
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def remaining(self) -> int:
+        return max(self.hi - self.lo, 0)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "address": self.ctrl.device.address,
+            "current": self.current,
+            "processed": self.processed,
+            "remainingUnits": self.remaining,
+            "steals": self.steals,
+        }
+
 class ActionScanner:
     def __init__(self):
         self.running = False
@@ -455,104 +611,497 @@ class ActionScanner:
         self.current_state: Dict[str, int] = load_scan_state()
         self.settings: Dict[str, Any] = {}
         self.last_volume = 0.0
+        self.last_snr: Optional[float] = None
+        self.noise: Dict[Optional[int], NoiseFloor] = {}  # piso de ruído por microfone
         self.last_silent: List[Dict[str, Any]] = list_silent_candidates()
         self.processed = 0
+        self.cooldown_saved = 0.0  # segundos de cooldown fixo evitados pela duração aprendida
+        self.index = ComboIndex(COMBO_INDEX_PATH)
+        self.catalog = SoundCatalog(SOUND_CATALOG_PATH)
+        self.clips = ClipArchive(CLIP_DATA_PATH, CLIP_INDEX_PATH)
+        self.plan: Optional[ScanPlan] = None
+        self.position = 0
+        self._recent_done: Deque[float] = deque(maxlen=50)  # instantes dos últimos combos concluídos
+        self.adaptive_stats: Dict[str, int] = {}
+        self.adaptive_hits: Deque[Dict[str, int]] = deque(maxlen=50)
+        self.workers: List[ScanWorker] = []
+        self._spare: List[List[int]] = []  # intervalos de unidades ainda sem dono
+        self._unit = 1  # posições por unidade de trabalho (1, ou uma subárvore no modo adaptativo)
+        self._saved_at = 0.0  # última gravação do progresso (monotonic)
+        self._unsaved_units = 0
+        self._work_lock = threading.Lock()
+        self._results_lock = threading.Lock()
+        self._mic_lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
 
     def start(self, params: Dict[str, Any]):
         if self.running:
             raise RuntimeError("Scanner já está em execução")
+        # Valida tudo antes de tocar no estado: um pedido rejeitado não deixa o scanner pela metade
+        plan = ScanPlan.from_settings(params)
+        pending = [[0, len(plan)]]
+        resumed = False
+        if params.get("resume"):
+            saved = load_scan_state()
+            # Estado novo: plano em scan_plan.json; estado intermediário: plano dentro do próprio estado
+            signature = saved.get("plan") or (load_scan_plan() if "pending" in saved else None)
+            if signature:
+                plan = ScanPlan.from_signature(signature)
+                pending = saved["pending"] if "pending" in saved else [[int(saved.get("position", 0)), len(plan)]]
+            elif "pending" in saved:
+                # Estado novo sem scan_plan.json (apagado ou corrompido): os intervalos pendentes
+                # só valem para um plano do mesmo tamanho; o caminho antigo perderia os buracos
+                pending = saved["pending"]
+                total = saved.get("total", max((hi for _lo, hi in pending), default=None))
+                if total != len(plan) or any(not 0 <= lo <= hi <= len(plan) for lo, hi in pending):
+                    raise ValueError(
+                        f"Plano da varredura salva ({SCAN_PLAN_PATH}) ausente ou corrompido e o plano pedido "
+                        f"não tem o mesmo tamanho; inicie sem resume"
+                    )
+                LOG.add(f"[scanner] ⚠️ {SCAN_PLAN_PATH} ausente; retomando os intervalos salvos no plano pedido")
+            else:
+                # Estado antigo (só a combinação): localiza a posição no plano atual
+                position = plan.position_of(
+                    tuple(saved[dim] for dim in SCAN_DIMENSIONS)
+                ) or 0
+                pending = [[position, len(plan)]]
+            resumed = True
+        if params.get("adaptive"):
+            if not params["silence_check"]:
+                raise ValueError("Modo adaptativo requer silence_check=true")
+            if plan.subtree_size is None:
+                raise ValueError("Modo adaptativo requer faixas sem embaralhamento (sem lista explícita)")
+        unit = plan.subtree_size if params.get("adaptive") else 1
+        workers = self._build_workers(params)
+
         self.stop_flag = False
         self.settings = params
-        if params.get("resume"):
-            self.current_state = load_scan_state()
-        else:
-            self.current_state = {
-                "input": params["input_start"],
-                "index": params["index_start"],
-                "subindex": params["subindex_start"],
-                "specific": params["specific_start"],
-            }
-            save_scan_state(self.current_state)
+        self.plan = plan
+        self._unit = unit
+        self.workers = workers
+        if resumed:
+            LOG.add(f"[scanner] retomando: {sum(hi - lo for lo, hi in pending)} combinações pendentes")
+        # Posições -> unidades; no modo adaptativo uma subárvore interrompida é refeita
+        self._spare = [[lo // self._unit, -(-hi // self._unit)] for lo, hi in pending if hi > lo]
+        self._distribute()
+        signature = json.loads(json.dumps(plan.signature()))  # tuplas viram listas, como no arquivo
+        if load_scan_plan() != signature:
+            save_scan_plan(signature)
+        self._save_state(force=True)
         self.processed = 0
+        self.cooldown_saved = 0.0
+        self._recent_done.clear()
+        self.adaptive_stats = {"subtrees": 0, "prunedSubtrees": 0, "tested": 0, "skipped": 0, "hits": 0}
+        self.adaptive_hits.clear()
+        self.started_at = self.finished_at = None
         self.thread = threading.Thread(target=self._run, daemon=True)
         self.thread.start()
         self.running = True
-        LOG.add("[scanner] iniciado")
+        LOG.add(f"[scanner] iniciado com {len(self.workers)} Furby(s)")
 
     def stop(self):
         if self.running:
             LOG.add("[scanner] solicitando parada...")
             self.stop_flag = True
 
+    def _build_workers(self, params: Dict[str, Any]) -> List[ScanWorker]:
+        """Furby principal (CTRL) + um Controller por endereço extra / Furby simulado extra"""
+        mics = params.get("mic_devices") or []
+        ctrls = [(CTRL, False)]
+        ctrls += [(Controller(address=address), True) for address in params.get("devices") or []]
+        ctrls += [(Controller(device=SimulatedFurby()), True) for _ in range(params.get("simulated_devices") or 0)]
+        return [
+            ScanWorker(i, ctrl, owned, mics[i] if i < len(mics) else None)
+            for i, (ctrl, owned) in enumerate(ctrls)
+        ]
+
+    def _distribute(self):
+        """Divide os intervalos pendentes em partes contíguas, uma por Furby"""
+        spare = sorted(self._spare, key=lambda r: r[1] - r[0])
+        while spare and len(spare) < len(self.workers) and spare[-1][1] - spare[-1][0] > 1:
+            lo, hi = spare.pop()
+            mid = (lo + hi) // 2
+            spare += [[lo, mid], [mid, hi]]
+            spare.sort(key=lambda r: r[1] - r[0])
+        for worker in self.workers:
+            worker.lo, worker.hi = spare.pop() if spare else (0, 0)
+        self._spare = spare
+
+    def _next_unit(self, worker: ScanWorker) -> Optional[int]:
+        """Próxima unidade do Furby; sem trabalho próprio, rouba metade da fila do mais atrasado"""
+        with self._work_lock:
+            if worker.lo < worker.hi:
+                return worker.lo
+            if self._spare:
+                worker.lo, worker.hi = self._spare.pop()
+                return worker.lo
+            # A unidade em andamento (lo) da vítima não pode ser roubada
+            victim = max(self.workers, key=lambda w: w.remaining - 1)
+            stealable = victim.remaining - 1
+            if stealable < 1:
+                return None
+            mid = victim.hi - (stealable + 1) // 2
+            worker.lo, worker.hi = mid, victim.hi
+            victim.hi = mid
+            worker.steals += 1
+            LOG.add(f"[scanner] 🤝 Furby #{worker.id} assumiu {worker.hi - worker.lo} unidades do Furby #{victim.id}")
+            return worker.lo
+
+    def _unit_done(self, worker: ScanWorker):
+        with self._work_lock:
+            worker.lo += 1
+            self._unsaved_units += 1
+        self._save_state()
+
+    def _pending(self) -> List[List[int]]:
+        """Intervalos de posições ainda não concluídos (para retomar)"""
+        ranges = [[w.lo, w.hi] for w in self.workers if w.lo < w.hi] + [list(r) for r in self._spare]
+        total = len(self.plan)
+        return sorted([lo * self._unit, min(hi * self._unit, total)] for lo, hi in ranges)
+
+    def _save_state(self, force: bool = False):
+        """
+        Grava os intervalos pendentes do plano (e a próxima combinação, para
+        leitura humana). Durante a varredura, no máximo a cada
+        SCAN_STATE_SAVE_INTERVAL s ou SCAN_STATE_SAVE_UNITS unidades; `force`
+        grava na hora (início, parada, erro). O plano fica em scan_plan.json.
+        """
+        with self._work_lock:
+            pending = self._pending()
+            self.position = len(self.plan) - sum(hi - lo for lo, hi in pending)
+            now = time.monotonic()
+            if not force and self._unsaved_units < SCAN_STATE_SAVE_UNITS and now - self._saved_at < SCAN_STATE_SAVE_INTERVAL:
+                return
+            self._saved_at, self._unsaved_units = now, 0
+            state: Dict[str, Any] = {
+                "position": pending[0][0] if pending else len(self.plan),
+                "total": len(self.plan),
+                "pending": pending,
+            }
+            if pending:
+                state.update(combo_dict(self.plan.combo_at(pending[0][0])))
+            save_scan_state(state)
+
+    def progress(self) -> Dict[str, Any]:
+        """Progresso do plano, vazão medida (combos/s) e estimativa de término"""
+        total = len(self.plan) if self.plan else 0
+        rate = 0.0
+        if len(self._recent_done) >= 2:
+            elapsed = self._recent_done[-1] - self._recent_done[0]
+            if elapsed > 0:
+                rate = (len(self._recent_done) - 1) / elapsed
+        remaining = max(total - self.position, 0)
+        if self.settings.get("adaptive") and self.adaptive_stats.get("subtrees"):
+            # No modo adaptativo só uma fração das posições restantes será executada
+            visited = self.adaptive_stats["tested"] + self.adaptive_stats["skipped"]
+            remaining = remaining * self.adaptive_stats["tested"] / visited
+        return {
+            "position": self.position,
+            "total": total,
+            "percent": round(100.0 * self.position / total, 2) if total else 0.0,
+            "combosPerSec": round(rate, 3),
+            "etaSeconds": round(remaining / rate, 1) if rate > 0 else None,
+        }
+
     def status(self) -> Dict[str, Any]:
         return {
             "running": self.running,
             "current": self.current_state,
             "settings": self.settings,
             "processed": self.processed,
+            "progress": self.progress(),
+            "workers": [w.info() for w in self.workers],
+            "adaptive": self.adaptive_report() if self.settings.get("adaptive") else None,
             "lastVolume": self.last_volume,
+            "cooldownSavedSec": round(self.cooldown_saved, 1),
+            "lastSnrDb": round(self.last_snr, 2) if self.last_snr is not None else None,
+            "noiseFloor": {"padrão" if mic is None else str(mic): f.info() for mic, f in self.noise.items()},
             "silentCandidates": list_silent_candidates(10),
             "stateFile": str(SCAN_STATE_PATH),
             "resultsFile": str(SILENT_RESULTS_PATH),
+            "indexFile": str(COMBO_INDEX_PATH),
+            "coverage": self.coverage(),
+            "clips": self.clips.info(),
         }
 
+    def coverage(self, ranges: Optional[Dict[str, tuple]] = None) -> Dict[str, Any]:
+        """Contagem de combinações por status (padrão: faixas da varredura atual)"""
+        if ranges is None and self.settings:
+            ranges = scan_ranges(self.settings)
+        counts = self.index.counts(ranges)
+        tested = counts["total"] - counts["untested"] - counts["skipped"]
+        counts["coveragePct"] = round(100.0 * tested / counts["total"], 2) if counts["total"] else 0.0
+        counts.update(self.index.info())
+        return counts
+
     def _run(self):
-        params = self.settings
+        """Coordena a varredura: conecta os Furbies extras e roda um worker por Furby"""
+        outcome: Dict[int, Any] = {}
         try:
-            for inp in range(self.current_state["input"], params["input_end"] + 1):
-                for idx in range(self.current_state["index"], params["index_end"] + 1):
-                    for sub in range(self.current_state["subindex"], params["subindex_end"] + 1):
-                        for spec in range(self.current_state["specific"], params["specific_end"] + 1):
-                            if self.stop_flag:
-                                LOG.add("[scanner] parada solicitada, salvando estado...")
-                                save_scan_state({
-                                    "input": inp,
-                                    "index": idx,
-                                    "subindex": sub,
-                                    "specific": spec,
-                                })
-                                self.running = False
-                                return
-                            combo = {"input": inp, "index": idx, "subindex": sub, "specific": spec}
-                            self.current_state = combo
-                            LOG.add(f"[scanner] testando {combo}")
-                            self._execute_combo(combo)
-                            time.sleep(params["cooldown"])
-                            self.processed += 1
-                            if params["silence_check"]:
-                                self.last_volume = measure_environment_volume(params["silence_window"])
-                                if self.last_volume < params["silence_threshold"]:
-                                    LOG.add(f"[scanner] 🔇 possível silêncio! volume={self.last_volume:.1f}")
-                                    append_silent_candidate(combo, notes=f"volume={self.last_volume:.1f}")
-                                    self.last_silent = list_silent_candidates()
-                            next_state = {
-                                "input": inp,
-                                "index": idx,
-                                "subindex": sub,
-                                "specific": spec + 1,
-                            }
-                            if next_state["specific"] > params["specific_end"]:
-                                next_state["specific"] = params["specific_start"]
-                            save_scan_state(next_state)
-                        self.current_state["specific"] = params["specific_start"]
-                    self.current_state["subindex"] = params["subindex_start"]
-                self.current_state["index"] = params["index_start"]
-            LOG.add("[scanner] varredura concluída!")
+            for worker in self.workers:
+                if worker.owned:
+                    self._call(worker.ctrl.connect(worker.ctrl.preferred_address, priority="scanner"))
+            if self.settings["silence_check"] and self.settings["noise_calibration"]:
+                self._calibrate_noise()
+            self.started_at = time.monotonic()
+
+            def work(worker: ScanWorker):
+                try:
+                    outcome[worker.id] = self._work(worker)
+                except Exception as e:
+                    outcome[worker.id] = e
+                    self.stop_flag = True  # um erro interrompe a varredura inteira, como antes
+
+            for worker in self.workers:
+                worker.thread = threading.Thread(target=work, args=(worker,), daemon=True)
+                worker.thread.start()
+            for worker in self.workers:
+                worker.thread.join()
+            self.finished_at = time.monotonic()
+
+            errors = [r for r in outcome.values() if isinstance(r, Exception)]
+            if errors:
+                raise errors[0]
+            if all(outcome.values()):
+                LOG.add("[scanner] varredura concluída!")
+            else:
+                LOG.add("[scanner] parada solicitada, salvando estado...")
+            self._save_state(force=True)
         except Exception as e:
             LOG.add(f"[scanner] erro: {e}")
             import traceback
             LOG.add(traceback.format_exc())
+            self._save_state(force=True)
         finally:
+            for worker in self.workers:
+                if worker.owned:
+                    try:
+                        self._call(worker.ctrl.disconnect(priority="scanner"))
+                    except Exception:
+                        pass
+            self.index.flush()
+            self.clips.flush()
+            if self.catalog.dirty:
+                self.catalog.save()
+            if DURATIONS.dirty:
+                DURATIONS.save()
             self.running = False
 
-    def _execute_combo(self, combo: Dict[str, int]):
-        async def runner():
-            await CTRL.action(combo["input"], combo["index"], combo["subindex"], combo["specific"])
-        loop = asyncio.new_event_loop()
-        try:
-            loop.run_until_complete(runner())
-        finally:
-            loop.close()
+    def _calibrate_noise(self):
+        """Mede o ruído ambiente de cada microfone antes de disparar qualquer ação"""
+        self.noise = {}
+        for mic in dict.fromkeys(w.mic_device for w in self.workers):
+            floor = self.noise[mic] = NoiseFloor()
+            level = floor.calibrate(record_clip(self.settings["calibration_seconds"], input_device_index=mic))
+            label = "padrão" if mic is None else mic
+            LOG.add(f"[scanner] 🎚️ piso de ruído (mic {label}): {level:.1f} RMS")
+
+    def _work(self, worker: ScanWorker) -> bool:
+        """Loop de um Furby. Retorna False se foi interrompido."""
+        while True:
+            if self.stop_flag:
+                return False
+            unit = self._next_unit(worker)
+            if unit is None:
+                return True
+            if self.settings.get("adaptive"):
+                if not self._scan_subtree(worker, unit * self._unit, self._unit):
+                    return False
+            else:
+                self._test_combo(worker, combo_dict(self.plan.combo_at(unit)))
+            self._unit_done(worker)
+
+    def _test_combo(self, worker: ScanWorker, combo: Dict[str, int]) -> Dict[str, Any]:
+        """Dispara uma combinação, mede o silêncio e registra o resultado no índice"""
+        params = self.settings
+        worker.current = combo
+        if worker.id == 0:
+            self.current_state = combo
+        LOG.add(f"[scanner] testando {combo}" + (f" (Furby #{worker.id})" if len(self.workers) > 1 else ""))
+        status = combo_index.TESTED
+        volume = None
+        snr = None
+        sound_id = None
+        clip = None
+        floor = self.noise.get(worker.mic_device) if params["noise_calibration"] else None
+        # Com um só microfone, disparo + escuta são fatiados no tempo entre os Furbies
+        share_mic = params["silence_check"] and params.get("shared_mic", True) and len(self.workers) > 1
+        with self._mic_lock if share_mic else contextlib.nullcontext():
+            if floor is not None and floor.due(params["noise_recalibrate_every"]):
+                # Reamostra o ambiente com o Furby parado, para acompanhar a sala
+                floor.observe(record_clip(params["noise_recalibrate_seconds"], input_device_index=worker.mic_device), ambient=True)
+            try:
+                self._execute_combo(combo, worker.ctrl)
+            except Exception:
+                self.index.set(combo, combo_index.ERROR)
+                raise
+            fired = time.monotonic()
+            if params["silence_check"]:
+                # Escuta logo após o disparo, para capturar o som da própria ação
+                clip = record_clip(params["silence_window"], input_device_index=worker.mic_device)
+            if clip is not None and params["adaptive_cooldown"]:
+                self._learn_duration(combo, clip, floor)
+            if share_mic:
+                # Só libera o microfone quando este Furby terminou de tocar: senão o próximo
+                # dispara e grava com a cauda deste som no clipe (silencioso vira audível)
+                self._cooldown(combo, fired)
+        if clip is not None:
+            if params["archive_clips"]:
+                self.clips.append(combo, clip)
+            volume = self.last_volume = clip_volume(clip)
+            status = combo_index.AUDIBLE
+            if floor is not None:
+                snr = self.last_snr = floor.snr_db(clip)
+                silent = snr < params["snr_threshold_db"]
+                floor.observe(clip)
+                notes = f"volume={volume:.1f} snr={snr:.1f}dB piso={floor.level:.1f}"
+            else:
+                silent = volume < params["silence_threshold"]
+                notes = f"volume={volume:.1f}"
+            if silent:
+                status = combo_index.SILENT
+                LOG.add(f"[scanner] 🔇 possível silêncio! {notes}")
+                with self._results_lock:
+                    append_silent_candidate(combo, notes=notes)
+                    self.last_silent = list_silent_candidates()
+            elif params["fingerprint"]:
+                activity = floor.threshold_level(params["snr_threshold_db"]) if floor is not None else params["silence_threshold"]
+                with self._results_lock:
+                    cluster = self.catalog.add(combo, clip, floor=activity)
+                    if self.catalog.dirty >= 20:
+                        self.catalog.save()
+                sound_id = cluster["id"]
+                if len(cluster["members"]) > 1:
+                    LOG.add(f"[scanner] 🔁 mesmo som #{sound_id} de {cluster['representative']}")
+                else:
+                    LOG.add(f"[scanner] 🆕 novo som #{sound_id} ({cluster['duration']:.2f}s)")
+        if not share_mic:
+            self._cooldown(combo, fired)
+        self.index.set(combo, status)
+        with self._results_lock:
+            self.processed += 1
+            worker.processed += 1
+            self._recent_done.append(time.monotonic())
+        return {"status": status, "volume": volume, "snr": snr, "sound": sound_id}
+
+    def _learn_duration(self, combo: Dict[str, int], clip: np.ndarray, floor: Optional[NoiseFloor]):
+        """Mede quanto o som do combo durou no clipe (base do cooldown adaptativo)"""
+        params = self.settings
+        activity = floor.threshold_level(params["snr_threshold_db"]) if floor is not None else params["silence_threshold"]
+        seconds, truncated = sound_duration(clip, activity)
+        key = (combo["input"], combo["index"], combo["subindex"], combo["specific"])
+        DURATIONS.observe(key, seconds, truncated, category=catalog_prior(key)[0])
+        if DURATIONS.dirty >= 20:
+            DURATIONS.save()
+
+    def _cooldown(self, combo: Dict[str, int], fired: float):
+        """Espera o Furby ficar livre: duração aprendida (com folga) ou o cooldown fixo"""
+        params = self.settings
+        if not params["adaptive_cooldown"]:
+            time.sleep(params["cooldown"])
+            return
+        expected = DURATIONS.estimate((combo["input"], combo["index"], combo["subindex"], combo["specific"]))
+        wait = min(max(expected - (time.monotonic() - fired) + params["cooldown_guard"], 0.0), params["cooldown"])
+        time.sleep(wait)
+        with self._results_lock:
+            self.cooldown_saved += params["cooldown"] - wait
+
+    # ----------------- modo adaptativo -----------------
+
+    def _same_response(self, a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        if a["status"] != b["status"]:
+            return False
+        if a["status"] != combo_index.AUDIBLE:
+            return True
+        if a.get("sound") is not None and b.get("sound") is not None:
+            return a["sound"] == b["sound"]
+        if a["volume"] is None or b["volume"] is None:
+            return True
+        return abs(a["volume"] - b["volume"]) <= self.settings["adaptive_tolerance"]
+
+    def _scan_subtree(self, worker: ScanWorker, base: int, size: int) -> bool:
+        """
+        Varre uma subárvore (input, index, subindex) de forma adaptativa.
+        Retorna False se foi interrompida; ao retomar, as combinações já
+        registradas no índice não são executadas de novo.
+        """
+        params = self.settings
+        probe = min(params["adaptive_probe"], size)
+        stride = max(params["adaptive_stride"], 1)
+        radius = max(params["adaptive_radius"], 1)
+        results: Dict[int, Dict[str, Any]] = {}
+
+        def run(offset: int) -> Dict[str, Any]:
+            combo = combo_dict(self.plan.combo_at(base + offset))
+            known = self.index.get(combo)
+            if known in (combo_index.SILENT, combo_index.AUDIBLE):
+                results[offset] = {"status": known, "volume": None}
+            else:
+                results[offset] = self._test_combo(worker, combo)
+            return results[offset]
+
+        for offset in range(probe):
+            if self.stop_flag:
+                return False
+            run(offset)
+
+        first = results[0]
+        pruned = all(self._same_response(first, results[o]) for o in range(probe))
+        if pruned:
+            pending = deque(range(probe - 1 + stride, size, stride))
+        else:
+            pending = deque(range(probe, size))
+
+        hits = []
+        while pending:
+            if self.stop_flag:
+                return False
+            offset = pending.popleft()
+            if offset in results:
+                continue
+            result = run(offset)
+            if pruned and result["status"] == combo_index.AUDIBLE and not self._same_response(first, result):
+                combo = combo_dict(self.plan.combo_at(base + offset))
+                LOG.add(f"[scanner] 🎯 hit em subárvore podada: {combo}, adensando ao redor")
+                hits.append(combo)
+                for near in range(offset + radius, offset - radius - 1, -1):
+                    if 0 <= near < size and near not in results:
+                        pending.appendleft(near)
+
+        skipped = 0
+        for offset in range(size):
+            if offset not in results:
+                combo = self.plan.combo_at(base + offset)
+                if self.index.get(combo) == combo_index.UNTESTED:
+                    self.index.set(combo, combo_index.SKIPPED)
+                skipped += 1
+        with self._results_lock:
+            self.adaptive_hits.extend(hits)
+            self.adaptive_stats["hits"] += len(hits)
+            self.adaptive_stats["prunedSubtrees"] += int(pruned)
+            self.adaptive_stats["tested"] += len(results)
+            self.adaptive_stats["skipped"] += skipped
+            self.adaptive_stats["subtrees"] += 1
+        return True
+
+    def adaptive_report(self) -> Dict[str, Any]:
+        """Combinações testadas vs. varredura exaustiva e hits encontrados"""
+        stats = self.adaptive_stats
+        visited = stats["tested"] + stats["skipped"]
+        return {
+            **stats,
+            "exhaustive": len(self.plan) if self.plan else 0,
+            "savedPct": round(100.0 * stats["skipped"] / visited, 2) if visited else 0.0,
+            "recentHits": list(self.adaptive_hits),
+        }
+
+    def _call(self, coro):
+        return DEVICE_LOOP.run(coro)
+
+    def _execute_combo(self, combo: Dict[str, int], ctrl: Optional["Controller"] = None):
+        ctrl = ctrl or CTRL
+        self._call(ctrl.action(combo["input"], combo["index"], combo["subindex"], combo["specific"], priority="scanner"))
 
 ACTION_SCANNER = ActionScanner()
 
@@ -712,10 +1261,7 @@ class WakeWordDetector:
             
             # Define antena como roxa quando está esperando wake word
             try:
-                loop_color = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop_color)
-                loop_color.run_until_complete(CTRL.set_color(128, 0, 128))  # Purple
-                loop_color.close()
+                DEVICE_LOOP.run(CTRL.set_color(128, 0, 128, priority="random"))  # Purple
                 LOG.add("[wake-word] 🟣 Antena definida como roxa (aguardando wake word)")
             except Exception as e:
                 LOG.add(f"[wake-word] ⚠️ Erro ao definir cor da antena: {e}")
@@ -832,10 +1378,7 @@ class WakeWordDetector:
                     pass
             # Reset antena quando detector para (opcional - pode manter roxa)
             # try:
-            #     loop_reset = asyncio.new_event_loop()
-            #     asyncio.set_event_loop(loop_reset)
-            #     loop_reset.run_until_complete(CTRL.set_color(0, 0, 0))  # Off ou outra cor
-            #     loop_reset.close()
+            #     DEVICE_LOOP.run(CTRL.set_color(0, 0, 0))  # Off ou outra cor
             # except:
             #     pass
             LOG.add("[wake-word] detector parado completamente")
@@ -846,14 +1389,8 @@ class WakeWordDetector:
             # Pausa o detector para evitar conflitos de áudio
             self.pause()
             
-            # Cria um novo event loop para a thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Executa a conversação
-            loop.run_until_complete(CONVERSATION_MANAGER.handle_conversation())
-            
-            loop.close()
+            # Executa a conversação no loop do dispositivo (esta thread espera terminar)
+            DEVICE_LOOP.run(CONVERSATION_MANAGER.handle_conversation())
             
             # Retoma o detector após a conversação terminar
             self.resume()
@@ -865,14 +1402,8 @@ class WakeWordDetector:
     def _trigger_random_action(self):
         """Dispara ação aleatória quando palavra é detectada"""
         try:
-            # Cria um novo event loop para a thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Executa a ação aleatória
-            loop.run_until_complete(CTRL.random_action())
-            
-            loop.close()
+            # Executa a ação aleatória no loop do dispositivo; encadeada, começa quando a anterior terminar
+            DEVICE_LOOP.run(CTRL.random_action(priority="random", chain=True))
         except Exception as e:
             LOG.add(f"[wake-word] erro ao disparar ação: {e}")
 
@@ -894,15 +1425,79 @@ class Log:
 
 LOG = Log()
 
+async def upload_with_progress(transport, data: bytes, name: str, start: int = 0,
+                               on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Envia um arquivo pelo motor A18 (a partir de `start`), registrando o progresso a cada 25%"""
+    marks = {"next": 0.25}
+
+    def progress(info: Dict[str, Any]):
+        if on_progress:
+            on_progress(info)
+        if info["progress"] >= marks["next"]:
+            marks["next"] = (int(info["progress"] * 4) + 1) / 4
+            LOG.add(f"[upload] {name}: {info['progress'] * 100:.0f}% ({info['confirmed']}/{info['size']} bytes, "
+                    f"{(info['bytesPerSec'] or 0) / 1024:.1f} KB/s, janela {info['window']})")
+
+    transfer = A18Transfer(transport, window=A18_WINDOW, on_progress=progress)
+    LOG.add(f"[upload] enviando {name} ({len(data)} bytes)...")
+    report = await transfer.upload(data, name, start=start)
+    LOG.add(f"[upload] ✅ {name}: {report['seconds']:.2f}s, {(report['bytesPerSec'] or 0) / 1024:.1f} KB/s, "
+            f"MTU {report['mtu']}, {report['rewinds']} retransmissões")
+    return report
+
+# Sons já enviados a cada Furby: hash do conteúdo -> slot (repetições viram "tocar slot N")
+SOUND_SLOTS = SlotCache(SOUND_SLOTS_PATH, slots=FURBY_SOUND_SLOTS, capacity=FURBY_SOUND_STORAGE_KB * 1024)
+
+async def upload_to_slot(address: Optional[str], digest: str, data: bytes, name: str,
+                         transport_for_slot: Callable[[int, int], Any],
+                         slot_addressing: bool = True) -> Tuple[int, Dict[str, Any]]:
+    """
+    Envia o conteúdo a um slot do Furby, retomando um upload parcial; retorna (slot, relatório).
+    Só usa o cache com o endereço do Furby (chave do cache), um transporte que grava no slot
+    e no offset pedidos e um arquivo que cabe no armazenamento de sons; sem isso o arquivo vai
+    inteiro para o SCRATCH_SLOT, fora do cache.
+    """
+    if not address:
+        reason = "endereço do Furby desconhecido"
+    elif not slot_addressing:
+        reason = "transporte sem slots"
+    elif len(data) > SOUND_SLOTS.capacity:
+        reason = f"maior que o armazenamento de sons ({SOUND_SLOTS.capacity} bytes)"
+    else:
+        reason = None
+    if reason:
+        LOG.add(f"[slots] {name}: {reason}; enviando inteiro, sem cache")
+        report = await upload_with_progress(transport_for_slot(SCRATCH_SLOT, 0), data, name)
+        return SCRATCH_SLOT, report
+    slot, start, evicted = SOUND_SLOTS.reserve(address, digest, len(data))
+    for entry in evicted:
+        LOG.add(f"[slots] 🗑 slot {entry['slot']} liberado ({entry['size']} bytes, menos usado recentemente)")
+    if start:
+        LOG.add(f"[slots] ↩ retomando upload no slot {slot} a partir do byte {start}/{len(data)}")
+    report = await upload_with_progress(
+        transport_for_slot(slot, start), data, name, start=start,
+        on_progress=lambda info: SOUND_SLOTS.progress(address, digest, info["confirmed"]),
+    )
+    SOUND_SLOTS.complete(address, digest)
+    return slot, report
+
 class SimulatedFurby:
-    def __init__(self):
+    _count = 0
+
+    def __init__(self, latency: float = 0.0):
         self.connected = False
         self.address: Optional[str] = None
+        self.latency = latency  # atraso simulado de cada escrita BLE (s)
+        self.on_link_lost: Optional[Callable[[str], None]] = None  # chamado quando o link cai sozinho
+        self.last_transfer: Optional[Dict[str, Any]] = None  # relatório do último upload de áudio
+        self.storage: Dict[int, SimulatedPeripheral] = {}  # slot -> arquivo (parcial ou completo) no Furby
+        SimulatedFurby._count += 1
+        self._default_address = f"FA:KE:FU:RB:YY:{SimulatedFurby._count - 1:02X}"
 
     async def connect(self, address: Optional[str] = None):
         await asyncio.sleep(0.2)
         self.connected = True
-        self.address = address or "FA:KE:FU:RB:YY:00"
+        self.address = address or self._default_address
         LOG.add(f"[sim] conectado ao Furby simulado @ {self.address}")
 
     async def disconnect(self):
@@ -910,14 +1505,50 @@ class SimulatedFurby:
             self.connected = False
             LOG.add("[sim] desconectado")
 
+    def drop_link(self, notify: bool = True):
+        """Simula a queda do link BLE (Furby desligou, saiu de alcance...)"""
+        if not self.connected:
+            return
+        self.connected = False
+        if notify and self.on_link_lost:
+            self.on_link_lost("simulado")
+
     async def set_antenna_color(self, r: int, g: int, b: int):
+        if self.latency:
+            await asyncio.sleep(self.latency)
         LOG.add(f"[sim] antena RGB=({r},{g},{b})")
 
     async def trigger_action(self, input: int, index: int, subindex: int, specific: int):
+        if self.latency:
+            await asyncio.sleep(self.latency)
         LOG.add(f"[sim] action input={input}, index={index}, subindex={subindex}, specific={specific}")
 
     async def play_wav(self, wav_path: str):
-        LOG.add(f"[sim] [audio] simulando toque de áudio: {Path(wav_path).name}")
+        with open(wav_path, 'rb') as f:
+            data = f.read()
+        digest = content_digest(data)
+        slot = SOUND_SLOTS.lookup(self.address, digest) if self.address else None
+        if slot is not None:
+            try:
+                await self.play_slot(slot)
+                return
+            except RuntimeError:
+                SOUND_SLOTS.invalidate(self.address, digest)  # o Furby não tem mais o arquivo
+        # Upload simulado: mesmo motor do Furby real, contra um periférico com MTU e tempo de ar
+        slot, self.last_transfer = await upload_to_slot(self.address, digest, data, Path(wav_path).name,
+                                                        self._slot_storage, SimulatedPeripheral.slot_addressing)
+        await self.play_slot(slot)
+
+    def _slot_storage(self, slot: int, start: int) -> SimulatedPeripheral:
+        if not start or slot not in self.storage:
+            # Slot novo ou reaproveitado: arquivo do zero (sem SIMULATED_UPLOAD_AIRTIME, instantâneo)
+            self.storage[slot] = SimulatedPeripheral(time_scale=1.0 if SIMULATED_UPLOAD_AIRTIME else 0.0)
+        return self.storage[slot]
+
+    async def play_slot(self, slot: int):
+        if slot not in self.storage or not self.storage[slot].complete:
+            raise RuntimeError(f"Slot {slot} vazio ou incompleto")
+        LOG.add(f"[sim] [audio] tocando slot {slot} ({self.storage[slot].name})")
 
 class RealFurby:
     def __init__(self):
@@ -926,6 +1557,9 @@ class RealFurby:
         self._furby = _pyfluff()
         self.connected = False
         self.address: Optional[str] = None
+        self.on_link_lost: Optional[Callable[[str], None]] = None  # chamado quando o link cai sozinho
+        self._closing = False
+        self.last_transfer: Optional[Dict[str, Any]] = None  # relatório do último upload de áudio
 
     async def connect(self, address: Optional[str] = None):
         # PyFluff consegue descobrir sozinho; address é opcional
@@ -935,9 +1569,32 @@ class RealFurby:
             await self._furby.connect(address=address)
         self.connected = True
         self.address = address
+        self._closing = False
+        self._hook_link_lost()
         LOG.add("[real] conectado ao Furby via PyFluff")
 
+    def _hook_link_lost(self):
+        """Liga o callback de desconexão do BleakClient usado pelo PyFluff, se ele estiver acessível"""
+        client = next((getattr(self._furby, name) for name in ("client", "_client", "ble_client")
+                       if getattr(self._furby, name, None) is not None), None)
+        backend = getattr(client, "_backend", None)
+        if backend is None or not hasattr(backend, "set_disconnected_callback"):
+            LOG.add("[real] ⚠️ callback de desconexão indisponível; quedas só serão notadas pela verificação periódica")
+            return
+        previous = getattr(backend, "_disconnected_callback", None)
+
+        def lost():
+            if previous:
+                previous()
+            if self.connected and not self._closing:
+                self.connected = False
+                if self.on_link_lost:
+                    self.on_link_lost("ble")
+
+        backend.set_disconnected_callback(lost)
+
     async def disconnect(self):
+        self._closing = True  # desconexão pedida por nós não é queda de link
         await self._furby.disconnect()
         self.connected = False
         LOG.add("[real] desconectado")
@@ -1039,39 +1696,138 @@ class RealFurby:
     
     async def _upload_a18_via_ble(self, a18_path: str):
         """
-        Tenta fazer upload do arquivo A18 via BLE usando características do PyFluff.
-        Esta é uma implementação experimental baseada no protocolo BLE do Furby.
+        Upload do arquivo A18 pelo client BLE do PyFluff.
+        O motor (a18_transfer.A18Transfer: MTU negociado, janela, retomada) já existe e roda
+        contra o periférico simulado; falta o transporte do Furby real, porque os comandos e
+        as confirmações de arquivo do firmware não são conhecidos.
         """
         if not hasattr(self._furby, 'client') or not self._furby.client:
             raise RuntimeError("Client BLE não disponível")
-        
-        # Lê o arquivo A18
-        with open(a18_path, 'rb') as f:
-            a18_data = f.read()
-        
-        # UUIDs conhecidos do Furby Connect (podem variar)
-        # Estes são valores comuns para características de upload de arquivo
-        FILE_UPLOAD_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"  # Exemplo
-        
-        # Tenta escrever em chunks (BLE tem limite de tamanho por pacote)
-        chunk_size = 20  # Tamanho típico de chunk BLE
-        
-        LOG.add(f"[audio] enviando {len(a18_data)} bytes em chunks de {chunk_size}...")
-        
-        # Esta é uma implementação básica - pode precisar de ajustes
-        # baseado na implementação real do PyFluff
+        # Sem o protocolo de arquivo do Furby não dá para saber se o arquivo chegou: nada de sucesso falso
         raise NotImplementedError(
-            "Upload via BLE direto ainda não está totalmente implementado. "
-            "Use trigger_action ou aguarde suporte completo no PyFluff."
+            "Upload via BLE direto ainda não está implementado: o protocolo de arquivo do Furby "
+            "não é conhecido. Use trigger_action ou aguarde suporte no PyFluff."
         )
 
+# Catálogo de ações (action_catalog.json), carregado uma vez; as ações não mudam a cor da antena
+ACTION_CATALOG = ActionCatalog.load(no_repeat=ACTION_NO_REPEAT)
+
+def catalog_prior(combo) -> tuple:
+    """(categoria, duração informada no catálogo) de uma combinação, para o modelo de duração"""
+    action = ACTION_CATALOG.get(combo)
+    return (action["category"], action["duration"]) if action else (None, None)
+
+# Duração aprendida de cada ação (medida nos clipes do scanner), persistida em action_durations.json
+DURATIONS = DurationModel(ACTION_DURATIONS_PATH, default=ACTION_DEFAULT_DURATION, prior=catalog_prior)
+
+# Descoberta BLE contínua: um scanner só, ligado o tempo todo, alimentando a tabela de dispositivos
+SIMULATED_FURBY_ADVERT = {"name": "Furby Simulado", "address": "FA:KE:FU:RB:YY:00", "rssi": -50}
+DISCOVERY = BackgroundDiscovery(
+    DeviceTable(ttl=BLE_DISCOVERY_TTL),
+    scanner_factory=BleakScanner,
+    simulated=[SIMULATED_FURBY_ADVERT] if MOCK_MODE else None,
+    log=LOG.add,
+)
+
+def furby_entry(entry: Dict[str, Any]) -> bool:
+    return is_furby(entry.get("name"))
+
+# Eventos de conexão/queda do link, publicados pelo callback BLE (o auto-connect espera por eles)
+LINK_EVENTS = LinkEvents()
+
+# Último Furby conectado com sucesso: a reconexão tenta ele direto, sem scan
+LAST_DEVICE = LastDevice(LAST_DEVICE_PATH)
+
+# Sucessos/falhas de conexão por endereço, para ordenar candidatos junto com o RSSI
+CONNECT_HISTORY = ConnectHistory(CONNECT_HISTORY_PATH)
+
 class Controller:
-    def __init__(self):
+    def __init__(self, device=None, address: Optional[str] = None):
         self.mode = "mock" if MOCK_MODE else "real"
-        self.device = SimulatedFurby() if MOCK_MODE else RealFurby()
-        self.lock = asyncio.Lock()
+        self.device = device or (SimulatedFurby() if MOCK_MODE else RealFurby())
+        self.device.on_link_lost = self._link_lost
+        self.preferred_address = address or PREFERRED_ADDRESS
+        # Um comando por vez, servido por prioridade: conversation > manual > random > scanner
+        self.scheduler = CommandScheduler()
+        # Fila limitada + token bucket para os comandos vindos da API
+        self.admission = AdmissionControl(COMMAND_QUEUE_DEPTH, COMMAND_RATE, COMMAND_BURST)
+        # Cor da antena "última vence": no máximo uma escrita pendente atrás da que está no ar
+        self._color_pending: Optional[tuple] = None
+        self._color_priority = "manual"
+        self._color_waiters: List[asyncio.Future] = []
+        self._color_task: Optional[asyncio.Task] = None
+        self.color_stats = {"requested": 0, "sent": 0, "coalesced": 0, "errors": 0}
+        # Sombra do último estado confirmado do Furby (só é atualizada depois de uma escrita bem-sucedida)
+        self._shadow: Dict[str, Any] = {"antennaColor": None, "lastAction": None, "connectedAt": None,
+                                        "disconnectedAt": None, "updatedAt": None}
+        self.shadow_stats = {"writes": 0, "skipped": 0}
+        # Latência medida de cada tipo de escrita BLE (média móvel, s), usada para compensar atrasos
+        self.write_latency: Dict[str, float] = {}
+        # Até quando (time.monotonic) a última ação deve manter o Furby ocupado, pela duração aprendida
+        self._busy_until = 0.0
+        # Desconectado de propósito (disconnect/reset): o auto-connect não reconecta até um novo connect
+        self.held = False
+
+    def _measured(self, kind: str, started: float):
+        took = time.monotonic() - started
+        previous = self.write_latency.get(kind)
+        self.write_latency[kind] = took if previous is None else previous + 0.2 * (took - previous)
+
+    def _touch(self, **changes):
+        self._shadow.update(changes, updatedAt=time.time())
+
+    def _link_lost(self, reason: str):
+        """Callback de queda do link (BLE ou simulado): atualiza o estado e avisa quem espera"""
+        address = self.device.address
+        self.device.connected = False
+        self._touch(antennaColor=None, connectedAt=None, disconnectedAt=time.time())
+        LOG.add(f"[link] 📴 conexão perdida com {address} ({reason})")
+        LINK_EVENTS.publish("disconnected", address=address, reason=reason)
+
+    def _disconnected_locally(self, address: Optional[str], reason: str):
+        """Desconexão pedida por nós: mesmo evento de uma queda, marcado como intencional"""
+        self.held = True
+        self._touch(antennaColor=None, connectedAt=None, disconnectedAt=time.time())
+        LINK_EVENTS.publish("disconnected", address=address, reason=reason, intentional=True)
+
+    def shadow(self) -> Dict[str, Any]:
+        """Cópia (somente leitura) do estado conhecido do Furby"""
+        state = dict(self._shadow)
+        state["connected"] = bool(self.device.connected)
+        state["address"] = self.device.address
+        if state["antennaColor"] is not None:
+            state["antennaColor"] = list(state["antennaColor"])
+        if state["lastAction"] is not None:
+            state["lastAction"] = dict(state["lastAction"])
+        state["stats"] = dict(self.shadow_stats)
+        state["busyFor"] = round(self.busy_for(), 3)
+        return state
+
+    def busy_for(self) -> float:
+        """Segundos até a última ação terminar (estimativa do modelo de duração)"""
+        return max(self._busy_until - time.monotonic(), 0.0)
+
+    @on_device_loop
+    async def action_finished(self) -> None:
+        """Espera a última ação disparada terminar (o Furby parar de se mexer/falar)"""
+        while True:
+            remaining = self.busy_for()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    @on_device_loop
+    async def scan(self, fresh: bool = False) -> List[Dict[str, Any]]:
+        # Com a descoberta contínua ligada, responde na hora a partir da tabela
+        if not fresh and DISCOVERY.running:
+            items = [
+                {"name": e["name"], "address": e["address"], "rssi": e["rssi"], "lastSeen": e["lastSeen"]}
+                for e in DISCOVERY.table.devices(furby_entry)
+            ]
+            if MOCK_MODE and not items:
+                items.append({"name": SIMULATED_FURBY_ADVERT["name"], "address": SIMULATED_FURBY_ADVERT["address"]})
+            return items
 
-    async def scan(self) -> List[Dict[str, Any]]:
         # Avisa se está conectado (dispositivos conectados podem não aparecer no scan)
         if self.device.connected:
             LOG.add("[scan] AVISO: Furby está conectado. Dispositivos conectados podem não aparecer no scan.")
@@ -1098,8 +1854,10 @@ class Controller:
         items = []
         for d in devices:
             name = d.name or ""
-            if name and ("Furby" in name or "Furby Connect" in name or "BlueFur" in name):
+            if is_furby(name):
                 items.append({"name": d.name, "address": d.address})
+                # Aproveita o scan completo para atualizar a tabela da descoberta contínua
+                DISCOVERY.table.update(d.address, d.name, getattr(d, "rssi", None))
         
         # No simulado, garante uma entrada fake para testes
         if MOCK_MODE and not items:
@@ -1114,12 +1872,44 @@ class Controller:
         
         return items
 
-    async def connect(self, address: Optional[str] = None):
-        async with self.lock:
-            await self.device.connect(address or PREFERRED_ADDRESS)
-
-    async def disconnect(self):
-        async with self.lock:
+    @on_device_loop
+    async def connect(self, address: Optional[str] = None, priority: str = "manual",
+                      timeout: Optional[float] = None):
+        self.held = False  # connect explícito: o auto-connect volta a cuidar do link
+        async with self.scheduler.slot(priority):
+            await asyncio.wait_for(self.device.connect(address or self.preferred_address), timeout)
+            # Cor da antena é desconhecida numa conexão nova
+            self._touch(antennaColor=None, connectedAt=time.time())
+            LINK_EVENTS.publish("connected", address=self.device.address)
+
+    def _new_device(self):
+        """Outro objeto de dispositivo do mesmo tipo, para tentativas de conexão em paralelo"""
+        if isinstance(self.device, SimulatedFurby):
+            return SimulatedFurby(latency=self.device.latency)
+        return RealFurby()
+
+    @on_device_loop
+    async def connect_best(self, addresses: List[str], priority: str = "manual",
+                           timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Conecta em paralelo aos candidatos; o primeiro que conectar vira o dispositivo deste Controller"""
+        self.held = False
+        async with self.scheduler.slot(priority):
+            device, address, results = await race_connect(
+                addresses, self._new_device, timeout,
+                on_result=lambda a, ok, took: CONNECT_HISTORY.record(a, ok, took),
+            )
+            if device is not None:
+                previous, self.device = self.device, device
+                previous.on_link_lost = None
+                device.on_link_lost = self._link_lost
+                self._touch(antennaColor=None, connectedAt=time.time())
+                LINK_EVENTS.publish("connected", address=device.address)
+            return {"address": address, "results": results}
+
+    @on_device_loop
+    async def disconnect(self, priority: str = "manual"):
+        async with self.scheduler.slot(priority):
+            address = self.device.address
             try:
                 if self.device.connected:
                     await self.device.disconnect()
@@ -1128,10 +1918,14 @@ class Controller:
                 # Força limpeza do estado mesmo se houver erro
                 self.device.connected = False
                 self.device.address = None
+            finally:
+                self._disconnected_locally(address, "local")
 
-    async def reset(self):
+    @on_device_loop
+    async def reset(self, priority: str = "manual"):
         """Desconecta e limpa o estado completamente"""
-        async with self.lock:
+        async with self.scheduler.slot(priority):
+            address = self.device.address
             try:
                 if self.device.connected:
                     await self.device.disconnect()
@@ -1141,106 +1935,172 @@ class Controller:
                 # Força limpeza do estado
                 self.device.connected = False
                 self.device.address = None
+                self._touch(lastAction=None)
+                self._disconnected_locally(address, "reset")
                 LOG.add("[reset] estado resetado")
 
-    async def set_color(self, r: int, g: int, b: int):
-        async with self.lock:
+    @on_device_loop
+    async def set_color(self, r: int, g: int, b: int, priority: str = "manual", force: bool = False) -> bool:
+        """Escreve a cor da antena; retorna False se ela já era essa (escrita BLE evitada)"""
+        async with self.scheduler.slot(priority):
             if not (0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255):
                 raise ValueError("RGB entre 0 e 255")
+            if not force and self.device.connected and self._shadow["antennaColor"] == (r, g, b):
+                self.shadow_stats["skipped"] += 1
+                return False
+            started = time.monotonic()
             await self.device.set_antenna_color(r, g, b)
+            self._measured("color", started)
+            self.shadow_stats["writes"] += 1
+            self._touch(antennaColor=(r, g, b))
+            return True
 
-    async def action(self, input: int, index: int, subindex: int, specific: int):
-        async with self.lock:
-            await self.device.trigger_action(input, index, subindex, specific)
+    @on_device_loop
+    async def set_color_latest(self, r: int, g: int, b: int, priority: str = "manual") -> tuple:
+        """
+        Define a cor da antena descartando cores intermediárias: enquanto uma
+        escrita está no ar, cores novas substituem a pendente. Retorna a cor
+        efetivamente escrita (a desta chamada ou uma mais nova).
+        """
+        if not (0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255):
+            raise ValueError("RGB entre 0 e 255")
+        self.color_stats["requested"] += 1
+        if self._color_pending is not None:
+            self.color_stats["coalesced"] += 1
+        self._color_pending = (r, g, b)
+        self._color_priority = priority
+        waiter = asyncio.get_running_loop().create_future()
+        self._color_waiters.append(waiter)
+        if self._color_task is None or self._color_task.done():
+            self._color_task = asyncio.ensure_future(self._flush_colors())
+        return await waiter
+
+    async def _flush_colors(self):
+        while self._color_pending is not None:
+            color, self._color_pending = self._color_pending, None
+            waiters, self._color_waiters = self._color_waiters, []
+            try:
+                if await self.set_color(*color, priority=self._color_priority):
+                    self.color_stats["sent"] += 1
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(color)
+            except Exception as e:
+                self.color_stats["errors"] += 1
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
 
-    async def play_wav(self, wav_path: str):
-        async with self.lock:
+    async def _fire_action(self, combo: tuple, priority: str, chain: bool, keeps_antenna: bool):
+        """
+        Escreve a ação na vez do escalonador. Com `chain`, ela é encadeada na
+        ação em andamento: a espera corre fora da vez (cores e outros comandos
+        seguem) e a escrita BLE sai adiantada pela latência medida, sobreposta
+        ao fim da ação anterior, para a nova começar quando a anterior termina.
+        """
+        while True:
+            if chain:
+                while self.busy_for() > self.write_latency.get("action", 0.0):
+                    await asyncio.sleep(self.busy_for() - self.write_latency.get("action", 0.0))
+            async with self.scheduler.slot(priority):
+                if chain and self.busy_for() > self.write_latency.get("action", 0.0) + 0.005:
+                    continue  # outra ação encadeada entrou na frente: espera ela também
+                started = time.monotonic()
+                await self.device.trigger_action(*combo)
+                self._measured("action", started)
+                self._record_action(combo, priority, keeps_antenna=keeps_antenna)
+                return
+
+    @on_device_loop
+    async def action(self, input: int, index: int, subindex: int, specific: int, priority: str = "manual",
+                     wait: bool = False, chain: bool = False):
+        """
+        Dispara uma ação; com `wait=True` só retorna quando ela termina (duração
+        aprendida); com `chain=True` ela começa quando a ação em andamento terminar
+        """
+        await self._fire_action((input, index, subindex, specific), priority, chain, keeps_antenna=False)
+        if wait:
+            # Fora da vez do escalonador: cores e outros comandos seguem enquanto o Furby se mexe
+            await self.action_finished()
+
+    def _record_action(self, combo: tuple, priority: str, keeps_antenna: bool):
+        changes: Dict[str, Any] = {"lastAction": {**combo_dict(combo), "priority": priority, "at": time.time()}}
+        if not keeps_antenna:
+            # Uma ação qualquer pode mexer na antena: a cor volta a ser desconhecida
+            changes["antennaColor"] = None
+        self._touch(**changes)
+        self._busy_until = time.monotonic() + DURATIONS.estimate(combo)
+
+    @on_device_loop
+    async def play_wav(self, wav_path: str, priority: str = "manual"):
+        async with self.scheduler.slot(priority):
             await self.device.play_wav(wav_path)
     
-    async def random_action(self):
+    @on_device_loop
+    async def random_action(self, priority: str = "manual", category: Optional[str] = None, chain: bool = False):
         """Dispara uma ação aleatória no Furby da lista de ações conhecidas"""
-        async with self.lock:
-            # Lista de ações divertidas do Furby
-            actions = [
-                # Generic reactions (pets)
-                (1, 0, 0, 0), (1, 0, 0, 1), (1, 0, 0, 3), (1, 0, 0, 4),
-                (1,0,1,1),(1,0,1,2),(1, 0, 1, 3), (1, 0, 1, 4), (1, 0, 1, 5),
-                (1, 2, 0, 0), (1, 2, 0, 1), (1, 2, 0, 2), (1, 2, 0, 3), (1,2,1,2),
-                (1, 3, 0, 5), (1, 3, 0, 6), (1, 3, 0, 10), (1, 3, 0, 12),
-                
-                # Tickles
-                (2, 0, 0, 0), (2, 0, 0, 1), (2, 0, 0, 2), (2, 0, 0, 3),
-                (2, 0, 1, 0), (2, 0, 1, 1), (2, 0, 1, 2), (2, 0, 1, 4),
-                (2, 3, 0, 0), (2, 3, 0, 1), (2, 3, 0, 4), (2, 3, 0, 11),
-                
-                # Pull/squeeze
-                (3, 0, 0, 0), (3, 0, 0, 3), (3, 0, 0, 4), (3, 0, 0, 5),
-                (3, 3, 0, 0), (3, 3, 0, 1), (3, 3, 0, 4), (3, 3, 0, 9),
-                
-                # Hugs
-                (5, 0, 0, 0), (5, 0, 1, 0), (5, 0, 1, 1), (5, 0, 1, 2),
-                (5, 3, 0, 0), (5, 3, 0, 3), (5, 3, 0, 4),
-                
-                # Farts & burps
-                (7, 0, 0, 0), (7, 0, 0, 1), (7, 0, 0, 2), (7, 0, 0, 4),
-                (7, 1, 0, 0), (7, 1, 0, 3), (7, 3, 0, 1), (7, 3, 0, 6),
-                
-                # Conversation
-                (8, 0, 0, 0), (8, 0, 0, 1), (8, 0, 0, 3), (8, 0, 0, 9),
-                (8, 0, 1, 0), (8, 0, 1, 3), (8, 0, 1, 4), (8, 0, 1, 9),
-                (8, 3, 0, 0), (8, 3, 0, 3), (8, 3, 0, 7), (8, 3, 0, 17),
-                
-                # Shaking
-                (9, 0, 0, 1), (9, 0, 1, 0), (9, 0, 1, 2), (9, 0, 1, 3),
-                (9, 3, 0, 0), (9, 3, 0, 3), (9, 3, 0, 4),
-                
-                # Upside down
-                (10, 0, 1, 0), (10, 0, 1, 1), (10, 0, 1, 4), (10, 0, 1, 6),
-                (10, 3, 0, 0), (10, 3, 0, 4), (10, 3, 0, 6),
-                
-                # Hiccup/burp
-                (16, 0, 0, 0), (16, 0, 2, 0), (16, 0, 2, 1), (16, 0, 2, 3),
-                
-                # Singing/dancing
-                (17, 0, 0, 0), (17, 0, 0, 1), (17, 0, 0, 4), (17, 0, 0, 5),
-                (17, 3, 0, 0), (17, 3, 0, 1), (17, 3, 0, 4), (17, 3, 0, 5),
-                
-                # Music reaction
-                (18, 0, 1, 0), (18, 0, 1, 1), (18, 0, 1, 3), (18, 0, 1, 6),
-                
-                # Loud noise
-                (20, 0, 0, 0), (20, 0, 0, 1), (20, 0, 0, 6),
-                
-                # Bored actions
-                (24, 2, 0, 0), (24, 2, 0, 1), (24, 2, 0, 2), (24, 2, 1, 0),
-                (24, 3, 0, 0), (24, 3, 0, 2), (24, 3, 0, 6),
-            ]
-            
-            # Escolhe uma ação aleatória da lista
-            input_val, index_val, subindex_val, specific_val = random.choice(actions)
-            
-            LOG.add(f"[random] 🎲 Ação aleatória: input={input_val}, index={index_val}, subindex={subindex_val}, specific={specific_val}")
-            await self.device.trigger_action(input_val, index_val, subindex_val, specific_val)
+        # Sorteio O(1) fora do escalonador: não ocupa a vez do dispositivo
+        input_val, index_val, subindex_val, specific_val = ACTION_CATALOG.sample(category)
+        LOG.add(f"[random] 🎲 Ação aleatória{f' ({category})' if category else ''}: input={input_val}, index={index_val}, subindex={subindex_val}, specific={specific_val}")
+        # As ações do catálogo foram escolhidas para não mudar a cor da antena
+        await self._fire_action((input_val, index_val, subindex_val, specific_val), priority, chain, keeps_antenna=True)
 
 CTRL = Controller()
 
+# Pool de Furbies: o principal (CTRL) + os de fleet.json + os simulados extras
+POOL = DevicePool()
+POOL.add("main", CTRL, groups=["main"])
+
+def load_fleet():
+    if FLEET_PATH.exists():
+        try:
+            for entry in json.loads(FLEET_PATH.read_text()).get("devices", []):
+                simulated = bool(entry.get("simulated"))
+                ctrl = Controller(device=SimulatedFurby()) if simulated else Controller(address=entry.get("address"))
+                POOL.add(entry["id"], ctrl, entry.get("groups", []), simulated=simulated)
+        except Exception as e:
+            LOG.add(f"[pool] ⚠️ erro ao carregar {FLEET_PATH}: {e}")
+    for i in range(SIMULATED_FLEET):
+        POOL.add(f"sim-{i + 1}", Controller(device=SimulatedFurby()), ["simulados"], simulated=True)
+
+load_fleet()
+
 # Instância global do detector de wake word (criada depois do CTRL)
 WAKE_WORD_DETECTOR = WakeWordDetector()
 
 # ----------------- Auto-Connect Background Task -----------------
 
 class AutoConnectManager:
-    """Gerencia conexão automática - escaneia e conecta continuamente até conseguir"""
+    """Gerencia conexão automática - reconecta direto ao último Furby e escaneia só se precisar"""
     
     def __init__(self):
         self.running = False
         self.task: Optional[asyncio.Task] = None
+        self.backoff = Backoff(base=RECONNECT_BASE_DELAY, cap=RECONNECT_MAX_DELAY)
+        self.stats = ReconnectStats()
+        self.direct_misses = 0  # tentativas diretas seguidas que falharam
+        self.lost_at: Optional[float] = None  # quando o link caiu (monotonic, pelo evento ou pela verificação)
+    
+    async def _candidates_from_scan(self) -> List[str]:
+        """Endereços para tentar a partir do scan: o preferido, se visível, senão os melhores por RSSI/histórico"""
+        LOG.add("[auto-connect] 🔍 Não conectado. Escaneando dispositivos...")
+        devices = await CTRL.scan()
+        if not devices:
+            LOG.add("[auto-connect] 🔍 Nenhum Furby encontrado no scan")
+            return []
+        if PREFERRED_ADDRESS:
+            for device in devices:
+                if device.get("address") == PREFERRED_ADDRESS:
+                    return [PREFERRED_ADDRESS]
+        ranked = CONNECT_HISTORY.rank(devices)
+        return [d["address"] for d in ranked[:max(CONNECT_RACE_WIDTH, 1)]]
     
     async def _auto_connect_loop(self):
-        """Loop que escaneia e tenta conectar continuamente"""
+        """Loop que reconecta (direto ou via scan) continuamente"""
         LOG.add("[auto-connect] 🔄 Iniciando loop de conexão automática...")
-        scan_interval = 5.0  # Escaneia a cada 5 segundos quando não conectado
+        discovery_wait = 30.0  # Sem Furby à vista: espera o anúncio dele por até X segundos
         was_connected = False  # Track previous connection state
+        seen_seq = LINK_EVENTS.seq  # último evento de link já tratado
         
         while self.running:
             try:
@@ -1251,13 +2111,20 @@ class AutoConnectManager:
                         LOG.add("[auto-connect] ✅ Furby conectado! Iniciando wake word detector...")
                         # Inicia o wake word detector automaticamente
                         WAKE_WORD_DETECTOR.start()
+                        LAST_DEVICE.remember(CTRL.device.address)
                         was_connected = True
                     # Se já estava conectado, verifica se o wake word detector está rodando
                     elif not WAKE_WORD_DETECTOR.running:
                         LOG.add("[auto-connect] ⚠️ Wake word detector não está rodando. Tentando iniciar...")
                         WAKE_WORD_DETECTOR.start()
                     
-                    await asyncio.sleep(2.0)  # Verifica a cada 2 segundos quando conectado
+                    # Acorda na hora com o callback de queda; os 2 s são só a rede de segurança
+                    event = await LINK_EVENTS.wait({"disconnected"}, since=seen_seq, timeout=2.0)
+                    if event is not None:
+                        seen_seq = event["seq"]
+                        # Evento antigo de antes da reconexão, ou desconexão pedida por nós, não é queda
+                        if not CTRL.device.connected and not event.get("intentional"):
+                            self.lost_at = event["monotonic"]
                     continue
                 
                 # Não está conectado
@@ -1265,54 +2132,76 @@ class AutoConnectManager:
                     LOG.add("[auto-connect] ⚠️ Furby desconectado. Parando wake word detector...")
                     WAKE_WORD_DETECTOR.stop()
                     was_connected = False
+                    if self.lost_at is None and not CTRL.held:
+                        self.lost_at = time.monotonic()
+                    self.direct_misses = 0
+                    self.backoff.reset()
+                    if CTRL.held:
+                        LOG.add("[auto-connect] ⏸ Desconectado pelo usuário; reconexão em pausa até um novo connect")
                 
-                # Tenta escanear e conectar
-                LOG.add("[auto-connect] 🔍 Não conectado. Escaneando dispositivos...")
+                if CTRL.held:
+                    # Desconexão intencional: nada de reconectar nem contar tempo fora do ar
+                    self.lost_at = None
+                    await LINK_EVENTS.wait({"connected"}, timeout=2.0)
+                    continue
                 
-                try:
-                    devices = await CTRL.scan()
-                    
-                    if devices and len(devices) > 0:
-                        # Tenta conectar ao primeiro Furby encontrado ou ao endereço preferido
-                        target_address = None
-                        
-                        if PREFERRED_ADDRESS:
-                            # Procura pelo endereço preferido primeiro
-                            for device in devices:
-                                if device.get("address") == PREFERRED_ADDRESS:
-                                    target_address = PREFERRED_ADDRESS
-                                    break
-                        
-                        # Se não encontrou o preferido ou não há preferido, usa o primeiro
-                        if not target_address and devices:
-                            target_address = devices[0].get("address")
-                        
-                        if target_address:
-                            LOG.add(f"[auto-connect] 🔌 Tentando conectar ao Furby @ {target_address}...")
-                            try:
-                                await CTRL.connect(target_address)
-                                if CTRL.device.connected:
-                                    LOG.add(f"[auto-connect] ✅ Conectado com sucesso ao Furby @ {target_address}!")
-                                    # Inicia o wake word detector imediatamente após conexão
-                                    LOG.add("[auto-connect] 🎤 Iniciando wake word detector automaticamente...")
-                                    WAKE_WORD_DETECTOR.start()
-                                    was_connected = True
-                                    await asyncio.sleep(0.5)  # Pequena pausa antes de continuar
-                                    continue
-                                else:
-                                    LOG.add("[auto-connect] ⚠️ Tentativa de conexão falhou (sem erro)")
-                            except Exception as conn_error:
-                                LOG.add(f"[auto-connect] ⚠️ Erro ao conectar: {conn_error}")
-                        else:
-                            LOG.add("[auto-connect] ⚠️ Nenhum endereço válido encontrado")
-                    else:
-                        LOG.add("[auto-connect] 🔍 Nenhum Furby encontrado no scan")
+                known = PREFERRED_ADDRESS or LAST_DEVICE.address
+                if known and self.direct_misses < RECONNECT_DIRECT_ATTEMPTS:
+                    # Reconexão rápida: conecta direto no último endereço bom, sem scan
+                    method, targets = "direct", [known]
+                    LOG.add(f"[auto-connect] ⚡ Reconectando direto a {known} "
+                            f"(tentativa {self.direct_misses + 1}/{RECONNECT_DIRECT_ATTEMPTS})...")
+                else:
+                    method, targets = "scan", []
+                    try:
+                        targets = await self._candidates_from_scan()
+                    except Exception as scan_error:
+                        LOG.add(f"[auto-connect] ⚠️ Erro no scan: {scan_error}")
+                    if not targets and DISCOVERY.running:
+                        # Nenhum Furby à vista: acorda no primeiro anúncio dele, em vez de escanear de novo
+                        await DEVICE_LOOP.call(DISCOVERY.table.wait_for(furby_entry, timeout=discovery_wait))
+                        continue
                 
-                except Exception as scan_error:
-                    LOG.add(f"[auto-connect] ⚠️ Erro no scan: {scan_error}")
+                if targets:
+                    started = time.monotonic()
+                    try:
+                        if len(targets) > 1:
+                            # Vários Furbies: tenta os melhores em paralelo, fica com o primeiro que conectar
+                            LOG.add(f"[auto-connect] 🏁 Conectando em paralelo a {len(targets)} Furbies: {', '.join(targets)}")
+                            await CTRL.connect_best(targets, timeout=RECONNECT_TIMEOUT)
+                        else:
+                            LOG.add(f"[auto-connect] 🔌 Tentando conectar ao Furby @ {targets[0]}...")
+                            await CTRL.connect(targets[0], timeout=RECONNECT_TIMEOUT)
+                    except Exception as conn_error:
+                        LOG.add(f"[auto-connect] ⚠️ Erro ao conectar: {conn_error}")
+                    ok = CTRL.device.connected
+                    if len(targets) == 1:
+                        CONNECT_HISTORY.record(targets[0], ok, time.monotonic() - started)
+                    self.stats.attempt(method, ok)
+                    if ok:
+                        target_address = CTRL.device.address or targets[0]
+                        LOG.add(f"[auto-connect] ✅ Conectado com sucesso ao Furby @ {target_address}!")
+                        LAST_DEVICE.remember(target_address)
+                        if self.lost_at is not None:
+                            downtime = time.monotonic() - self.lost_at
+                            self.stats.record(method, downtime)
+                            LOG.add(f"[auto-connect] ⏱ reconectado ({method}) em {downtime:.2f}s")
+                        self.lost_at = None
+                        seen_seq = LINK_EVENTS.seq
+                        self.direct_misses = 0
+                        self.backoff.reset()
+                        # Inicia o wake word detector imediatamente após conexão
+                        LOG.add("[auto-connect] 🎤 Iniciando wake word detector automaticamente...")
+                        WAKE_WORD_DETECTOR.start()
+                        was_connected = True
+                        continue
+                    if method == "direct":
+                        self.direct_misses += 1
+                        if self.direct_misses >= RECONNECT_DIRECT_ATTEMPTS:
+                            LOG.add("[auto-connect] 🔍 Reconexão direta falhou; voltando a escanear")
                 
-                # Aguarda antes de tentar novamente
-                await asyncio.sleep(scan_interval)
+                # Aguarda antes de tentar novamente (exponencial com jitter)
+                await asyncio.sleep(self.backoff.next())
                 
             except asyncio.CancelledError:
                 LOG.add("[auto-connect] ⏹ Loop de conexão cancelado")
@@ -1321,7 +2210,18 @@ class AutoConnectManager:
                 LOG.add(f"[auto-connect] ❌ Erro no loop de conexão: {e}")
                 import traceback
                 LOG.add(f"[auto-connect] {traceback.format_exc()}")
-                await asyncio.sleep(scan_interval)
+                await asyncio.sleep(self.backoff.next())
+    
+    def info(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "lastAddress": LAST_DEVICE.address,
+            "directMisses": self.direct_misses,
+            "directAttempts": RECONNECT_DIRECT_ATTEMPTS,
+            "held": CTRL.held,
+            "downSinceSec": round(time.monotonic() - self.lost_at, 3) if self.lost_at is not None else None,
+            "reconnects": self.stats.info(),
+        }
     
     def start(self):
         """Inicia o loop de conexão automática"""
@@ -1359,6 +2259,61 @@ class ActionBody(BaseModel):
     index: int
     subindex: int
     specific: int
+    wait: bool = False  # responde só quando a ação terminar (duração aprendida)
+    chain: bool = False  # começa quando a ação em andamento terminar, sem intervalo entre as duas
+
+class PoolDeviceBody(BaseModel):
+    id: str
+    address: Optional[str] = None
+    groups: List[str] = []
+    simulated: bool = False
+
+class PoolTargetBody(BaseModel):
+    target: str = "all"  # "all", "group:<nome>", id, ou lista separada por vírgulas
+
+class PoolColorBody(ColorBody):
+    target: str = "all"
+    align: bool = False  # compensa a latência de cada Furby para a cor chegar junto
+
+class PoolActionBody(BaseModel):
+    target: str = "all"
+    input: int
+    index: int
+    subindex: int
+    specific: int
+    align: bool = False
+
+class ChoreographyStep(BaseModel):
+    at: float  # segundos desde o início da passada
+    type: str  # "action", "color" ou "audio"
+    input: Optional[int] = None
+    index: Optional[int] = None
+    subindex: Optional[int] = None
+    specific: Optional[int] = None
+    r: Optional[int] = None
+    g: Optional[int] = None
+    b: Optional[int] = None
+    path: Optional[str] = None  # WAV do passo de áudio
+    output: str = "computer"  # áudio no alto-falante do computador ou "furby"
+
+class ChoreographyBody(BaseModel):
+    steps: List[ChoreographyStep]
+    loop: bool = False  # repete até ser cancelada
+    repeat: int = 1
+    duration: Optional[float] = None  # duração de uma passada (obrigatória para repetir)
+    priority: str = "manual"
+    compensate: bool = True  # adianta cada escrita pela latência BLE medida
+
+class AnimationBody(BaseModel):
+    keyframes: Optional[List[Dict[str, Any]]] = None  # [{"at": s, "color": [r,g,b], "easing": "ease_in_out"}]
+    preset: Optional[str] = None  # breathing, pulse ou fade (em vez de keyframes)
+    color: List[int] = [255, 192, 203]
+    base: List[int] = [0, 0, 0]
+    period: float = 2.0
+    loop: bool = False
+    duration: Optional[float] = None  # tempo total; em loop, None = até cancelar
+    priority: str = "random"  # comandos de classe maior interrompem a animação
+    max_fps: Optional[float] = None
 
 class ActionScanBody(BaseModel):
     input_start: int = 1
@@ -1369,11 +2324,43 @@ class ActionScanBody(BaseModel):
     subindex_end: int = 5
     specific_start: int = 0
     specific_end: int = 10
-    cooldown: float = 2.5
+    cooldown: float = 2.5  # espera máxima entre combos
+    adaptive_cooldown: bool = True  # espera só a duração aprendida do combo (medida no clipe), até o cooldown
+    cooldown_guard: float = 0.2  # folga depois do fim estimado da ação
     silence_check: bool = True
-    silence_threshold: float = 80.0
+    silence_threshold: float = 80.0  # limiar absoluto (só com noise_calibration=false)
+    noise_calibration: bool = True  # mede o ruído ambiente e classifica por SNR
+    calibration_seconds: float = 2.0  # gravação de ambiente antes da varredura
+    snr_threshold_db: float = 6.0  # abaixo disso (acima do piso) o combo é silencioso
+    noise_recalibrate_every: int = 50  # reamostra o ambiente a cada N combos (0 = nunca)
+    noise_recalibrate_seconds: float = 0.5
     silence_window: float = 1.0
     resume: bool = False
+    devices: Optional[List[str]] = None  # endereços de Furbies extras para dividir a varredura
+    simulated_devices: int = 0  # Furbies simulados extras (testes/benchmark)
+    mic_devices: Optional[List[int]] = None  # índice PyAudio do microfone de cada Furby (na ordem)
+    shared_mic: bool = True  # um só microfone: disparo + escuta fatiados no tempo
+    input_stride: int = 1
+    index_stride: int = 1
+    subindex_stride: int = 1
+    specific_stride: int = 1
+    combos: Optional[List[List[int]]] = None  # lista explícita [input, index, subindex, specific]
+    shuffle: bool = False
+    seed: Optional[int] = None  # semente da ordem embaralhada (reprodutível)
+    archive_clips: bool = True  # guarda o clipe pós-ação de cada combo (scan_clips.pcm/.idx)
+    fingerprint: bool = True  # agrupa combos que tocam o mesmo som (catálogo deduplicado)
+    adaptive: bool = False  # poda subárvores silenciosas/idênticas
+    adaptive_probe: int = 4  # K primeiros specifics testados em cada subárvore
+    adaptive_stride: int = 8  # passo da amostragem esparsa em subárvores podadas
+    adaptive_radius: int = 3  # vizinhos testados ao redor de cada hit
+    adaptive_tolerance: float = 10.0  # diferença de volume considerada "mesma resposta"
+
+def admit_command(ctrl: Controller, cost: float = 1.0):
+    """Reserva uma vaga na fila do Furby ou responde 429 imediatamente"""
+    try:
+        return ctrl.admission.admit(cost)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.info(), headers=retry_after_header(e))
 
 @app.get("/api/mode")
 async def get_mode():
@@ -1383,14 +2370,205 @@ async def get_mode():
         "openai_enabled": OPENAI_ENABLED,
         "has_openai_key": bool(OPENAI_API_KEY),
         "porcupine_enabled": PORCUPINE_ENABLED,
-        "has_porcupine_key": bool(PORCUPINE_ACCESS_KEY)
+        "has_porcupine_key": bool(PORCUPINE_ACCESS_KEY),
+        "deviceLoop": DEVICE_LOOP.info()
     }
 
+@app.get("/api/scheduler")
+async def api_scheduler():
+    """Fila de comandos do Furby: profundidade e tempo de espera por classe de prioridade"""
+    return CTRL.scheduler.info()
+
+@app.get("/api/state")
+async def api_state():
+    """Sombra do estado conhecido do Furby: conexão, cor da antena e última ação (somente leitura)"""
+    return CTRL.shadow()
+
+@app.get("/api/queue")
+async def api_queue():
+    """Métricas da fila de comandos da API (admitidos, recusados, fichas) e do escalonador"""
+    return {"admission": CTRL.admission.info(), "scheduler": CTRL.scheduler.info()}
+
+ANIMATIONS: Dict[str, AntennaAnimation] = {}  # só alterado no loop do dispositivo
+
+def _on_device_loop_soon(fn: Callable[..., None], *args: Any) -> None:
+    """Executa `fn` no loop do dispositivo: já, se estamos nele; senão, agendado de forma thread-safe"""
+    if DEVICE_LOOP.in_loop():
+        fn(*args)
+    else:
+        loop = DEVICE_LOOP.loop if DEVICE_LOOP.running else DEVICE_LOOP.start()
+        loop.call_soon_threadsafe(fn, *args)
+
+def _register_animation(animation: AntennaAnimation) -> None:
+    for other in ANIMATIONS.values():
+        if other.ctrl is animation.ctrl and other is not animation:
+            other.cancel()
+    ANIMATIONS[animation.id] = animation
+    for old in list(ANIMATIONS)[:-20]:
+        ANIMATIONS.pop(old)
+
+def _stop_animations(ctrl: Controller, names: Optional[Tuple[str, ...]]) -> None:
+    for animation in ANIMATIONS.values():
+        if animation.ctrl is ctrl and (names is None or animation.name in names):
+            animation.cancel()
+
+def active_animation(ctrl: Controller, name: Optional[str] = None) -> Optional[AntennaAnimation]:
+    """Animação ainda rodando no Furby (com esse nome, se dado); consultar no loop do dispositivo"""
+    for animation in reversed(list(ANIMATIONS.values())):
+        if animation.ctrl is ctrl and (name is None or animation.name == name) \
+                and animation.future is not None and not animation.future.done():
+            return animation
+    return None
+
+def start_animation(ctrl: Controller, keyframes: List[Dict[str, Any]], loop: bool = False,
+                    duration: Optional[float] = None, priority: str = "random",
+                    max_fps: Optional[float] = None, name: Optional[str] = None,
+                    compensate: bool = False) -> AntennaAnimation:
+    """
+    Inicia uma animação na antena do Furby, substituindo a que estiver rodando nele.
+    Pode ser chamada de qualquer thread: o registro e a troca acontecem no loop do dispositivo.
+    """
+    import uuid
+    animation = AntennaAnimation(uuid.uuid4().hex[:8], ctrl, keyframes, loop=loop, duration=duration,
+                                 priority=priority, max_fps=max_fps or ANTENNA_MAX_FPS, name=name,
+                                 compensate=compensate)
+    # Agendados em ordem no mesmo loop: a anterior é cancelada antes de a nova rodar
+    _on_device_loop_soon(_register_animation, animation)
+    animation.future = DEVICE_LOOP.submit(animation.run())
+    return animation
+
+def stop_animation(ctrl: Controller, names: Optional[Tuple[str, ...]] = None) -> None:
+    """Encerra a animação que estiver rodando no Furby (só as com esses nomes, se dados), de qualquer thread"""
+    _on_device_loop_soon(_stop_animations, ctrl, names)
+
+@app.post("/api/antenna/animation")
+async def api_animation_start(body: AnimationBody):
+    """Anima a antena com keyframes (ou um preset), no ritmo que o link BLE comporta"""
+    ticket = admit_command(CTRL, ANTENNA_COMMAND_COST)
+    try:
+        keyframes = body.keyframes if body.keyframes is not None else preset(
+            body.preset or "breathing", body.color, body.period, body.base)
+        animation = start_animation(CTRL, keyframes, loop=body.loop, duration=body.duration,
+                                    priority=body.priority, max_fps=body.max_fps, name=body.preset)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        ticket.release()
+    LOG.add(f"[antenna] ✨ animação {animation.id} ({animation.name or 'keyframes'}) iniciada")
+    return {"ok": True, "id": animation.id}
+
+@app.get("/api/antenna/animation")
+async def api_animation_list():
+    return {"animations": [animation.info() for animation in list(ANIMATIONS.values())]}
+
+@app.get("/api/antenna/animation/{aid}")
+async def api_animation_status(aid: str):
+    """Estado da animação, FPS alcançado e frames descartados"""
+    animation = ANIMATIONS.get(aid)
+    if animation is None:
+        raise HTTPException(status_code=404, detail="Animação não encontrada")
+    return animation.info()
+
+@app.post("/api/antenna/animation/{aid}/cancel")
+async def api_animation_cancel(aid: str):
+    animation = ANIMATIONS.get(aid)
+    if animation is None:
+        raise HTTPException(status_code=404, detail="Animação não encontrada")
+    return {"ok": True, "cancelled": animation.cancel()}
+
+CHOREOGRAPHIES: Dict[str, Choreography] = {}
+
+async def play_audio_in_background(path: str):
+    return await DEVICE_LOOP.run_blocking(CONVERSATION_MANAGER._play_audio_on_computer, path)
+
+@app.post("/api/choreography")
+async def api_choreography_start(body: ChoreographyBody):
+    """Executa uma linha do tempo de ações/cores/áudio no servidor (substitui a que estiver tocando)"""
+    import uuid
+    try:
+        steps = [{k: v for k, v in step.dict().items() if v is not None} for step in body.steps]
+        show = Choreography(
+            uuid.uuid4().hex[:8], CTRL, steps, loop=body.loop, repeat=body.repeat, duration=body.duration,
+            priority=body.priority, compensate=body.compensate, play_audio=play_audio_in_background,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for other in CHOREOGRAPHIES.values():
+        if other.cancel():
+            LOG.add(f"[choreo] ⏹ coreografia {other.id} substituída por {show.id}")
+    show.future = DEVICE_LOOP.submit(show.run())
+    CHOREOGRAPHIES[show.id] = show
+    for old in list(CHOREOGRAPHIES)[:-20]:
+        CHOREOGRAPHIES.pop(old)
+    LOG.add(f"[choreo] ▶ coreografia {show.id}: {len(steps)} passos" + (" em loop" if body.loop else ""))
+    return {"ok": True, "id": show.id}
+
+@app.get("/api/choreography")
+async def api_choreography_list():
+    return {"choreographies": [show.info(limit=0) for show in CHOREOGRAPHIES.values()]}
+
+@app.get("/api/choreography/{cid}")
+async def api_choreography_status(cid: str):
+    """Estado e erro de tempo por passo (chegada real - instante pedido)"""
+    show = CHOREOGRAPHIES.get(cid)
+    if show is None:
+        raise HTTPException(status_code=404, detail="Coreografia não encontrada")
+    return show.info()
+
+@app.post("/api/choreography/{cid}/cancel")
+async def api_choreography_cancel(cid: str):
+    show = CHOREOGRAPHIES.get(cid)
+    if show is None:
+        raise HTTPException(status_code=404, detail="Coreografia não encontrada")
+    cancelled = show.cancel()
+    if cancelled:
+        LOG.add(f"[choreo] ⏹ coreografia {cid} cancelada")
+    return {"ok": True, "cancelled": cancelled}
+
 @app.get("/api/scan")
-async def api_scan():
-    items = await CTRL.scan()
+async def api_scan(fresh: bool = False):
+    items = await CTRL.scan(fresh=fresh)
     return {"devices": items}
 
+@app.get("/api/audio/transfer")
+async def api_audio_transfer():
+    """Relatório do último upload de áudio ao Furby: progresso, MTU, janela, bytes/s"""
+    return {"transfer": getattr(CTRL.device, "last_transfer", None)}
+
+@app.get("/api/audio/slots")
+async def api_audio_slots():
+    """Sons já presentes em cada Furby (slot, tamanho, uso) e acertos do cache"""
+    return SOUND_SLOTS.info()
+
+@app.delete("/api/audio/slots")
+async def api_audio_slots_clear():
+    """Esquece os sons do Furby conectado (p.ex. depois de ele ser resetado)"""
+    return {"ok": True, "forgotten": SOUND_SLOTS.invalidate(CTRL.device.address or "")}
+
+@app.get("/api/connect/history")
+async def api_connect_history():
+    """Histórico de conexões por endereço e a ordem atual dos Furbies visíveis (RSSI + histórico)"""
+    async def snapshot():
+        return CONNECT_HISTORY.rank(DISCOVERY.table.devices(furby_entry))
+    return {**CONNECT_HISTORY.info(), "ranking": await DEVICE_LOOP.call(snapshot()), "width": CONNECT_RACE_WIDTH}
+
+@app.get("/api/link")
+async def api_link():
+    """Eventos recentes de conexão/queda do link (publicados pelo callback BLE)"""
+    return LINK_EVENTS.info()
+
+@app.get("/api/reconnect")
+async def api_reconnect():
+    """Último endereço conhecido e distribuição do tempo de reconexão (queda -> conectado)"""
+    return AUTO_CONNECT_MANAGER.info()
+
+@app.get("/api/discovery")
+async def api_discovery():
+    """Estado da descoberta BLE contínua e todos os dispositivos vistos (não só Furbies)"""
+    async def snapshot():
+        return {**DISCOVERY.info(), "table": DISCOVERY.table.devices()}
+    return await DEVICE_LOOP.call(snapshot())
+
 @app.post("/api/connect")
 async def api_connect(address: Optional[str] = None):
     try:
@@ -1419,23 +2597,114 @@ async def api_reset():
         LOG.add(f"[reset] erro: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/antenna")
+async def api_antenna_stats():
+    """Escritas de cor pedidas vs. enviadas ao Furby (as demais foram substituídas por cores mais novas)"""
+    return {"coalescing": CTRL.color_stats}
+
 @app.post("/api/antenna")
 async def api_antenna(body: ColorBody):
+    ticket = admit_command(CTRL, ANTENNA_COMMAND_COST)
     try:
-        await CTRL.set_color(body.r, body.g, body.b)
-        return {"ok": True}
+        color = await CTRL.set_color_latest(body.r, body.g, body.b)
+        return {"ok": True, "applied": list(color), "coalesced": list(color) != [body.r, body.g, body.b]}
     except Exception as e:
         LOG.add(f"[antenna] erro: {e}")
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        ticket.release()
 
 @app.post("/api/action")
 async def api_action(body: ActionBody):
+    ticket = admit_command(CTRL)
     try:
-        await CTRL.action(body.input, body.index, body.subindex, body.specific)
-        return {"ok": True}
+        await CTRL.action(body.input, body.index, body.subindex, body.specific, wait=body.wait, chain=body.chain)
+        return {"ok": True, "expectedDuration": round(DURATIONS.estimate((body.input, body.index, body.subindex, body.specific)), 3)}
     except Exception as e:
         LOG.add(f"[action] erro: {e}")
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        ticket.release()
+
+def pool_targets(target: str) -> List[str]:
+    try:
+        ids = POOL.select(target)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    if not ids:
+        raise HTTPException(status_code=400, detail="Nenhum Furby no alvo")
+    return ids
+
+def admitted(command, cost: float = 1.0):
+    """Comando do pool passando pela fila de admissão de cada Furby (recusado vira erro só daquele Furby)"""
+    async def run(ctrl):
+        with ctrl.admission.admit(cost):
+            return await command(ctrl)
+    return run
+
+@app.get("/api/pool")
+async def api_pool():
+    """Furbies do pool, grupos e o skew do último comando em paralelo"""
+    return POOL.info()
+
+@app.post("/api/pool/devices")
+async def api_pool_add(body: PoolDeviceBody):
+    if not (body.address or body.simulated or MOCK_MODE):
+        raise HTTPException(status_code=400, detail="Informe address (ou simulated=true)")
+    ctrl = Controller(device=SimulatedFurby()) if body.simulated else Controller(address=body.address)
+    try:
+        POOL.add(body.id, ctrl, body.groups, simulated=body.simulated or MOCK_MODE)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    LOG.add(f"[pool] ➕ Furby '{body.id}' adicionado (grupos: {', '.join(body.groups) or '-'})")
+    return {"ok": True, "id": body.id}
+
+@app.delete("/api/pool/devices/{device_id}")
+async def api_pool_remove(device_id: str):
+    if device_id == "main":
+        raise HTTPException(status_code=400, detail="O Furby principal não sai do pool")
+    if device_id not in POOL.members:
+        raise HTTPException(status_code=404, detail="Furby não encontrado no pool")
+    ctrl = POOL.remove(device_id)
+    await ctrl.disconnect()
+    LOG.add(f"[pool] ➖ Furby '{device_id}' removido")
+    return {"ok": True}
+
+@app.post("/api/pool/connect")
+async def api_pool_connect(body: PoolTargetBody):
+    ids = pool_targets(body.target)
+    async def connect(ctrl):
+        if not ctrl.device.connected:
+            await ctrl.connect(timeout=RECONNECT_TIMEOUT)
+        return ctrl.device.address
+    return await DEVICE_LOOP.call(POOL.fanout(ids, connect))
+
+@app.post("/api/pool/disconnect")
+async def api_pool_disconnect(body: PoolTargetBody):
+    ids = pool_targets(body.target)
+    return await DEVICE_LOOP.call(POOL.fanout(ids, lambda ctrl: ctrl.disconnect()))
+
+@app.post("/api/pool/antenna")
+async def api_pool_antenna(body: PoolColorBody):
+    ids = pool_targets(body.target)
+    command = admitted(lambda ctrl: ctrl.set_color_latest(body.r, body.g, body.b), ANTENNA_COMMAND_COST)
+    return await DEVICE_LOOP.call(POOL.fanout(ids, command, kind="color", align=body.align))
+
+@app.post("/api/pool/action")
+async def api_pool_action(body: PoolActionBody):
+    ids = pool_targets(body.target)
+    command = admitted(lambda ctrl: ctrl.action(body.input, body.index, body.subindex, body.specific))
+    return await DEVICE_LOOP.call(POOL.fanout(ids, command, kind="action", align=body.align))
+
+@app.post("/api/pool/random-action")
+async def api_pool_random_action(body: PoolTargetBody, category: Optional[str] = None):
+    if category is not None and category not in ACTION_CATALOG.categories:
+        raise HTTPException(status_code=404, detail=f"Categoria desconhecida: {category}")
+    ids = pool_targets(body.target)
+    combo = ACTION_CATALOG.sample(category)  # a mesma ação em todos, para reagirem juntos
+    command = admitted(lambda ctrl: ctrl.action(*combo, priority="random"))
+    result = await DEVICE_LOOP.call(POOL.fanout(ids, command, kind="action"))
+    return {**result, "action": combo_dict(combo)}
 
 @app.post("/api/play-audio")
 async def api_play_audio(file: UploadFile = File(...)):
@@ -1478,12 +2747,40 @@ async def api_play_audio_path(wav_path: str):
 @app.post("/api/random-action")
 async def api_random_action():
     """Dispara uma ação aleatória no Furby"""
+    ticket = admit_command(CTRL)
     try:
         await CTRL.random_action()
         return {"ok": True, "message": "Ação aleatória disparada!"}
     except Exception as e:
         LOG.add(f"[random-action] erro: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ticket.release()
+
+@app.post("/api/random-action/{category}")
+async def api_random_action_category(category: str):
+    """Dispara uma ação aleatória de uma categoria do catálogo (hugs, singing, ...)"""
+    if category not in ACTION_CATALOG.categories:
+        raise HTTPException(status_code=404, detail=f"Categoria desconhecida: {category}")
+    ticket = admit_command(CTRL)
+    try:
+        await CTRL.random_action(category=category)
+        return {"ok": True, "category": category, "action": CTRL.shadow()["lastAction"]}
+    except Exception as e:
+        LOG.add(f"[random-action] erro: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ticket.release()
+
+@app.get("/api/actions/durations")
+async def api_action_durations():
+    """Durações aprendidas (s) por combinação, usadas para saber quando o Furby está livre"""
+    return DURATIONS.info()
+
+@app.get("/api/actions/catalog")
+async def api_action_catalog():
+    """Categorias, pesos e durações medidas do catálogo de ações"""
+    return ACTION_CATALOG.info()
 
 @app.post("/api/action-scan/start")
 async def api_action_scan_start(body: ActionScanBody):
@@ -1507,6 +2804,52 @@ async def api_action_scan_stop():
 async def api_action_scan_status():
     return ACTION_SCANNER.status()
 
+@app.get("/api/action-scan/coverage")
+async def api_action_scan_coverage(
+    input_start: Optional[int] = None, input_end: Optional[int] = None,
+    index_start: Optional[int] = None, index_end: Optional[int] = None,
+    subindex_start: Optional[int] = None, subindex_end: Optional[int] = None,
+    specific_start: Optional[int] = None, specific_end: Optional[int] = None,
+):
+    """Cobertura do índice de combinações (faixas omitidas usam as da varredura atual ou 0–255)"""
+    query = locals()
+    base = scan_ranges(ACTION_SCANNER.settings) if ACTION_SCANNER.settings else dict(combo_index.FULL_RANGES)
+    ranges = {}
+    for dim, (start, end) in base.items():
+        start = query[f"{dim}_start"] if query[f"{dim}_start"] is not None else start
+        end = query[f"{dim}_end"] if query[f"{dim}_end"] is not None else end
+        if not 0 <= start <= end <= 255:
+            raise HTTPException(status_code=400, detail=f"Faixa inválida para {dim}: {start}..{end}")
+        ranges[dim] = (start, end)
+    return {"ranges": ranges, **ACTION_SCANNER.coverage(ranges)}
+
+@app.get("/api/action-scan/catalog")
+async def api_action_scan_catalog(limit: int = 50):
+    """Catálogo deduplicado de sons encontrados pelo scanner (mais frequentes primeiro)"""
+    return ACTION_SCANNER.catalog.summary(limit)
+
+@app.get("/api/action-scan/clip")
+async def api_action_scan_clip(input: int, index: int, subindex: int, specific: int):
+    """Streaming (WAV) do clipe gravado pelo scanner para uma combinação"""
+    stream = ACTION_SCANNER.clips.iter_wav((input, index, subindex, specific))
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Nenhum clipe gravado para essa combinação")
+    filename = f"combo_{input}_{index}_{subindex}_{specific}.wav"
+    return StreamingResponse(stream, media_type="audio/wav",
+                             headers={"Content-Disposition": f'inline; filename="{filename}"'})
+
+@app.get("/api/action-scan/combo")
+async def api_action_scan_combo(input: int, index: int, subindex: int, specific: int):
+    """Status de uma combinação no índice (O(1))"""
+    try:
+        status = ACTION_SCANNER.index.get((input, index, subindex, specific))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "combo": {"input": input, "index": index, "subindex": subindex, "specific": specific},
+        "status": combo_index.STATUS_NAMES.get(status, str(status)),
+    }
+
 @app.post("/api/wake-word/start")
 async def api_wake_word_start():
     """Inicia o detector de wake word"""
@@ -1601,6 +2944,18 @@ INDEX_HTML = """
       <input type="number" id="g" min="0" max="255" value="0"/>
       <input type="number" id="b" min="0" max="255" value="128"/>
       <button id="applyColor">Apply</button>
+      <input type="color" id="colorPicker" value="#800080" title="Arraste para mudar a cor ao vivo"/>
+    </div>
+    <div class="row">
+      <label>Animação:</label>
+      <select id="animPreset">
+        <option value="breathing">breathing</option>
+        <option value="pulse">pulse</option>
+        <option value="fade">fade</option>
+      </select>
+      <button id="startAnim">▶ Animar</button>
+      <button id="stopAnim">⏹ Parar</button>
+      <span id="animStatus" style="font-size: 11px; color: #888;"></span>
     </div>
   </div>
 
@@ -1693,15 +3048,28 @@ INDEX_HTML = """
     </div>
     <div class="row" style="margin-top: 8px; flex-wrap: wrap; gap: 6px;">
       <label>Cooldown (s)</label><input type="number" id="scanCooldown" value="2.5" step="0.5"/>
+      <label>Cooldown pela duração aprendida?</label><input type="checkbox" id="scanAdaptiveCooldown" checked/>
       <label>Silêncio?</label><input type="checkbox" id="scanSilence" checked/>
       <label>Threshold</label><input type="number" id="scanThreshold" value="80" step="5"/>
+      <label>Calibrar ruído?</label><input type="checkbox" id="scanNoiseCal" checked/>
+      <label>SNR (dB)</label><input type="number" id="scanSnr" value="6" step="1"/>
       <label>Janela (s)</label><input type="number" id="scanWindow" value="1.0" step="0.1"/>
       <label>Retomar estado salvo?</label><input type="checkbox" id="scanResume"/>
+      <label>Adaptativo?</label><input type="checkbox" id="scanAdaptive"/>
     </div>
     <div class="row" style="margin-top: 8px;">
       <button id="startActionScan" style="background:#fef3c7;border-color:#f59e0b;color:#92400e;">▶ Iniciar Varredura</button>
       <button id="stopActionScan" style="background:#fee2e2;border-color:#ef4444;color:#991b1b;">⏹ Parar</button>
     </div>
+    <div class="row" style="margin-top: 8px; flex-wrap: wrap; gap: 6px;">
+      <label>Ouvir clipe:</label>
+      <input type="number" id="clipInput" value="1" min="0" max="255"/>
+      <input type="number" id="clipIndex" value="0" min="0" max="255"/>
+      <input type="number" id="clipSub" value="0" min="0" max="255"/>
+      <input type="number" id="clipSpec" value="0" min="0" max="255"/>
+      <button id="playClip">▶ Ouvir</button>
+      <audio id="clipPlayer" controls style="height: 28px;"></audio>
+    </div>
     <div id="actionScanStatus" style="font-size:12px;margin-top:8px; background:#f3f4f6;padding:8px;border-radius:6px;border:1px solid #e5e7eb;">
       Status: aguardando...
     </div>
@@ -1764,7 +3132,7 @@ async function scan(){
       j.devices.forEach(function(d) {
         const opt = document.createElement('option');
         opt.value = d.address;
-        opt.text = d.name + ' (' + d.address + ')';
+        opt.text = d.name + ' (' + d.address + ')' + (d.rssi != null ? ' ' + d.rssi + ' dBm' : '');
         sel.appendChild(opt);
       });
       alert('Encontrados ' + j.devices.length + ' dispositivo(s)');
@@ -1823,6 +3191,39 @@ async function applyColor(){
   await fetch('/api/antenna', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({r,g,b})});
   await log();
 }
+function liveColor(){
+  // Envia sem esperar: o servidor descarta as cores intermediárias (a última vence)
+  const hex = document.getElementById('colorPicker').value;
+  const r = parseInt(hex.substr(1, 2), 16), g = parseInt(hex.substr(3, 2), 16), b = parseInt(hex.substr(5, 2), 16);
+  document.getElementById('r').value = r;
+  document.getElementById('g').value = g;
+  document.getElementById('b').value = b;
+  fetch('/api/antenna', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({r,g,b})});
+}
+let currentAnimation = null;
+async function startAnimation(){
+  const r = +document.getElementById('r').value;
+  const g = +document.getElementById('g').value;
+  const b = +document.getElementById('b').value;
+  const presetName = document.getElementById('animPreset').value;
+  const res = await fetch('/api/antenna/animation', {method:'POST', headers:{'Content-Type':'application/json'},
+    body: JSON.stringify({preset: presetName, color: [r,g,b], loop: presetName !== 'fade'})});
+  const data = await res.json();
+  currentAnimation = data.id || null;
+  refreshAnimation();
+  await log();
+}
+async function stopAnimation(){
+  if (currentAnimation) await fetch('/api/antenna/animation/' + currentAnimation + '/cancel', {method:'POST'});
+  refreshAnimation();
+}
+async function refreshAnimation(){
+  const el = document.getElementById('animStatus');
+  if (!currentAnimation || !el) return;
+  const a = await (await fetch('/api/antenna/animation/' + currentAnimation)).json();
+  el.textContent = a.state + ' | ' + a.fps + ' FPS (alvo ' + a.targetFps + ') | descartados: ' + a.dropped;
+  if (a.state === 'running') setTimeout(refreshAnimation, 1000);
+}
 async function sendAction(){
   const input = +document.getElementById('ainput').value;
   const index = +document.getElementById('aindex').value;
@@ -1991,10 +3392,14 @@ async function startActionScan(){
     specific_start: +document.getElementById('scanSpecStart').value,
     specific_end: +document.getElementById('scanSpecEnd').value,
     cooldown: +document.getElementById('scanCooldown').value,
+    adaptive_cooldown: document.getElementById('scanAdaptiveCooldown').checked,
     silence_check: document.getElementById('scanSilence').checked,
     silence_threshold: +document.getElementById('scanThreshold').value,
+    noise_calibration: document.getElementById('scanNoiseCal').checked,
+    snr_threshold_db: +document.getElementById('scanSnr').value,
     silence_window: +document.getElementById('scanWindow').value,
-    resume: document.getElementById('scanResume').checked
+    resume: document.getElementById('scanResume').checked,
+    adaptive: document.getElementById('scanAdaptive').checked
   };
   try {
     await fetch('/api/action-scan/start', {
@@ -2017,6 +3422,19 @@ async function stopActionScan(){
   }
 }
 
+function playClip(){
+  const q = new URLSearchParams({
+    input: document.getElementById('clipInput').value,
+    index: document.getElementById('clipIndex').value,
+    subindex: document.getElementById('clipSub').value,
+    specific: document.getElementById('clipSpec').value
+  });
+  const player = document.getElementById('clipPlayer');
+  player.onerror = function(){ alert('Nenhum clipe gravado para essa combinação'); };
+  player.src = '/api/action-scan/clip?' + q.toString();
+  player.play();
+}
+
 async function refreshActionScanStatus(){
   try {
     const res = await fetch('/api/action-scan/status');
@@ -2028,11 +3446,28 @@ async function refreshActionScanStatus(){
       text += `Atual: input=${status.current.input}, index=${status.current.index}, sub=${status.current.subindex}, spec=${status.current.specific}\\n`;
     }
     text += `Processados: ${status.processed || 0}\\n`;
+    if (status.progress && status.progress.total) {
+      const p = status.progress;
+      text += `Progresso: ${p.position}/${p.total} (${p.percent}%)`;
+      if (p.combosPerSec) text += ` | ${p.combosPerSec} combos/s`;
+      if (p.etaSeconds !== null && p.etaSeconds !== undefined) text += ` | ETA ${Math.round(p.etaSeconds / 60)} min`;
+      text += '\\n';
+    }
+    if (status.adaptive) {
+      const a = status.adaptive;
+      text += `Adaptativo: ${a.tested} testados / ${a.exhaustive} exaustivo (${a.savedPct}% pulados) | hits: ${a.hits} | subárvores podadas: ${a.prunedSubtrees}/${a.subtrees}\\n`;
+    }
     if (status.lastVolume) {
-      text += `Último volume médio: ${status.lastVolume.toFixed(1)}\\n`;
+      text += `Último volume médio: ${status.lastVolume.toFixed(1)}`;
+      if (status.lastSnrDb !== null && status.lastSnrDb !== undefined) text += ` | SNR ${status.lastSnrDb} dB`;
+      text += '\\n';
     }
+    Object.entries(status.noiseFloor || {}).forEach(([mic, f]) => {
+      text += `Piso de ruído (mic ${mic}): ${f.level} RMS (calibrado ${f.calibratedLevel}, deriva ${f.driftDb} dB)\\n`;
+    });
     if (status.settings) {
-      text += `Cooldown: ${status.settings.cooldown || '-'}s | Threshold: ${status.settings.silence_threshold || '-'}`;
+      const s = status.settings;
+      text += `Cooldown: ${s.cooldown || '-'}s | ` + (s.noise_calibration ? `SNR mínimo: ${s.snr_threshold_db} dB` : `Threshold: ${s.silence_threshold || '-'}`);
       text += status.settings.silence_check ? ' (monitorando silêncio)\\n' : ' (sem silêncio)\\n';
     }
     if (status.silentCandidates && status.silentCandidates.length) {
@@ -2090,6 +3525,14 @@ function initApp() {
     var applyColorBtn = document.getElementById('applyColor');
     if (applyColorBtn) applyColorBtn.onclick = applyColor;
     
+    var colorPicker = document.getElementById('colorPicker');
+    if (colorPicker) colorPicker.oninput = liveColor;
+
+    var startAnimBtn = document.getElementById('startAnim');
+    if (startAnimBtn) startAnimBtn.onclick = startAnimation;
+    var stopAnimBtn = document.getElementById('stopAnim');
+    if (stopAnimBtn) stopAnimBtn.onclick = stopAnimation;
+    
     var sendActionBtn = document.getElementById('sendAction');
     if (sendActionBtn) sendActionBtn.onclick = sendAction;
     
@@ -2109,6 +3552,8 @@ function initApp() {
     if (startActionScanBtn) startActionScanBtn.onclick = startActionScan;
     var stopActionScanBtn = document.getElementById('stopActionScan');
     if (stopActionScanBtn) stopActionScanBtn.onclick = stopActionScan;
+    var playClipBtn = document.getElementById('playClip');
+    if (playClipBtn) playClipBtn.onclick = playClip;
     
     setInterval(log, 1200);
     setInterval(refreshWakeWordStatus, 3000);
@@ -2148,7 +3593,10 @@ try {
 
 @app.on_event("startup")
 async def startup_event():
-    """Inicia o auto-connect quando o app inicia"""
+    """Inicia o loop do dispositivo e o auto-connect quando o app inicia"""
+    DEVICE_LOOP.start()
+    if BLE_DISCOVERY:
+        await DEVICE_LOOP.call(DISCOVERY.start())
     AUTO_CONNECT_MANAGER.start()
     # Se já estiver conectado quando o app inicia, inicia o wake word detector
     if CTRL.device.connected:
@@ -2157,8 +3605,13 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Para o auto-connect quando o app encerra"""
+    """Para o auto-connect e o loop do dispositivo quando o app encerra"""
     AUTO_CONNECT_MANAGER.stop()
+    if DISCOVERY.running:
+        await DEVICE_LOOP.call(DISCOVERY.stop())
+    DEVICE_LOOP.stop()
+    if DURATIONS.dirty:
+        DURATIONS.save()
 
 @app.get("/")
 async def index():
@@ -0,0 +1,210 @@
+"""
+Impressões digitais acústicas (NumPy) para o catálogo de sons do scanner.
+
+Cada clipe (PCM int16 mono) vira:
+  - um vetor de 32 dimensões: energia média em 16 bandas log-espaçadas +
+    envelope temporal reamostrado em 16 pontos, normalizado;
+  - um hash SimHash de 64 bits desse vetor, usado para achar candidatos.
+
+O catálogo agrupa clipes com a mesma impressão em "sons distintos". A busca
+usa multi-index hashing: o hash é dividido em 8 pedaços de 8 bits e cada
+pedaço indexa uma tabela. Dois hashes com distância de Hamming <= 7
+compartilham pelo menos um pedaço idêntico, então só os clusters desses
+baldes são comparados (vetorizado), e a busca continua rápida com dezenas
+de milhares de sons.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME = 512
+HOP = 256
+N_BANDS = 16
+N_ENVELOPE = 16
+VECTOR_DIM = N_BANDS + N_ENVELOPE
+HASH_CHUNKS = 8  # 8 pedaços de 8 bits
+
+_PROJECTIONS = np.random.default_rng(0x46555242).standard_normal((64, VECTOR_DIM)).astype(np.float32)
+_BIT_WEIGHTS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+def _band_matrix(rate: int) -> np.ndarray:
+    """Matriz [bins da FFT, bandas] que soma a energia em bandas log-espaçadas (100 Hz..Nyquist)"""
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / rate)
+    edges = np.geomspace(100.0, rate / 2, N_BANDS + 1)
+    band = np.searchsorted(edges, freqs, side="right") - 1
+    matrix = np.zeros((len(freqs), N_BANDS), dtype=np.float32)
+    valid = (band >= 0) & (band < N_BANDS)
+    matrix[np.nonzero(valid)[0], band[valid]] = 1.0
+    return matrix
+
+
+_BANDS_CACHE: Dict[int, np.ndarray] = {}
+_WINDOW = np.hanning(FRAME).astype(np.float32)
+
+
+def _frames(clip: np.ndarray) -> np.ndarray:
+    samples = np.asarray(clip, dtype=np.float32) / 32768.0
+    if len(samples) < FRAME:
+        samples = np.pad(samples, (0, FRAME - len(samples)))
+    count = 1 + (len(samples) - FRAME) // HOP
+    return np.lib.stride_tricks.sliding_window_view(samples, FRAME)[::HOP][:count]
+
+
+def active_duration(clip: np.ndarray, rate: int = SAMPLE_RATE, floor: float = 0.0, rel_db: float = -30.0) -> float:
+    """Duração (s) entre o primeiro e o último frame acima do limiar de atividade"""
+    rms = np.sqrt((_frames(clip) ** 2).mean(axis=1)) * 32768.0
+    if not len(rms) or rms.max() <= 0:
+        return 0.0
+    # o 10º percentil aproxima o ruído de fundo do próprio clipe
+    threshold = max(rms.max() * 10 ** (rel_db / 20.0), floor, 2.0 * np.percentile(rms, 10))
+    active = np.nonzero(rms >= threshold)[0]
+    if not len(active):
+        return 0.0
+    return float((active[-1] - active[0]) * HOP + FRAME) / rate
+
+
+def fingerprint(clip: np.ndarray, rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, int]:
+    """Retorna (vetor float32 normalizado, hash de 64 bits) de um clipe int16"""
+    bands = _BANDS_CACHE.get(rate)
+    if bands is None:
+        bands = _BANDS_CACHE[rate] = _band_matrix(rate)
+    frames = _frames(clip)
+    spectrum = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+    energy = np.log10(spectrum @ bands + 1e-10)  # [frames, bandas]
+    frame_power = np.log10((frames ** 2).mean(axis=1) + 1e-10)
+
+    band_profile = energy.mean(axis=0)
+    band_profile -= band_profile.mean()
+    positions = np.linspace(0, len(frame_power) - 1, N_ENVELOPE)
+    envelope = np.interp(positions, np.arange(len(frame_power)), frame_power)
+    envelope -= envelope.mean()
+
+    vector = np.concatenate([band_profile, envelope]).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    bits = (_PROJECTIONS @ vector) > 0
+    return vector, int((_BIT_WEIGHTS[bits]).sum())
+
+
+def _chunks(value: int) -> List[int]:
+    return [(value >> (8 * i)) & 0xFF for i in range(HASH_CHUNKS)]
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class SoundCatalog:
+    """Catálogo deduplicado de sons: cada cluster guarda combos com a mesma impressão"""
+
+    def __init__(self, path: Union[str, Path], max_hamming: int = 7, min_similarity: float = 0.9):
+        self.path = Path(path)
+        self.max_hamming = max_hamming
+        self.min_similarity = min_similarity
+        self.clusters: List[Dict[str, Any]] = []
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(HASH_CHUNKS)]
+        self._dirty = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except Exception:
+            return
+        clusters = data.get("clusters", [])
+        self.clusters = [{k: v for k, v in c.items() if k not in ("hash", "vector")} for c in clusters]
+        self._hashes = np.array([int(c["hash"], 16) for c in clusters], dtype=np.uint64)
+        self._vectors = np.array([c["vector"] for c in clusters], dtype=np.float32).reshape(-1, VECTOR_DIM)
+        for cid, value in enumerate(self._hashes.tolist()):
+            for table, chunk in zip(self._tables, _chunks(value)):
+                table.setdefault(chunk, []).append(cid)
+
+    def save(self) -> None:
+        clusters = [
+            {**c, "hash": f"{h:016x}", "vector": [round(float(x), 4) for x in v]}
+            for c, h, v in zip(self.clusters, self._hashes.tolist(), self._vectors[: len(self.clusters)])
+        ]
+        self.path.write_text(json.dumps({"clusters": clusters}))
+        self._dirty = 0
+
+    def match(self, vector: np.ndarray, value: int) -> Optional[int]:
+        """Id do cluster mais parecido (ou None se o som é novo)"""
+        candidates = set()
+        for table, chunk in zip(self._tables, _chunks(value)):
+            candidates.update(table.get(chunk, ()))
+        if not candidates:
+            return None
+        ids = np.fromiter(candidates, dtype=np.int64)
+        distances = _popcount(self._hashes[ids] ^ np.uint64(value))
+        close = distances <= self.max_hamming
+        if not close.any():
+            return None
+        ids = ids[close]
+        similarity = self._vectors[ids] @ vector
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.min_similarity:
+            return None
+        return int(ids[best])
+
+    def add(self, combo: Dict[str, int], clip: np.ndarray, rate: int = SAMPLE_RATE, floor: float = 0.0) -> Dict[str, Any]:
+        """Registra o clipe de uma combinação e retorna o cluster (novo ou existente)"""
+        vector, value = fingerprint(clip, rate)
+        duration = round(active_duration(clip, rate, floor), 3)
+        cid = self.match(vector, value)
+        if cid is None:
+            cid = len(self.clusters)
+            self.clusters.append({
+                "id": cid,
+                "representative": dict(combo),
+                "members": [dict(combo)],
+                "duration": duration,
+            })
+            if cid == len(self._hashes):
+                # cresce por duplicação para manter inserções O(1) amortizadas
+                capacity = max(64, 2 * cid)
+                self._hashes = np.resize(self._hashes, capacity)
+                self._vectors = np.resize(self._vectors, (capacity, VECTOR_DIM))
+            self._hashes[cid] = value
+            self._vectors[cid] = vector
+            for table, chunk in zip(self._tables, _chunks(value)):
+                table.setdefault(chunk, []).append(cid)
+        else:
+            cluster = self.clusters[cid]
+            if dict(combo) not in cluster["members"]:
+                cluster["members"].append(dict(combo))
+            n = len(cluster["members"])
+            cluster["duration"] = round(cluster["duration"] + (duration - cluster["duration"]) / n, 3)
+        self._dirty += 1
+        return self.clusters[cid]
+
+    def summary(self, limit: int = 50) -> Dict[str, Any]:
+        ordered = sorted(self.clusters, key=lambda c: len(c["members"]), reverse=True)
+        return {
+            "distinctSounds": len(self.clusters),
+            "clips": sum(len(c["members"]) for c in self.clusters),
+            "sounds": [
+                {
+                    "id": c["id"],
+                    "representative": c["representative"],
+                    "count": len(c["members"]),
+                    "duration": c["duration"],
+                    "members": c["members"][:10],
+                }
+                for c in ordered[:limit]
+            ],
+        }
+
+    @property
+    def dirty(self) -> int:
+        return self._dirty
@@ -0,0 +1,1368 @@
+#!/usr/bin/env python3
+"""
+Benchmarks em modo simulado (não precisa de Furby nem microfone)
+Execute: python3 benchmark.py <cenário> [opções]
+
+Cenários:
+  scan      vazão da varredura de ações distribuída entre N Furbies simulados (e microfone compartilhado)
+  clips     crescimento do arquivo de clipes e tempo de leitura (100k clipes)
+  noise     detecção de silêncio: limiar fixo vs. SNR contra o piso adaptativo
+  dispatch  custo de despachar uma ação: loop novo por chamada vs. loop persistente
+  antenna   arrastar o seletor de cor: escritas BLE enviadas e atraso da antena
+  shadow    escritas BLE evitadas pela sombra de estado numa sessão de conversa
+  priority  espera de comandos da conversa com o scanner saturando o Furby (FIFO vs. prioridade)
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ["MOCK_MODE"] = "true"
+warnings.filterwarnings("ignore", category=DeprecationWarning)  # ActionScanBody.dict() (pydantic v2)
+
+
+def load_app(workdir: str):
+    """Importa o app dentro de um diretório temporário (os arquivos de estado ficam lá)"""
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
+
+
+def bench_scan(args):
+    print("=" * 70)
+    print("🔍 VARREDURA DISTRIBUÍDA (Furbies simulados)")
+    print("=" * 70)
+    print(f"  combos por rodada: {args.combos} | cooldown: {args.cooldown}s | latência BLE: {args.latency}s")
+    print(f"  Furbies com velocidades diferentes (até +{int(args.skew * 100)}%) para forçar roubo de trabalho\n")
+    base_rate = None
+    for n in args.devices:
+        with tempfile.TemporaryDirectory() as workdir:
+            app = load_app(workdir)
+            scanner = app.ActionScanner()
+            params = app.ActionScanBody(
+                index_end=min(args.combos, 256) - 1, subindex_end=-(-args.combos // 256) - 1, specific_end=0,
+                cooldown=args.cooldown, silence_check=False, simulated_devices=n - 1,
+            ).dict()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scanner.start(params)
+                # Furbies heterogêneos: cada um com uma latência BLE diferente
+                for worker in scanner.workers:
+                    worker.ctrl.device.latency = args.latency * (1 + args.skew * worker.id / max(n - 1, 1))
+                while scanner.running:
+                    time.sleep(0.01)
+            elapsed = scanner.finished_at - scanner.started_at
+            rate = scanner.processed / elapsed
+            base_rate = base_rate or rate
+            steals = sum(w.steals for w in scanner.workers)
+            per_device = ", ".join(str(w.processed) for w in scanner.workers)
+            print(f"  {n:>3} Furby(s): {rate:8.1f} combos/s | speedup {rate / base_rate:5.2f}x "
+                  f"(ideal {n}x) | roubos: {steals:3d} | por Furby: [{per_device}]")
+            sys.modules.pop("app", None)
+    bench_scan_shared_mic(args)
+
+
+def bench_scan_shared_mic(args):
+    """Dois Furbies, um microfone: um combo silencioso não pode herdar o som do vizinho"""
+    import numpy as np
+
+    rate = 16000
+    rng = np.random.default_rng(1)
+    loud = {i: bool(v) for i, v in enumerate(rng.random(args.mic_combos) < 0.5)}
+    print(f"\n  microfone compartilhado: 2 Furbies, {args.mic_combos} combos ({sum(loud.values())} tocam "
+          f"{args.mic_sound}s) | janela {args.mic_window}s | cooldown {args.mic_cooldown}s")
+    for label, shared, adaptive in (("sem fatiar o microfone", False, False),
+                                    ("fatiado, cooldown fixo", True, False),
+                                    ("fatiado, duração aprendida", True, True)):
+        with tempfile.TemporaryDirectory() as workdir:
+            app = load_app(workdir)
+            sounding = []  # (início, fim) de cada som disparado, de qualquer Furby
+            original = app.SimulatedFurby.trigger_action
+
+            async def trigger(self, input, index, subindex, specific, original=original):
+                await original(self, input, index, subindex, specific)
+                if loud[index]:
+                    now = time.monotonic()
+                    sounding.append((now, now + args.mic_sound))
+
+            def record(duration, rate=rate, input_device_index=None):
+                t = time.monotonic() + np.arange(int(duration * rate)) / rate
+                time.sleep(duration)
+                clip = rng.normal(0, 30, len(t))
+                for start, end in list(sounding):
+                    on = (t >= start) & (t < end)
+                    clip[on] += 3000 * np.sin(2 * np.pi * 440 * t[on])
+                return clip.astype(np.int16)
+
+            app.SimulatedFurby.trigger_action = trigger
+            app.record_clip = record
+            scanner = app.ActionScanner()
+            params = app.ActionScanBody(
+                index_end=args.mic_combos - 1, subindex_end=0, specific_end=0, cooldown=args.mic_cooldown,
+                silence_window=args.mic_window, noise_calibration=False, adaptive_cooldown=adaptive,
+                archive_clips=False, fingerprint=False, simulated_devices=1, shared_mic=shared,
+            ).dict()
+            with contextlib.redirect_stdout(io.StringIO()):
+                app.DEVICE_LOOP.run(app.CTRL.connect())
+                scanner.start(params)
+                while scanner.running:
+                    time.sleep(0.01)
+            elapsed = scanner.finished_at - scanner.started_at
+            status = {i: scanner.index.get((1, i, 0, 0)) for i in loud}
+            polluted = sum(1 for i, v in status.items() if not loud[i] and v != app.combo_index.SILENT)
+            missed = sum(1 for i, v in status.items() if loud[i] and v != app.combo_index.AUDIBLE)
+            print(f"  {label:<26}: {elapsed:6.2f}s | silenciosos vistos como audíveis: {polluted:2d} | "
+                  f"audíveis perdidos: {missed}")
+            sys.modules.pop("app", None)
+
+
+def bench_clips(args):
+    import numpy as np
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from clip_archive import ClipArchive
+
+    print("=" * 70)
+    print("🎞️  ARQUIVO DE CLIPES DO SCANNER")
+    print("=" * 70)
+    samples = int(16000 * args.seconds)
+    print(f"  {args.count} clipes de {args.seconds}s ({samples} amostras, {samples * 2} bytes PCM)\n")
+    rng = np.random.default_rng(0)
+    clip = rng.integers(-2000, 2000, samples, dtype=np.int16)
+    combos = [(1, (i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF) for i in range(args.count)]
+    with tempfile.TemporaryDirectory() as workdir:
+        data_path, index_path = os.path.join(workdir, "c.pcm"), os.path.join(workdir, "c.idx")
+        archive = ClipArchive(data_path, index_path)
+        marks = {args.count // 10, args.count // 2, args.count}
+        t0 = time.perf_counter()
+        for i, combo in enumerate(combos, 1):
+            archive.append(combo, clip)
+            if i in marks:
+                info = archive.info()
+                print(f"  {i:>7} clipes: dados {info['dataBytes'] / 1e6:9.1f} MB | índice {info['indexBytes'] / 1e6:6.2f} MB "
+                      f"({(info['indexBytes']) / i:.1f} B/clipe)")
+        write_s = time.perf_counter() - t0
+        archive.close()
+        print(f"  gravação: {args.count / write_s:,.0f} clipes/s")
+        per_second = (samples * 2 + 16) / args.seconds
+        print(f"  projeção p/ janela de 1s: {per_second * args.count / 1e9:.2f} GB por {args.count} clipes\n")
+
+        t0 = time.perf_counter()
+        archive = ClipArchive(data_path, index_path)
+        print(f"  reabrir (carregar índice): {(time.perf_counter() - t0) * 1000:.1f} ms")
+        picks = rng.integers(0, args.count, args.reads)
+        times = []
+        for i in picks.tolist():
+            t0 = time.perf_counter()
+            data = archive.read(combos[i])
+            times.append(time.perf_counter() - t0)
+            assert data is not None and len(data) == samples
+        times_us = np.array(times) * 1e6
+        print(f"  leitura aleatória ({args.reads}x): média {times_us.mean():.1f} µs | "
+              f"p50 {np.percentile(times_us, 50):.1f} µs | p99 {np.percentile(times_us, 99):.1f} µs")
+        archive.close()
+
+
+def bench_noise(args):
+    import numpy as np
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from noise_floor import NoiseFloor
+
+    print("=" * 70)
+    print("🎚️  DETECÇÃO DE SILÊNCIO COM RUÍDO DE SALA VARIÁVEL")
+    print("=" * 70)
+    print(f"  {args.combos} combos | {int(args.silent * 100)}% silenciosos | ruído de fundo (média abs.) "
+          f"{args.min_noise:.0f}→{args.max_noise:.0f} | limiar fixo {args.threshold} | SNR mínimo {args.snr} dB\n")
+    rate = 16000
+    window = rate  # janela de escuta de 1s
+    rng = np.random.default_rng(args.seed)
+
+    def noise_std(i: int) -> float:
+        # deriva lenta (sala esvaziando/enchendo): média abs. = 0.8 * desvio padrão
+        phase = 0.5 - 0.5 * np.cos(2 * np.pi * i / args.combos)
+        return (args.min_noise + (args.max_noise - args.min_noise) * phase) / 0.8
+
+    def ambient(i: int, samples: int) -> np.ndarray:
+        return rng.normal(0, noise_std(i), samples)
+
+    def to_clip(x: np.ndarray) -> np.ndarray:
+        return np.clip(x, -32768, 32767).astype(np.int16)
+
+    floor = NoiseFloor()
+    floor.calibrate(to_clip(ambient(0, 2 * rate)))
+    results = {"fixed": [0, 0], "snr": [0, 0]}  # [falsos silenciosos, falsos audíveis]
+    t = np.arange(window) / rate
+    audible_total = 0
+    for i in range(args.combos):
+        if floor.due(args.recalibrate):
+            floor.observe(to_clip(ambient(i, rate // 2)), ambient=True)
+        x = ambient(i, window)
+        silent = rng.random() < args.silent
+        if not silent:
+            audible_total += 1
+            # som da ação: tom curto, 6–40 dB acima do ruído do momento
+            length = int(rate * rng.uniform(0.1, 0.8))
+            start = rng.integers(0, window - length)
+            amp = noise_std(i) * 10 ** (rng.uniform(6, 40) / 20) * np.sqrt(2)
+            x[start:start + length] += amp * np.sin(2 * np.pi * rng.uniform(300, 3000) * t[:length])
+        clip = to_clip(x)
+        fixed_silent = np.abs(clip.astype(np.int32)).mean() < args.threshold
+        snr_silent = floor.snr_db(clip) < args.snr
+        floor.observe(clip)
+        for name, said_silent in (("fixed", fixed_silent), ("snr", snr_silent)):
+            if said_silent and not silent:
+                results[name][0] += 1
+            elif silent and not said_silent:
+                results[name][1] += 1
+
+    silent_total = args.combos - audible_total
+    for name, label in (("fixed", f"limiar fixo ({args.threshold})"), ("snr", f"SNR >= {args.snr} dB")):
+        fp, fn = results[name]
+        print(f"  {label:<20}: falsos silenciosos {fp:4d}/{audible_total} ({100 * fp / max(audible_total, 1):5.1f}%) | "
+              f"falsos audíveis {fn:4d}/{silent_total} ({100 * fn / max(silent_total, 1):5.1f}%)")
+    info = floor.info()
+    print(f"\n  piso final: {info['level']} RMS (calibrado {info['calibratedLevel']}, deriva {info['driftDb']} dB) | "
+          f"amostras aceitas {info['updates']}, descartadas {info['rejected']}")
+
+
+def bench_dispatch(args):
+    import asyncio
+    import threading
+    import numpy as np
+
+    print("=" * 70)
+    print("⚙️  DESPACHO DE AÇÕES PARA O FURBY (simulado, sem latência BLE)")
+    print("=" * 70)
+    print(f"  {args.calls} ações por método\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+
+        def report(label: str, times: list):
+            us = np.array(times) * 1e6
+            print(f"  {label:<34}: média {us.mean():7.1f} µs | p50 {np.percentile(us, 50):7.1f} µs | "
+                  f"p99 {np.percentile(us, 99):7.1f} µs")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Antes: cada chamada cria, roda e fecha um event loop próprio
+            old_ctrl = app.Controller(device=app.SimulatedFurby())
+            action = app.Controller.action.__wrapped__
+            old = []
+            for _ in range(args.calls):
+                t0 = time.perf_counter()
+                loop = asyncio.new_event_loop()
+                try:
+                    loop.run_until_complete(action(old_ctrl, 1, 0, 0, 0))
+                finally:
+                    loop.close()
+                old.append(time.perf_counter() - t0)
+
+            # Depois: submissão thread-safe para o loop persistente
+            ctrl = app.Controller(device=app.SimulatedFurby())
+            app.DEVICE_LOOP.run(ctrl.action(1, 0, 0, 0))  # aquece (inicia o loop)
+            new = []
+            for _ in range(args.calls):
+                t0 = time.perf_counter()
+                app.DEVICE_LOOP.run(ctrl.action(1, 0, 0, 0))
+                new.append(time.perf_counter() - t0)
+
+            # Várias threads (scanner, wake word, conversa) despachando ao mesmo tempo
+            concurrent = []
+            ctrls = [app.Controller(device=app.SimulatedFurby()) for _ in range(args.threads)]
+
+            def worker(c):
+                for _ in range(args.calls // args.threads):
+                    t0 = time.perf_counter()
+                    app.DEVICE_LOOP.run(c.action(1, 0, 0, 0))
+                    concurrent.append(time.perf_counter() - t0)
+
+            threads = [threading.Thread(target=worker, args=(c,)) for c in ctrls]
+            t_all = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            t_all = time.perf_counter() - t_all
+
+        report("antes: new_event_loop por ação", old)
+        report("depois: loop persistente", new)
+        report(f"depois: {args.threads} threads concorrentes", concurrent)
+        print(f"\n  speedup (média): {np.mean(old) / np.mean(new):.1f}x | vazão com {args.threads} threads: "
+              f"{len(concurrent) / t_all:,.0f} ações/s")
+
+
+def bench_priority(args):
+    import threading
+    import numpy as np
+
+    print("=" * 70)
+    print("🚦 PRIORIDADE DE COMANDOS (conversa disputando com o scanner)")
+    print("=" * 70)
+    print(f"  latência BLE {args.latency * 1000:.0f} ms | {args.scanners} threads de scanner enfileirando sem parar | "
+          f"{args.commands} comandos da conversa\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        for label, cls in (("FIFO (como o asyncio.Lock)", "scanner"), ("com prioridade", "conversation")):
+            ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+            stop = threading.Event()
+
+            def scanner():
+                while not stop.is_set():
+                    app.DEVICE_LOOP.run(ctrl.action(1, 0, 0, 0, priority="scanner"))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                threads = [threading.Thread(target=scanner) for _ in range(args.scanners)]
+                for t in threads:
+                    t.start()
+                time.sleep(args.latency * 3)
+                waits = []
+                for _ in range(args.commands):
+                    t0 = time.perf_counter()
+                    app.DEVICE_LOOP.run(ctrl.set_color(255, 192, 203, priority=cls))
+                    waits.append(time.perf_counter() - t0 - args.latency)
+                    time.sleep(args.latency * random.uniform(1, 3))  # fora de fase com o scanner
+                stop.set()
+                for t in threads:
+                    t.join()
+            ms = np.array(waits) * 1000
+            scanned = ctrl.scheduler.stats["scanner"].served
+            print(f"  {label:<28}: espera da conversa média {ms.mean():6.1f} ms | p95 {np.percentile(ms, 95):6.1f} ms | "
+                  f"máx {ms.max():6.1f} ms | combos do scanner: {scanned}")
+
+
+def bench_antenna(args):
+    import asyncio
+    import numpy as np
+
+    print("=" * 70)
+    print("🎨 COR DA ANTENA AO ARRASTAR O SELETOR")
+    print("=" * 70)
+    print(f"  {args.updates} cores em {args.duration}s ({args.updates / args.duration:.0f}/s) | "
+          f"escrita BLE {args.latency * 1000:.0f} ms\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        for label, coalesce in (("cada cor vira uma escrita", False), ("última vence", True)):
+            ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+
+            async def drag():
+                tasks = []
+                sent_at = {}
+                for i in range(args.updates):
+                    color = (i % 256, 0, 255 - i % 256)
+                    sent_at[i] = time.perf_counter()
+                    call = ctrl.set_color_latest(*color) if coalesce else ctrl.set_color(*color)
+                    tasks.append(asyncio.ensure_future(call))
+                    await asyncio.sleep(args.duration / args.updates)
+                released = time.perf_counter()
+                await asyncio.gather(*tasks)
+                # atraso da antena: do fim do arrasto até a cor final estar no Furby
+                return time.perf_counter() - released
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                lag = app.DEVICE_LOOP.run(drag())
+            writes = ctrl.color_stats["sent"] if coalesce else args.updates
+            print(f"  {label:<26}: escritas BLE {writes:4d}/{args.updates} | "
+                  f"antena atrasada {lag * 1000:7.1f} ms depois de soltar o seletor")
+        print(f"\n  coalescidas: {ctrl.color_stats['coalesced']} | enviadas: {ctrl.color_stats['sent']}")
+
+
+def bench_shadow(args):
+    print("=" * 70)
+    print("🪞 SOMBRA DE ESTADO (escritas de cor redundantes numa conversa)")
+    print("=" * 70)
+    print(f"  {args.sessions} sessões x {1 + args.followups} turnos | escrita BLE {args.latency * 1000:.0f} ms\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        purple, pink = (128, 0, 128), (255, 192, 203)
+        for label, force in (("sem sombra (toda escrita vai)", True), ("com sombra", False)):
+            ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+
+            async def sessions():
+                await ctrl.connect()
+                await ctrl.set_color(*purple, force=force)  # detector de wake word iniciado
+                for _ in range(args.sessions):
+                    await ctrl.set_color(*pink, priority="conversation", force=force)  # início da sessão
+                    for _ in range(1 + args.followups):
+                        await ctrl.random_action(priority="conversation")
+                        await ctrl.set_color(*pink, priority="conversation", force=force)  # após a ação
+                    await ctrl.set_color(*purple, priority="conversation", force=force)  # fim da sessão
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                app.DEVICE_LOOP.run(sessions())
+                elapsed = time.perf_counter() - t0
+            stats = ctrl.shadow_stats
+            total = stats["writes"] + stats["skipped"]
+            print(f"  {label:<30}: escritas de cor {stats['writes']:3d}/{total} | "
+                  f"tempo de BLE gasto com cor {stats['writes'] * args.latency * 1000:6.0f} ms | total {elapsed:.2f}s")
+
+
+def bench_choreo(args):
+    from choreography import Choreography
+
+    print("=" * 70)
+    print("💃 COREOGRAFIA NO SERVIDOR (erro de tempo por passo)")
+    print("=" * 70)
+    print(f"  {args.steps} passos a cada {args.interval * 1000:.0f} ms x {args.repeat} passadas | "
+          f"escrita BLE {args.latency * 1000:.0f} ms\n")
+    steps = []
+    for i in range(args.steps):
+        if i % 2:
+            steps.append({"at": i * args.interval, "type": "action", "input": 1, "index": 0, "subindex": 0, "specific": i})
+        else:
+            steps.append({"at": i * args.interval, "type": "color", "r": i % 256, "g": 0, "b": 255 - i % 256})
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        for label, compensate in (("sem compensação", False), ("adiantando pela latência", True)):
+            ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+
+            async def warmup():
+                await ctrl.connect()
+                for i in range(5):  # mede a latência de cada tipo de escrita
+                    await ctrl.set_color(i, i, i)
+                    await ctrl.action(1, 0, 0, i)
+
+            show = Choreography("bench", ctrl, steps, repeat=args.repeat,
+                                duration=args.steps * args.interval, compensate=compensate)
+            with contextlib.redirect_stdout(io.StringIO()):
+                app.DEVICE_LOOP.run(warmup())
+                app.DEVICE_LOOP.run(show.run())
+            timing = show.timing()
+            print(f"  {label:<26}: erro médio {timing['meanErrorMs']:6.1f} ms | "
+                  f"p95 |erro| {timing['p95AbsErrorMs']:6.1f} ms | máx {timing['maxAbsErrorMs']:6.1f} ms")
+
+
+def bench_animation(args):
+    import asyncio
+    from antenna_animation import AntennaAnimation, color_at, normalize_keyframes, preset
+
+    print("=" * 70)
+    print("✨ ANIMAÇÃO DA ANTENA COM LINK BLE LENTO")
+    print("=" * 70)
+    print(f"  respiração de {args.duration}s a {args.fps:.0f} FPS pedidos | escrita BLE {args.latency * 1000:.0f} ms\n")
+    keyframes = preset("breathing", (255, 192, 203), 1.0, base=(40, 0, 40))
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+
+        # Renderizador ingênuo: um set_color por frame no relógio, todos enfileirados
+        ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+
+        async def naive():
+            await ctrl.connect()
+            frames = normalize_keyframes(keyframes)
+            loop = asyncio.get_running_loop()
+            origin, tasks = loop.time(), []
+            while loop.time() - origin < args.duration:
+                color = color_at(frames, (loop.time() - origin) % 1.0)
+                tasks.append(asyncio.ensure_future(ctrl.set_color(*color, priority="random", force=True)))
+                await asyncio.sleep(1.0 / args.fps)
+            ended = loop.time()
+            await asyncio.gather(*tasks)
+            return len(tasks), loop.time() - ended
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            queued, lag = app.DEVICE_LOOP.run(naive())
+        print(f"  {'um frame = uma escrita':<24}: {queued} escritas enfileiradas | "
+              f"antena ainda animando {lag * 1000:6.0f} ms depois do fim")
+
+        ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+        animation = AntennaAnimation("bench", ctrl, keyframes, loop=True, duration=args.duration, max_fps=args.fps)
+
+        async def engine():
+            await ctrl.connect()
+            await animation.run()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.DEVICE_LOOP.run(engine())
+        over = animation.ended_at - animation.started_at - args.duration
+        info = animation.info()
+        print(f"  {'motor de animação':<24}: {info['writes']} escritas | {info['fps']:.1f} FPS alcançados "
+              f"({info['dropped']} frames descartados) | terminou {max(over, 0) * 1000:4.0f} ms depois do fim")
+
+        # Preempção: um comando da conversa no meio da animação
+        ctrl = app.Controller(device=app.SimulatedFurby(latency=args.latency))
+        animation = AntennaAnimation("bench", ctrl, keyframes, loop=True, max_fps=args.fps)
+
+        async def preempt():
+            await ctrl.connect()
+            task = asyncio.ensure_future(animation.run())
+            await asyncio.sleep(args.duration / 2)
+            t = time.perf_counter()
+            await ctrl.set_color(255, 192, 203, priority="conversation")
+            waited = time.perf_counter() - t
+            await task
+            return waited
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            waited = app.DEVICE_LOOP.run(preempt())
+        print(f"\n  comando da conversa no meio da animação: esperou {waited * 1000:.0f} ms | "
+              f"animação {animation.state} após {animation.frames} frames")
+
+
+def bench_lipsync(args):
+    import asyncio
+    import numpy as np
+    from antenna_animation import AntennaAnimation
+    from lip_sync import amplitude_envelope, lip_sync_keyframes
+
+    print("=" * 70)
+    print("👄 LIP-SYNC DA ANTENA (brilho que chega vs. volume do áudio naquele instante)")
+    print("=" * 70)
+    rate = 16000
+    t = np.arange(int(args.seconds * rate)) / rate
+    # "Fala" sintética: sílabas de ~4 Hz com pausas, portadora de 220 Hz
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.5 * t) > -0.3)
+    speech = (syllables * np.sin(2 * np.pi * 220 * t) * 20000).astype(np.int16)
+    t0 = time.perf_counter()
+    envelope = amplitude_envelope(speech, rate, fps=args.fps)
+    took = time.perf_counter() - t0
+    keyframes = lip_sync_keyframes(envelope, args.fps, (255, 192, 203))
+    print(f"  {args.seconds:.0f}s de áudio -> envelope de {len(envelope)} janelas em {took * 1000:.2f} ms | "
+          f"{args.fps:.0f} FPS máx | escrita BLE {args.latency * 1000:.0f} ms\n")
+
+    def truth(at: float) -> float:
+        window = min(max(int(at * args.fps), 0), len(envelope) - 1)
+        return 0.15 + 0.85 * float(envelope[window])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        for label, compensate in (("sem compensação", False), ("adiantando pela latência", True)):
+            device = app.SimulatedFurby(latency=args.latency)
+            ctrl = app.Controller(device=device)
+            landed = []
+            original = device.set_antenna_color
+
+            async def traced(r, g, b, original=original):
+                await original(r, g, b)
+                landed.append((asyncio.get_running_loop().time(), r / 255.0))
+
+            device.set_antenna_color = traced
+
+            async def play():
+                await ctrl.connect()
+                for i in range(5):  # mede a latência da escrita de cor
+                    await ctrl.set_color(i, i, i)
+                landed.clear()
+                animation = AntennaAnimation("bench", ctrl, keyframes, priority="conversation",
+                                             max_fps=args.fps, compensate=compensate)
+                start = asyncio.get_running_loop().time()  # "play()" do áudio começa aqui
+                await animation.run()
+                return start
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = app.DEVICE_LOOP.run(play())
+            errors = np.array([abs(level - truth(at - start)) for at, level in landed])
+            print(f"  {label:<26}: {len(landed)} escritas | erro de brilho médio {errors.mean() * 100:5.1f}% | "
+                  f"p95 {np.percentile(errors, 95) * 100:5.1f}%")
+
+
+REPLIES = [
+    ("*Oouuh hu hu...* My batteries feel warm. Nice.", {"pets", "hugs"}),
+    ("I love you, little friend.", {"hugs"}),
+    ("You are so sweet. Hug me?", {"hugs"}),
+    ("Eu te amo, amiguinho.", {"hugs"}),
+    ("La la la... let us sing a song.", {"singing", "music"}),
+    ("Yay, a party! Dance with me!", {"singing", "music"}),
+    ("Hmm? Why is the sky so blue?", {"conversation"}),
+    ("Ooh, tell me a story.", {"conversation"}),
+    ("What is that shiny thing?", {"conversation"}),
+    ("Hehe, that tickles!", {"tickles"}),
+    ("Haha, you are funny.", {"tickles"}),
+    ("Oops! Hic... silly me.", {"hiccups"}),
+    ("Whoa, surprise!", {"hiccups"}),
+    ("So sleepy... zzz.", {"bored"}),
+    ("Ugh, I am tired now.", {"bored"}),
+    ("Too dark. I am scared.", {"shaking"}),
+    ("Que medo do escuro.", {"shaking"}),
+    ("That noise was so loud!", {"loud_noise"}),
+    ("Oops, I burped. Stinky!", {"farts", "hiccups"}),
+    ("Soft blanket, calm night. Thank you.", {"pets", "hugs"}),
+]
+
+
+def bench_reaction(args):
+    import random
+    from reaction import select_category
+
+    print("=" * 70)
+    print("🎭 REAÇÃO À RESPOSTA (aleatória vs. léxico local)")
+    print("=" * 70)
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        catalog = app.ACTION_CATALOG
+        by_combo = {action["combo"]: action["category"] for action in catalog.actions}
+        combos = list(by_combo)
+        gross = {"farts"}
+        sweet = [text for text, expected in REPLIES if not expected & gross]
+        rng = random.Random(0)
+        trials = args.trials
+        hits = farts = 0
+        for _ in range(trials):
+            text, expected = rng.choice(REPLIES)
+            category = by_combo[rng.choice(combos)]
+            hits += category in expected
+            farts += text in sweet and category in gross
+        print(f"  {'ação aleatória':<16}: combina com o texto {100 * hits / trials:5.1f}% | "
+              f"pum/arroto fora de hora {100 * farts / trials:4.1f}%")
+
+        hits = farts = 0
+        t0 = time.perf_counter()
+        for _ in range(trials):
+            text, expected = rng.choice(REPLIES)
+            category, _ = select_category(text)
+            hits += category in expected
+            farts += text in sweet and category in gross
+        took = (time.perf_counter() - t0) / trials
+        print(f"  {'léxico local':<16}: combina com o texto {100 * hits / trials:5.1f}% | "
+              f"pum/arroto fora de hora {100 * farts / trials:4.1f}% | "
+              f"{took * 1e6:.1f} µs por resposta")
+
+
+def bench_catalog(args):
+    import random
+    from action_catalog import ActionCatalog
+
+    print("=" * 70)
+    print("🎲 SORTEIO DE AÇÕES (lista refeita a cada chamada vs. catálogo com alias)")
+    print("=" * 70)
+    catalog = ActionCatalog.load(no_repeat=args.no_repeat, seed=1)
+    table = [action["combo"] for action in catalog.actions]
+    rng = random.Random(1)
+
+    def repeats(draws: list, window: int) -> float:
+        hits = sum(1 for i, combo in enumerate(draws) if combo in draws[max(i - window, 0):i])
+        return 100.0 * hits / len(draws)
+
+    for category in (None, "hiccups"):
+        label = category or "todas"
+        pool = [c for c in table if category is None or catalog.get(c)["category"] == category]
+        t0 = time.perf_counter()
+        old = [rng.choice(list(pool)) for _ in range(args.draws)]  # lista reconstruída a cada chamada
+        old_time = (time.perf_counter() - t0) / args.draws
+        t0 = time.perf_counter()
+        new = [catalog.sample(category) for _ in range(args.draws)]
+        new_time = (time.perf_counter() - t0) / args.draws
+        window = min(args.no_repeat, len(pool) - 1)
+        print(f"  [{label}: {len(pool)} ações, janela {window}]")
+        print(f"    random.choice: {old_time * 1e6:5.2f} µs | seguida repetida {repeats(old, 1):5.1f}% | "
+              f"repetida na janela {repeats(old, window):5.1f}%")
+        print(f"    catálogo     : {new_time * 1e6:5.2f} µs | seguida repetida {repeats(new, 1):5.1f}% | "
+              f"repetida na janela {repeats(new, window):5.1f}%")
+
+
+def bench_durations(args):
+    import numpy as np
+
+    print("=" * 70)
+    print("⏱️ COOLDOWN FIXO vs. DURAÇÃO APRENDIDA (scanner com microfone simulado)")
+    print("=" * 70)
+    rate = 16000
+    rng = np.random.default_rng(0)
+    # Duração real de cada combo: metade silenciosa/curta, metade passando da janela de escuta
+    truth = {i: float(d) for i, d in enumerate(np.where(rng.random(args.combos) < 0.5,
+                                                        rng.uniform(0.0, args.window * 0.8, args.combos),
+                                                        rng.uniform(args.window, args.cooldown, args.combos)))}
+    print(f"  {args.combos} combos | janela {args.window}s | cooldown {args.cooldown}s | "
+          f"duração real média {np.mean(list(truth.values())):.2f}s\n")
+    for label, adaptive in (("cooldown fixo", False), ("duração aprendida", True)):
+        with tempfile.TemporaryDirectory() as workdir:
+            app = load_app(workdir)
+            fired = {"combo": 0, "at": 0.0, "overlaps": 0}
+            original = app.SimulatedFurby.trigger_action
+
+            async def trigger(self, input, index, subindex, specific, original=original):
+                await original(self, input, index, subindex, specific)
+                now = time.monotonic()
+                if fired["at"] and now < fired["at"] + truth[fired["combo"]]:
+                    fired["overlaps"] += 1  # disparou com o Furby ainda tocando o combo anterior
+                fired.update(combo=index, at=now)
+
+            def record(duration, rate=rate, input_device_index=None):
+                start = time.monotonic() - fired["at"]
+                time.sleep(duration)  # gravar leva o tempo da janela
+                t = start + np.arange(int(duration * rate)) / rate
+                clip = rng.normal(0, 30, len(t))
+                sounding = t < truth.get(fired["combo"], 0.0) if fired["at"] else np.zeros(len(t), bool)
+                clip[sounding] += 3000 * np.sin(2 * np.pi * 440 * t[sounding])
+                return clip.astype(np.int16)
+
+            app.SimulatedFurby.trigger_action = trigger
+            app.record_clip = record
+            scanner = app.ActionScanner()
+            params = app.ActionScanBody(
+                index_end=args.combos - 1, subindex_end=0, specific_end=0, cooldown=args.cooldown,
+                silence_window=args.window, calibration_seconds=0.2, adaptive_cooldown=adaptive,
+                archive_clips=False, fingerprint=False,
+            ).dict()
+            with contextlib.redirect_stdout(io.StringIO()):
+                app.DEVICE_LOOP.run(app.CTRL.connect())
+                scanner.start(params)
+                while scanner.running:
+                    time.sleep(0.01)
+            elapsed = scanner.finished_at - scanner.started_at
+            if adaptive:
+                learned = app.DURATIONS.info()
+                print(f"  {label:<18}: {elapsed:6.2f}s ({scanner.processed / elapsed:.2f} combos/s) | "
+                      f"sobreposições {fired['overlaps']} | cooldown evitado {scanner.cooldown_saved:.1f}s | "
+                      f"medidas {learned['measured']} ({learned['truncated']} truncadas)")
+                errors = [abs(app.DURATIONS.measured((1, i, 0, 0)) - d) for i, d in truth.items()
+                          if d < args.window * 0.9]
+                print(f"  {'':<18}  erro da duração medida (sons dentro da janela): "
+                      f"{np.mean(errors) * 1000:.0f} ms em média")
+            else:
+                print(f"  {label:<18}: {elapsed:6.2f}s ({scanner.processed / elapsed:.2f} combos/s) | "
+                      f"sobreposições {fired['overlaps']}")
+            sys.modules.pop("app", None)
+
+
+def bench_chain(args):
+    import numpy as np
+
+    print("=" * 70)
+    print("⛓️ AÇÕES EM SEQUÊNCIA (esperar terminar e disparar vs. encadear com a escrita adiantada)")
+    print("=" * 70)
+    rng = np.random.default_rng(0)
+    truth = [float(d) for d in rng.uniform(args.min_duration, args.max_duration, args.actions)]
+    print(f"  {args.actions} ações | duração média {np.mean(truth):.2f}s | latência BLE {args.latency * 1000:.0f} ms\n")
+    for label, chain in (("wait=True + próxima", False), ("chain=True", True)):
+        with tempfile.TemporaryDirectory() as workdir:
+            app = load_app(workdir)
+            arrivals = []
+            original = app.SimulatedFurby.trigger_action
+
+            async def trigger(self, input, index, subindex, specific, original=original):
+                await original(self, input, index, subindex, specific)
+                arrivals.append(time.monotonic())  # a ação começa quando a escrita chega
+
+            app.SimulatedFurby.trigger_action = trigger
+            for i, seconds in enumerate(truth):
+                app.DURATIONS.observe((1, i, 0, 0), seconds)
+
+            async def run():
+                await app.CTRL.connect()
+                app.CTRL.device.latency = args.latency
+                await app.CTRL.action(1, 0, 0, 0)  # mede a latência da escrita
+                await app.CTRL.action_finished()
+                arrivals.clear()
+                for i in range(args.actions):
+                    await app.CTRL.action(1, i, 0, 0, wait=not chain, chain=chain)
+                await app.CTRL.action_finished()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                app.DEVICE_LOOP.run(run())
+            gaps = np.array([arrivals[i + 1] - (arrivals[i] + truth[i]) for i in range(len(truth) - 1)]) * 1000
+            total = arrivals[-1] + truth[-1] - arrivals[0]
+            print(f"  {label:<20}: {total:6.2f}s | intervalo entre ações {gaps.mean():6.1f} ms em média "
+                  f"(máx {gaps.max():5.1f}) | sobreposições {int((gaps < -5).sum())}")
+            sys.modules.pop("app", None)
+
+
+def bench_discovery(args):
+    import asyncio
+    import statistics
+    from ble_discovery import BackgroundDiscovery, DeviceTable, is_furby
+
+    print("=" * 70)
+    print("📡 DESCOBERTA BLE (discover de 5s a cada volta vs. scanner contínuo)")
+    print("=" * 70)
+    scale = args.scale  # tudo roda em tempo reduzido; os números são reportados na escala real
+    rng = random.Random(0)
+
+    class Advert:
+        def __init__(self, address, name, rssi):
+            self.address, self.name, self.local_name, self.rssi = address, name, name, rssi
+
+    class Radio:
+        """Vizinhos anunciando sempre; o Furby começa a anunciar em `furby_at`"""
+
+        def __init__(self, neighbours, furby_at):
+            self.devices = [(f"AA:BB:CC:00:00:{i:02X}", f"Fone {i}", -60 - i) for i in range(neighbours)]
+            self.furby_at = furby_at
+
+        def scanner(self, detection_callback):
+            radio = self
+
+            class Scanner:
+                async def start(self):
+                    self.task = asyncio.ensure_future(self.run())
+
+                async def run(self):
+                    phase = rng.random() * args.advert_interval
+                    await asyncio.sleep(phase * scale)
+                    while True:
+                        devices = list(radio.devices)
+                        if time.monotonic() >= radio.furby_at:
+                            devices.append(("FU:RB:YY:00:00:01", "Furby", -45))
+                        for address, name, rssi in devices:
+                            advert = Advert(address, name, rssi)
+                            detection_callback(advert, advert)
+                        await asyncio.sleep(args.advert_interval * scale)
+
+                async def stop(self):
+                    self.task.cancel()
+
+            return Scanner()
+
+    async def old_loop(radio):
+        # Loop antigo: discover(timeout) bloqueante, filtra, espera scan_interval e repete
+        while True:
+            seen = {}
+            scanner = radio.scanner(lambda d, a: seen.__setitem__(d.address, d.name))
+            await scanner.start()
+            await asyncio.sleep(args.timeout * scale)
+            await scanner.stop()
+            if any(is_furby(name) for name in seen.values()):
+                return time.monotonic()
+            await asyncio.sleep(args.interval * scale)
+
+    async def new_loop(radio):
+        table = DeviceTable(ttl=30.0)
+        discovery = BackgroundDiscovery(table, scanner_factory=radio.scanner, log=lambda msg: None)
+        await discovery.start()
+        try:
+            await table.wait_for(lambda e: is_furby(e.get("name")), timeout=None)
+            return time.monotonic()
+        finally:
+            await discovery.stop()
+
+    async def trial(loop_fn):
+        appear = rng.uniform(0, args.timeout + args.interval) * scale
+        radio = Radio(args.neighbours, time.monotonic() + appear)
+        found = await loop_fn(radio)
+        return (found - radio.furby_at) / scale
+
+    async def scan_answer():
+        table = DeviceTable(ttl=30.0)
+        for i in range(args.neighbours):
+            table.update(f"AA:BB:CC:00:00:{i:02X}", f"Fone {i}", -60 - i)
+        table.update("FU:RB:YY:00:00:01", "Furby", -45)
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            table.devices(lambda e: is_furby(e.get("name")))
+        return (time.perf_counter() - t0) / 1000
+
+    async def run():
+        print(f"  {args.neighbours} vizinhos BLE | anúncio a cada {args.advert_interval * 1000:.0f} ms | "
+              f"discover {args.timeout}s + espera {args.interval}s | {args.trials} aparições\n")
+        answer = await scan_answer()
+        print(f"  /api/scan          : antes {args.timeout * 1000:7.0f} ms (discover bloqueante) | "
+              f"agora {answer * 1e6:.1f} µs (tabela)")
+        for label, loop_fn in (("discover a cada volta", old_loop), ("scanner contínuo", new_loop)):
+            delays = sorted([await trial(loop_fn) for _ in range(args.trials)])
+            p95 = delays[min(int(len(delays) * 0.95), len(delays) - 1)]
+            print(f"  {label:<22}: Furby ligou -> visto em {statistics.mean(delays) * 1000:7.0f} ms em média "
+                  f"| p95 {p95 * 1000:7.0f} ms | pior {delays[-1] * 1000:7.0f} ms")
+
+    asyncio.run(run())
+
+
+def bench_reconnect(args):
+    import asyncio
+    from reconnect import Backoff, ReconnectStats
+
+    print("=" * 70)
+    print("⚡ RECONEXÃO APÓS QUEDA (scan + 5s fixos vs. direto com backoff)")
+    print("=" * 70)
+    scale = args.scale  # tempo acelerado; números reportados na escala real
+    rng = random.Random(0)
+
+    class Link:
+        """Furby que some por `outage` segundos; connect espera ele voltar até o timeout (como no BlueZ)"""
+
+        def __init__(self, outage):
+            self.back_at = time.monotonic() + outage * scale
+
+        async def connect(self, timeout):
+            ready = max(time.monotonic(), self.back_at) + args.connect_time * scale
+            if ready - time.monotonic() > timeout * scale:
+                await asyncio.sleep(timeout * scale)
+                raise TimeoutError("timeout")
+            await asyncio.sleep(ready - time.monotonic())
+
+        async def scan(self, seconds):
+            end = time.monotonic() + seconds * scale
+            await asyncio.sleep(seconds * scale)
+            return time.monotonic() >= self.back_at and self.back_at <= end - args.advert_interval * scale
+
+    async def old_policy(link):
+        while True:
+            if await link.scan(5.0):
+                try:
+                    await link.connect(timeout=args.timeout)
+                    return
+                except TimeoutError:
+                    pass
+            await asyncio.sleep(5.0 * scale)
+
+    async def new_policy(link):
+        backoff, misses = Backoff(base=args.base, cap=args.cap, rng=rng), 0
+        while True:
+            if misses < args.direct or await link.scan(5.0):
+                try:
+                    await link.connect(timeout=args.timeout)
+                    return
+                except TimeoutError:
+                    misses += 1
+            await asyncio.sleep(backoff.next() * scale)
+
+    async def run():
+        outages = [rng.uniform(args.min_outage, args.max_outage) for _ in range(args.trials)]
+        print(f"  {args.trials} quedas de {args.min_outage}-{args.max_outage}s | connect {args.connect_time}s | "
+              f"timeout {args.timeout}s | {args.direct} tentativas diretas antes do scan\n")
+        for label, policy in (("scan + espera fixa", old_policy), ("direto + backoff", new_policy)):
+            stats = ReconnectStats()
+            for outage in outages:
+                link = Link(outage)
+                t0 = time.monotonic()
+                await policy(link)
+                stats.record(label, (time.monotonic() - t0) / scale)
+            summary = stats.info()["all"]
+            print(f"  {label:<20}: fora do ar média {summary['meanSec']:5.2f}s | p50 {summary['p50Sec']:5.2f}s | "
+                  f"p90 {summary['p90Sec']:5.2f}s | p99 {summary['p99Sec']:5.2f}s | pior {summary['maxSec']:5.2f}s")
+
+    asyncio.run(run())
+
+
+def bench_linkdrop(args):
+    import asyncio
+    import numpy as np
+
+    print("=" * 70)
+    print("📴 DETECÇÃO DE QUEDA DO LINK (verificação a cada 2s vs. callback de desconexão)")
+    print("=" * 70)
+    print(f"  {args.drops} quedas simuladas por modo | auto-connect real com Furby simulado\n")
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        device = app.CTRL.device
+        original = type(device).connect
+        attempts = []
+
+        async def connect(self, address=None):
+            attempts.append(time.monotonic())  # início da reconexão = queda detectada
+            await original(self, address)
+
+        type(device).connect = connect
+
+        async def run():
+            app.DEVICE_LOOP.start()
+            app.AUTO_CONNECT_MANAGER.start()
+            results = {}
+            for label, notify in (("verificação a cada 2s", False), ("callback de desconexão", True)):
+                detect = []
+                for _ in range(args.drops):
+                    while not device.connected:
+                        await asyncio.sleep(0.01)
+                    await asyncio.sleep(random.uniform(0.1, 0.5))
+                    attempts.clear()
+                    dropped = time.monotonic()
+                    app.DEVICE_LOOP.loop.call_soon_threadsafe(device.drop_link, notify)
+                    while not attempts:
+                        await asyncio.sleep(0.001)
+                    detect.append(attempts[0] - dropped)
+                results[label] = np.array(detect) * 1000
+            app.AUTO_CONNECT_MANAGER.stop()
+            return results
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(run())
+        for label, ms in results.items():
+            print(f"  {label:<24}: queda -> reconexão iniciada média {ms.mean():7.1f} ms | "
+                  f"p95 {np.percentile(ms, 95):7.1f} ms | pior {ms.max():7.1f} ms")
+
+
+def bench_race(args):
+    import asyncio
+    import numpy as np
+    from connect_race import ConnectHistory, race_connect
+
+    print("=" * 70)
+    print("🏁 CONEXÃO NUMA SALA CHEIA (devices[0] vs. RSSI + histórico em paralelo)")
+    print("=" * 70)
+    scale = args.scale
+    rng = random.Random(0)
+    # Sala fixa: sinal de cada Furby; o mais forte está "ocupado" (conectado a outro celular) e nunca aceita
+    room = {f"FU:RB:YY:00:00:{i:02X}": rng.uniform(-95, -50) for i in range(args.furbies)}
+    busy = "FU:RB:YY:00:00:00"
+    room[busy] = -45.0
+    print(f"  {args.furbies} Furbies (1 ocupado com o sinal mais forte) | timeout {args.timeout}s | "
+          f"{args.width} em paralelo | {args.trials} conexões\n")
+
+    class FakeFurby:
+        connected = False
+
+        async def connect(self, address):
+            weak = (-45 - room[address]) / 50  # 0 (forte) .. 1 (fraco)
+            if address == busy or rng.random() < 0.6 * weak:
+                await asyncio.sleep(3600)  # nunca responde: só o timeout tira daqui
+            await asyncio.sleep((0.3 + 2.0 * weak) * scale)
+            self.connected = True
+
+        async def disconnect(self):
+            self.connected = False
+
+    def visible():
+        return [{"address": a, "rssi": int(r + rng.uniform(-5, 5))} for a, r in room.items()]
+
+    async def old_policy():
+        while True:
+            devices = visible()
+            rng.shuffle(devices)  # ordem em que o Bleak devolveu
+            try:
+                await asyncio.wait_for(FakeFurby().connect(devices[0]["address"]), args.timeout * scale)
+                return
+            except asyncio.TimeoutError:
+                await asyncio.sleep(0.25 * scale)  # mesma espera curta nos dois casos
+
+    async def new_policy(history):
+        while True:
+            ranked = [d["address"] for d in history.rank(visible())[:args.width]]
+            device, _, _ = await race_connect(ranked, FakeFurby, args.timeout * scale,
+                                              on_result=lambda a, ok, took: history.record(a, ok, took / scale))
+            if device is not None:
+                return
+            await asyncio.sleep(0.25 * scale)
+
+    async def run():
+        with tempfile.TemporaryDirectory() as workdir:
+            history = ConnectHistory(os.path.join(workdir, "connect_history.json"))
+            for label, policy in (("devices[0]", old_policy),
+                                  ("ranking + paralelo", lambda: new_policy(history))):
+                times = []
+                for _ in range(args.trials):
+                    t0 = time.monotonic()
+                    await policy()
+                    times.append((time.monotonic() - t0) / scale)
+                ms = np.array(times)
+                print(f"  {label:<24}: até conectar média {ms.mean():6.2f}s | p90 {np.percentile(ms, 90):6.2f}s | "
+                      f"pior {ms.max():6.2f}s | primeiras 5 {ms[:5].mean():5.2f}s, últimas 5 {ms[-5:].mean():5.2f}s")
+
+    asyncio.run(run())
+
+
+def bench_fleet(args):
+    import numpy as np
+    from device_pool import DevicePool
+
+    print("=" * 70)
+    print(f"🎪 FROTA DE {args.devices} FURBIES (um por vez vs. pool em paralelo)")
+    print("=" * 70)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        pool = DevicePool()
+        for i in range(args.devices):
+            latency = rng.uniform(args.min_latency, args.max_latency)
+            pool.add(f"f{i}", app.Controller(device=app.SimulatedFurby(latency=latency)), ["palco" if i % 2 else "sala"])
+        ids = pool.select("all")
+        print(f"  latência BLE por Furby {args.min_latency * 1000:.0f}-{args.max_latency * 1000:.0f} ms | "
+              f"{args.rounds} comandos de cor para todos\n")
+
+        async def sequential():
+            origin = time.monotonic()
+            landed = []
+            for device_id in ids:
+                await pool.get(device_id).set_color(*colors(), priority="manual", force=True)
+                landed.append(time.monotonic() - origin)
+            return landed[-1] * 1000, (landed[-1] - landed[0]) * 1000
+
+        def colors():
+            return rng.randrange(256), rng.randrange(256), rng.randrange(256)
+
+        async def parallel(align):
+            color = colors()
+            summary = await pool.fanout(ids, lambda ctrl: ctrl.set_color(*color, force=True), kind="color", align=align)
+            return summary["totalMs"], summary["skewMs"]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.DEVICE_LOOP.run(pool.fanout(ids, lambda ctrl: ctrl.connect()))
+            for _ in range(5):  # aquece a latência medida de cada Furby (usada no alinhamento)
+                app.DEVICE_LOOP.run(parallel(False))
+            runs = {}
+            for label, job in (("um por vez", sequential), ("pool em paralelo", lambda: parallel(False)),
+                               ("pool alinhado", lambda: parallel(True))):
+                runs[label] = np.array([app.DEVICE_LOOP.run(job()) for _ in range(args.rounds)])
+        for label, data in runs.items():
+            total, skew = data[:, 0], data[:, 1]
+            print(f"  {label:<18}: todos prontos em {total.mean():7.1f} ms (p95 {np.percentile(total, 95):7.1f}) | "
+                  f"skew primeiro->último {skew.mean():6.1f} ms")
+
+
+def bench_upload(args):
+    import asyncio
+    from a18_transfer import A18Transfer, SimulatedPeripheral
+
+    print("=" * 70)
+    print("📤 UPLOAD A18 POR BLE (blocos de 20 B com resposta vs. MTU + janela sem resposta)")
+    print("=" * 70)
+    scale = args.scale
+    data = random.Random(0).randbytes(args.kb * 1024)
+    print(f"  arquivo {args.kb} KB | MTU do periférico {args.mtu} | intervalo de conexão {args.interval * 1000:.1f} ms\n")
+
+    async def old_upload(peripheral):
+        # 20 bytes por escrita com resposta: uma ida e volta por bloco
+        t0 = time.monotonic()
+        for offset in range(0, len(data), 20):
+            await peripheral.write(offset, data[offset:offset + 20], response=True)
+        return (time.monotonic() - t0) / scale
+
+    async def run():
+        for loss in args.loss:
+            def peripheral():
+                return SimulatedPeripheral(max_mtu=args.mtu, loss=loss, interval=args.interval, time_scale=scale, seed=1)
+            old = await old_upload(peripheral()) if loss == args.loss[0] else None
+            transfer = A18Transfer(peripheral())
+            report = await transfer.upload(data)
+            seconds = report["seconds"] / scale
+            if old is not None:
+                print(f"  20 B com resposta        : {old:6.2f}s ({len(data) / old / 1024:6.1f} KB/s)")
+            print(f"  motor, perda {loss * 100:4.1f}%      : {seconds:6.2f}s ({len(data) / seconds / 1024:6.1f} KB/s) | "
+                  f"payload {report['payload']} B | {report['rewinds']} retransmissões | "
+                  f"{report['bytesSent'] / len(data) * 100 - 100:4.1f}% reenviado | verificado {report['verified']}")
+
+    asyncio.run(run())
+
+
+def bench_slots(args):
+    import asyncio
+    from a18_transfer import A18Transfer, SimulatedPeripheral, TransferError
+    from sound_slots import SlotCache, content_digest
+
+    print("=" * 70)
+    print("🎵 SONS REPETIDOS E UPLOADS INTERROMPIDOS (reenviar sempre vs. cache de slots)")
+    print("=" * 70)
+    scale = args.scale
+    rng = random.Random(args.seed)
+    clips = [rng.randbytes(args.kb * 1024) for _ in range(args.clips)]
+    # Poucos clipes tocados com frequência (falas comuns), muitos raramente
+    playlist = [clips[min(int(rng.paretovariate(1.2)) - 1, args.clips - 1)] for _ in range(args.plays)]
+    print(f"  {args.plays} toques de {args.clips} clipes de {args.kb} KB | "
+          f"{args.slots} slots, {args.storage} KB no Furby\n")
+
+    def peripheral(**kw):
+        return SimulatedPeripheral(time_scale=scale, seed=1, **kw)
+
+    async def run():
+        t0 = time.monotonic()
+        sent_old = 0
+        for data in playlist:
+            report = await A18Transfer(peripheral()).upload(data)
+            sent_old += report["bytesSent"]
+        old = (time.monotonic() - t0) / scale
+
+        with tempfile.TemporaryDirectory() as workdir:
+            cache = SlotCache(os.path.join(workdir, "sound_slots.json"), slots=args.slots, capacity=args.storage * 1024)
+            t0 = time.monotonic()
+            sent_new = 0
+            for data in playlist:
+                digest = content_digest(data)
+                if cache.lookup("sim", digest) is not None:
+                    continue  # "tocar slot N"
+                cache.reserve("sim", digest, len(data))
+                report = await A18Transfer(peripheral()).upload(data)
+                cache.complete("sim", digest)
+                sent_new += report["bytesSent"]
+            new = (time.monotonic() - t0) / scale
+            info = cache.info()
+        print(f"  reenviar sempre : {old:7.2f}s de upload | {sent_old / 1024:8.0f} KB enviados")
+        print(f"  cache de slots  : {new:7.2f}s de upload | {sent_new / 1024:8.0f} KB enviados | "
+              f"{info['hits']} acertos, {info['misses']} faltas, {info['evicted']} despejos")
+
+        # Link cai com `fail_at` do arquivo enviado; a segunda tentativa recomeça do zero ou retoma
+        data = clips[0]
+        cut = int(len(data) * args.fail_at)
+        for resume in (False, True):
+            with tempfile.TemporaryDirectory() as workdir:
+                cache = SlotCache(os.path.join(workdir, "sound_slots.json"))
+                digest = content_digest(data)
+                device = peripheral(fail_at=cut)
+                sent = 0
+                t0 = time.monotonic()
+                for _ in range(2):
+                    _, start, _ = cache.reserve("sim", digest, len(data))
+                    transfer = A18Transfer(device, on_progress=lambda i: cache.progress("sim", digest, i["confirmed"]))
+                    try:
+                        await transfer.upload(data, start=start if resume else 0)
+                        cache.complete("sim", digest)
+                        break
+                    except TransferError:
+                        pass
+                    finally:
+                        sent += transfer.stats["bytesSent"]
+                    if not resume:
+                        device = peripheral()
+                seconds = (time.monotonic() - t0) / scale
+            label = "retomando      " if resume else "do zero        "
+            print(f"  queda em {args.fail_at * 100:.0f}%, {label}: {seconds:6.2f}s | "
+                  f"{sent / 1024:6.1f} KB enviados para um arquivo de {len(data) / 1024:.0f} KB")
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="scenario", required=True)
+
+    scan = sub.add_parser("scan", help="vazão da varredura distribuída")
+    scan.add_argument("--devices", type=int, nargs="+", default=[1, 2, 4, 8])
+    scan.add_argument("--combos", type=int, default=256)
+    scan.add_argument("--cooldown", type=float, default=0.02)
+    scan.add_argument("--latency", type=float, default=0.01)
+    scan.add_argument("--skew", type=float, default=0.5)
+    scan.add_argument("--mic-combos", type=int, default=40, help="combos do teste de microfone compartilhado")
+    scan.add_argument("--mic-window", type=float, default=0.15, help="janela de escuta (s)")
+    scan.add_argument("--mic-sound", type=float, default=0.4, help="duração dos sons audíveis (s)")
+    scan.add_argument("--mic-cooldown", type=float, default=0.5)
+    scan.set_defaults(func=bench_scan)
+
+    clips = sub.add_parser("clips", help="crescimento e leitura do arquivo de clipes")
+    clips.add_argument("--count", type=int, default=100_000)
+    clips.add_argument("--seconds", type=float, default=0.1, help="duração de cada clipe sintético")
+    clips.add_argument("--reads", type=int, default=2000)
+    clips.set_defaults(func=bench_clips)
+
+    noise = sub.add_parser("noise", help="limiar fixo vs. SNR adaptativo")
+    noise.add_argument("--combos", type=int, default=2000)
+    noise.add_argument("--silent", type=float, default=0.3, help="fração de combos realmente silenciosos")
+    noise.add_argument("--min-noise", type=float, default=18.0)
+    noise.add_argument("--max-noise", type=float, default=66.0)
+    noise.add_argument("--threshold", type=float, default=80.0)
+    noise.add_argument("--snr", type=float, default=6.0)
+    noise.add_argument("--recalibrate", type=int, default=50)
+    noise.add_argument("--seed", type=int, default=0)
+    noise.set_defaults(func=bench_noise)
+
+    dispatch = sub.add_parser("dispatch", help="custo de despacho por ação (loop novo vs. persistente)")
+    dispatch.add_argument("--calls", type=int, default=2000)
+    dispatch.add_argument("--threads", type=int, default=4)
+    dispatch.set_defaults(func=bench_dispatch)
+
+    antenna = sub.add_parser("antenna", help="coalescência de cores da antena")
+    antenna.add_argument("--updates", type=int, default=120)
+    antenna.add_argument("--duration", type=float, default=2.0)
+    antenna.add_argument("--latency", type=float, default=0.05)
+    antenna.set_defaults(func=bench_antenna)
+
+    shadow = sub.add_parser("shadow", help="escritas redundantes evitadas pela sombra de estado")
+    shadow.add_argument("--sessions", type=int, default=10)
+    shadow.add_argument("--followups", type=int, default=2)
+    shadow.add_argument("--latency", type=float, default=0.05)
+    shadow.set_defaults(func=bench_shadow)
+
+    priority = sub.add_parser("priority", help="espera da conversa com o scanner saturando o Furby")
+    priority.add_argument("--latency", type=float, default=0.02)
+    priority.add_argument("--scanners", type=int, default=4)
+    priority.add_argument("--commands", type=int, default=50)
+    priority.set_defaults(func=bench_priority)
+
+    choreo = sub.add_parser("choreo", help="precisão de tempo da coreografia no servidor")
+    choreo.add_argument("--steps", type=int, default=20)
+    choreo.add_argument("--interval", type=float, default=0.1)
+    choreo.add_argument("--repeat", type=int, default=3)
+    choreo.add_argument("--latency", type=float, default=0.04)
+    choreo.set_defaults(func=bench_choreo)
+
+    animation = sub.add_parser("animation", help="animação da antena limitada à capacidade do BLE")
+    animation.add_argument("--duration", type=float, default=3.0)
+    animation.add_argument("--fps", type=float, default=30.0)
+    animation.add_argument("--latency", type=float, default=0.05)
+    animation.set_defaults(func=bench_animation)
+
+    lipsync = sub.add_parser("lipsync", help="sincronia do brilho da antena com o áudio")
+    lipsync.add_argument("--seconds", type=float, default=6.0)
+    lipsync.add_argument("--fps", type=float, default=20.0)
+    lipsync.add_argument("--latency", type=float, default=0.04)
+    lipsync.set_defaults(func=bench_lipsync)
+
+    reaction = sub.add_parser("reaction", help="reação escolhida pelo texto da resposta")
+    reaction.add_argument("--trials", type=int, default=5000)
+    reaction.set_defaults(func=bench_reaction)
+
+    catalog = sub.add_parser("catalog", help="sorteio de ações do catálogo (alias + sem repetição)")
+    catalog.add_argument("--draws", type=int, default=20000)
+    catalog.add_argument("--no-repeat", type=int, default=5)
+    catalog.set_defaults(func=bench_catalog)
+
+    durations = sub.add_parser("durations", help="cooldown fixo vs. duração aprendida das ações")
+    durations.add_argument("--combos", type=int, default=20)
+    durations.add_argument("--window", type=float, default=0.5)
+    durations.add_argument("--cooldown", type=float, default=1.5)
+    durations.set_defaults(func=bench_durations)
+
+    chain = sub.add_parser("chain", help="ações em sequência: esperar e disparar vs. encadear")
+    chain.add_argument("--actions", type=int, default=12)
+    chain.add_argument("--min-duration", type=float, default=0.3)
+    chain.add_argument("--max-duration", type=float, default=1.0)
+    chain.add_argument("--latency", type=float, default=0.08, help="latência de cada escrita BLE (s)")
+    chain.set_defaults(func=bench_chain)
+
+    discovery = sub.add_parser("discovery", help="tempo até ver um Furby que acabou de ligar")
+    discovery.add_argument("--trials", type=int, default=20)
+    discovery.add_argument("--neighbours", type=int, default=30)
+    discovery.add_argument("--timeout", type=float, default=5.0, help="duração do discover antigo (s)")
+    discovery.add_argument("--interval", type=float, default=5.0, help="espera entre scans antigos (s)")
+    discovery.add_argument("--advert-interval", type=float, default=0.1, help="intervalo de anúncio BLE (s)")
+    discovery.add_argument("--scale", type=float, default=0.02, help="fator de aceleração do relógio")
+    discovery.set_defaults(func=bench_discovery)
+
+    reconnect = sub.add_parser("reconnect", help="tempo fora do ar depois de uma queda do Furby")
+    reconnect.add_argument("--trials", type=int, default=40)
+    reconnect.add_argument("--min-outage", type=float, default=0.2)
+    reconnect.add_argument("--max-outage", type=float, default=3.0)
+    reconnect.add_argument("--connect-time", type=float, default=0.3)
+    reconnect.add_argument("--timeout", type=float, default=5.0)
+    reconnect.add_argument("--direct", type=int, default=4)
+    reconnect.add_argument("--base", type=float, default=0.25)
+    reconnect.add_argument("--cap", type=float, default=8.0)
+    reconnect.add_argument("--advert-interval", type=float, default=0.1)
+    reconnect.add_argument("--scale", type=float, default=0.02, help="fator de aceleração do relógio")
+    reconnect.set_defaults(func=bench_reconnect)
+
+    linkdrop = sub.add_parser("linkdrop", help="tempo até notar a queda do link BLE")
+    linkdrop.add_argument("--drops", type=int, default=10)
+    linkdrop.set_defaults(func=bench_linkdrop)
+
+    race = sub.add_parser("race", help="tempo até conectar com vários Furbies por perto")
+    race.add_argument("--furbies", type=int, default=6)
+    race.add_argument("--trials", type=int, default=30)
+    race.add_argument("--width", type=int, default=3)
+    race.add_argument("--timeout", type=float, default=5.0)
+    race.add_argument("--scale", type=float, default=0.02, help="fator de aceleração do relógio")
+    race.set_defaults(func=bench_race)
+
+    fleet = sub.add_parser("fleet", help="comando para uma frota de Furbies simulados")
+    fleet.add_argument("--devices", type=int, default=50)
+    fleet.add_argument("--rounds", type=int, default=20)
+    fleet.add_argument("--min-latency", type=float, default=0.01)
+    fleet.add_argument("--max-latency", type=float, default=0.08)
+    fleet.set_defaults(func=bench_fleet)
+
+    upload = sub.add_parser("upload", help="vazão do upload de áudio A18 por BLE")
+    upload.add_argument("--kb", type=int, default=64)
+    upload.add_argument("--mtu", type=int, default=185)
+    upload.add_argument("--interval", type=float, default=0.0075)
+    upload.add_argument("--loss", type=float, nargs="+", default=[0.0, 0.01, 0.05])
+    upload.add_argument("--scale", type=float, default=0.05, help="fator de aceleração do relógio")
+    upload.set_defaults(func=bench_upload)
+
+    slots = sub.add_parser("slots", help="sons repetidos e uploads interrompidos com o cache de slots")
+    slots.add_argument("--plays", type=int, default=40)
+    slots.add_argument("--clips", type=int, default=12)
+    slots.add_argument("--kb", type=int, default=32)
+    slots.add_argument("--slots", type=int, default=10)
+    slots.add_argument("--storage", type=int, default=512, help="KB de armazenamento no Furby")
+    slots.add_argument("--fail-at", type=float, default=0.7, help="fração do arquivo em que o link cai")
+    slots.add_argument("--seed", type=int, default=0)
+    slots.add_argument("--scale", type=float, default=0.05, help="fator de aceleração do relógio")
+    slots.set_defaults(func=bench_slots)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Descoberta BLE contínua em segundo plano, com tabela de dispositivos em memória.
+
+Antes, cada `/api/scan` e cada volta do auto-connect chamavam
+`BleakScanner.discover(timeout=5.0)`. Cada chamada bloqueava por 5 s, e o
+resultado ia para o lixo. Agora um único BleakScanner fica ligado o tempo
+todo, com callback de detecção. Cada anúncio atualiza a tabela (nome,
+endereço, RSSI, primeira/última vez visto). Entradas que não anunciam há mais
+de `ttl` segundos são removidas.
+
+  - `/api/scan` responde na hora, lendo a tabela;
+  - quem espera um Furby aparecer usa `wait_for()`, que acorda no próprio
+    callback do anúncio (milissegundos), sem polling.
+
+Tudo roda no loop do dispositivo (device_loop).
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+FURBY_NAMES = ("Furby", "Furby Connect", "BlueFur")
+
+
+def is_furby(name: Optional[str]) -> bool:
+    return bool(name) and any(tag in name for tag in FURBY_NAMES)  # type: ignore[operator]
+
+
+class DeviceTable:
+    """Dispositivos vistos recentemente, com RSSI e expiração por TTL"""
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._waiters: List[tuple] = []  # (predicado, future)
+        self.stats = {"adverts": 0, "added": 0, "evicted": 0}
+
+    def update(self, address: str, name: Optional[str], rssi: Optional[int]) -> Dict[str, Any]:
+        now = time.time()
+        entry = self.entries.get(address)
+        self.stats["adverts"] += 1
+        if entry is None:
+            entry = self.entries[address] = {"address": address, "name": name, "rssi": rssi,
+                                             "firstSeen": now, "lastSeen": now, "adverts": 0}
+            self.stats["added"] += 1
+        entry["lastSeen"] = now
+        entry["adverts"] += 1
+        if name:
+            entry["name"] = name
+        if rssi is not None:
+            entry["rssi"] = rssi
+        self._notify(entry)
+        return entry
+
+    def _notify(self, entry: Dict[str, Any]) -> None:
+        remaining = []
+        for predicate, future in self._waiters:
+            if future.done():
+                continue
+            if predicate(entry):
+                future.set_result(dict(entry))
+            else:
+                remaining.append((predicate, future))
+        self._waiters = remaining
+
+    def evict(self) -> int:
+        """Remove quem não anuncia há mais de `ttl` segundos"""
+        cutoff = time.time() - self.ttl
+        stale = [address for address, entry in self.entries.items() if entry["lastSeen"] < cutoff]
+        for address in stale:
+            del self.entries[address]
+        self.stats["evicted"] += len(stale)
+        return len(stale)
+
+    def devices(self, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """Dispositivos vivos (mais forte primeiro), opcionalmente filtrados"""
+        self.evict()
+        items = [dict(e) for e in self.entries.values() if predicate is None or predicate(e)]
+        return sorted(items, key=lambda e: -(e["rssi"] if e["rssi"] is not None else -999))
+
+    async def wait_for(self, predicate: Callable[[Dict[str, Any]], bool],
+                       timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Retorna um dispositivo vivo que satisfaz o predicado, esperando o próximo anúncio se preciso"""
+        found = self.devices(predicate)
+        if found:
+            return found[0]
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((predicate, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if not future.done():
+                future.cancel()
+
+
+class BackgroundDiscovery:
+    """BleakScanner contínuo (ou anúncios simulados) alimentando uma DeviceTable"""
+
+    def __init__(self, table: DeviceTable, scanner_factory: Optional[Callable[..., Any]] = None,
+                 simulated: Optional[List[Dict[str, Any]]] = None, advert_interval: float = 1.0,
+                 log: Callable[[str], None] = print):
+        self.table = table
+        self.scanner_factory = scanner_factory
+        self.simulated = simulated  # lista de {"address", "name", "rssi"} anunciados periodicamente
+        self.advert_interval = advert_interval
+        self.log = log
+        self.scanner: Any = None
+        self.task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def _on_detect(self, device: Any, advertisement: Any) -> None:
+        name = getattr(advertisement, "local_name", None) or getattr(device, "name", None)
+        self.table.update(device.address, name, getattr(advertisement, "rssi", None))
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.started_at = time.time()
+        self.task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                if self.simulated is not None:
+                    for device in self.simulated:
+                        self.table.update(device["address"], device.get("name"), device.get("rssi"))
+                    self.table.evict()
+                    await asyncio.sleep(self.advert_interval)
+                    continue
+                if self.scanner is None:
+                    self.scanner = self.scanner_factory(detection_callback=self._on_detect)
+                    await self.scanner.start()
+                    self.error = None
+                    backoff = 1.0
+                    self.log("[discovery] 📡 descoberta BLE contínua iniciada")
+                await asyncio.sleep(max(self.table.ttl / 3, 1.0))
+                self.table.evict()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Adaptador ocupado/ausente: tenta de novo com espera crescente
+                self.error = str(e)
+                self.log(f"[discovery] ⚠️ erro no scanner BLE: {e} (nova tentativa em {backoff:.0f}s)")
+                self.scanner = None
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.task = None
+        if self.scanner is not None:
+            try:
+                await self.scanner.stop()
+            except Exception:
+                pass
+            self.scanner = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "simulated": self.simulated is not None,
+            "startedAt": self.started_at,
+            "error": self.error,
+            "ttl": self.table.ttl,
+            "devices": len(self.table.entries),
+            **self.table.stats,
+        }
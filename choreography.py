@@ -0,0 +1,170 @@
+"""
+Coreografias: uma linha do tempo de ações, cores e áudio executada no servidor.
+
+Antes, para fazer o Furby "se apresentar", o cliente mandava várias chamadas
+HTTP com sleeps entre elas, e o jitter era enorme. Agora o cliente manda a
+linha do tempo inteira de uma vez:
+
+    {"steps": [
+        {"at": 0.0, "type": "color", "r": 255, "g": 0, "b": 0},
+        {"at": 0.5, "type": "action", "input": 17, "index": 0, "subindex": 0, "specific": 0},
+        {"at": 0.5, "type": "audio", "path": "musica.wav"},
+        {"at": 2.0, "type": "color", "r": 0, "g": 0, "b": 255}
+     ], "loop": false, "repeat": 1}
+
+Os passos rodam no loop do dispositivo, contra o relógio monotônico do loop.
+Cada escrita BLE sai adiantada pela latência medida daquele tipo de escrita
+(Controller.write_latency), para chegar ao Furby no instante pedido. Para cada
+passo, o erro de tempo (chegada real - instante pedido) é registrado. A
+coreografia pode ser cancelada a qualquer momento e repetida N vezes ou em
+loop.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+STEP_TYPES = ("action", "color", "audio")
+
+
+class Choreography:
+    """Execução de uma linha do tempo num Controller"""
+
+    def __init__(
+        self,
+        cid: str,
+        ctrl: Any,
+        steps: List[Dict[str, Any]],
+        loop: bool = False,
+        repeat: int = 1,
+        duration: Optional[float] = None,
+        priority: str = "manual",
+        compensate: bool = True,
+        play_audio: Optional[Callable[[str], Awaitable[Any]]] = None,
+    ):
+        if not steps:
+            raise ValueError("Coreografia sem passos")
+        for step in steps:
+            if step.get("type") not in STEP_TYPES:
+                raise ValueError(f"Tipo de passo inválido: {step.get('type')} (use {', '.join(STEP_TYPES)})")
+            if step.get("at", 0) < 0:
+                raise ValueError("Offsets ('at') devem ser >= 0")
+        self.id = cid
+        self.ctrl = ctrl
+        self.steps = sorted(steps, key=lambda s: s.get("at", 0.0))
+        self.loop = loop
+        self.repeat = max(int(repeat), 1)
+        end = self.steps[-1].get("at", 0.0)
+        if (loop or self.repeat > 1) and (duration is None or duration <= end):
+            raise ValueError("Para repetir, informe 'duration' maior que o último offset")
+        self.duration = duration if duration is not None else end
+        self.priority = priority
+        self.compensate = compensate
+        self.play_audio = play_audio
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.passes = 0
+        self.executed = 0
+        self.created_at = time.time()
+        self._errors: Deque[float] = deque(maxlen=5000)
+        self.results: Deque[Dict[str, Any]] = deque(maxlen=200)
+        self._background: List[asyncio.Future] = []
+        self.future: Optional[Any] = None  # concurrent.futures.Future do DEVICE_LOOP
+
+    def _lead(self, kind: str) -> float:
+        if not self.compensate or kind == "audio":
+            return 0.0
+        return self.ctrl.write_latency.get(kind, 0.0)
+
+    async def _execute(self, step: Dict[str, Any]) -> None:
+        kind = step["type"]
+        if kind == "color":
+            await self.ctrl.set_color(step["r"], step["g"], step["b"], priority=self.priority)
+        elif kind == "action":
+            await self.ctrl.action(step["input"], step["index"], step["subindex"], step["specific"],
+                                   priority=self.priority)
+        elif step.get("output", "computer") == "furby":
+            await self.ctrl.play_wav(step["path"], priority=self.priority)
+        else:
+            if self.play_audio is None:
+                raise RuntimeError("Reprodução de áudio no computador indisponível")
+            # Toca em paralelo: a linha do tempo não espera o áudio terminar
+            self._background.append(asyncio.ensure_future(self.play_audio(step["path"])))
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.state = "running"
+        # começa depois da maior antecipação, para o passo em 0 também chegar na hora
+        origin = loop.time() + max(self._lead(step["type"]) for step in self.steps)
+        try:
+            while self.loop or self.passes < self.repeat:
+                base = origin + self.passes * self.duration
+                for number, step in enumerate(self.steps):
+                    kind = step["type"]
+                    target = base + step.get("at", 0.0)
+                    wait = target - self._lead(kind) - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    issued = loop.time()
+                    record: Dict[str, Any] = {"pass": self.passes, "step": number, "type": kind, "at": step.get("at", 0.0)}
+                    try:
+                        await self._execute(step)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        record["error"] = str(e)
+                    # escrita BLE "chega" quando termina; áudio no computador começa ao ser disparado
+                    landed = issued if kind == "audio" else loop.time()
+                    error = landed - target
+                    record.update(issuedMs=round((issued - base) * 1000, 2), errorMs=round(error * 1000, 2))
+                    self.results.append(record)
+                    self._errors.append(error)
+                    self.executed += 1
+                self.passes += 1
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            for task in self._background:
+                task.cancel()
+            raise
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+
+    def cancel(self) -> bool:
+        if self.future is None or self.future.done():
+            return False
+        return self.future.cancel()
+
+    def timing(self) -> Dict[str, Any]:
+        """Erro de tempo dos passos executados (ms): média, |média|, p95 e máximo absolutos"""
+        if not self._errors:
+            return {"steps": 0}
+        errors = np.array(self._errors) * 1000
+        absolute = np.abs(errors)
+        return {
+            "steps": len(errors),
+            "meanErrorMs": round(float(errors.mean()), 2),
+            "meanAbsErrorMs": round(float(absolute.mean()), 2),
+            "p95AbsErrorMs": round(float(np.percentile(absolute, 95)), 2),
+            "maxAbsErrorMs": round(float(absolute.max()), 2),
+        }
+
+    def info(self, limit: int = 50) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "error": self.error,
+            "steps": len(self.steps),
+            "loop": self.loop,
+            "repeat": self.repeat,
+            "duration": self.duration,
+            "passes": self.passes,
+            "executed": self.executed,
+            "compensate": self.compensate,
+            "createdAt": self.created_at,
+            "timing": self.timing(),
+            "recent": list(self.results)[-limit:],
+        }
@@ -0,0 +1,153 @@
+"""
+Arquivo de clipes de áudio do scanner, um por combinação testada.
+
+Dois arquivos:
+  - dados (.pcm): segmentos PCM int16 mono concatenados, todos no mesmo
+    formato (taxa fixa), gravados só por append;
+  - índice (.idx): header fixo + registros (combo, offset, amostras) de
+    16 bytes, memory-mapped e com capacidade que cresce por duplicação.
+
+Ao abrir, as chaves do índice viram um dict combo -> registro (o registro
+mais recente vence), então qualquer clipe é lido com um único pread, sem
+tocar no resto do arquivo de dados.
+"""
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+Combo = Tuple[int, int, int, int]
+
+_MAGIC = b"FURBYCLP"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIQ")  # magic, versão, taxa, número de registros
+_HEADER_SIZE = 32
+_RECORD = np.dtype([("key", "<u4"), ("samples", "<u4"), ("offset", "<u8")])
+
+
+def combo_key(combo: Union[Combo, Dict[str, int]]) -> int:
+    if isinstance(combo, dict):
+        combo = (combo["input"], combo["index"], combo["subindex"], combo["specific"])
+    inp, idx, sub, spec = combo
+    return (inp << 24) | (idx << 16) | (sub << 8) | spec
+
+
+def wav_header(samples: int, rate: int) -> bytes:
+    """Header RIFF/WAVE para PCM 16-bit mono"""
+    data_bytes = samples * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, 1,
+        rate, rate * 2, 2, 16, b"data", data_bytes,
+    )
+
+
+class ClipArchive:
+    """Clipes PCM por combinação com índice de offsets memory-mapped"""
+
+    def __init__(self, data_path: Union[str, Path], index_path: Union[str, Path], rate: int = 16000):
+        self.data_path = Path(data_path)
+        self.index_path = Path(index_path)
+        self.rate = rate
+        self._lock = threading.Lock()
+        if not self.index_path.exists() or self.index_path.stat().st_size < _HEADER_SIZE:
+            with open(self.index_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, rate, 0).ljust(_HEADER_SIZE, b"\x00"))
+        with open(self.index_path, "rb") as f:
+            magic, version, self.rate, self.count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise RuntimeError(f"Índice de clipes inválido: {self.index_path}")
+        self.data_path.touch(exist_ok=True)
+        self._data_fd = os.open(self.data_path, os.O_RDWR | os.O_APPEND)
+        self._map()
+        keys = self._records["key"][: self.count].tolist()
+        self._slots: Dict[int, int] = dict(zip(keys, range(self.count)))
+
+    def _map(self, capacity: Optional[int] = None) -> None:
+        current = (self.index_path.stat().st_size - _HEADER_SIZE) // _RECORD.itemsize
+        if capacity and capacity > current:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(_HEADER_SIZE + capacity * _RECORD.itemsize)
+            current = capacity
+        self._capacity = current
+        if current:
+            self._records = np.memmap(self.index_path, dtype=_RECORD, mode="r+", offset=_HEADER_SIZE, shape=(current,))
+        else:
+            self._records = np.zeros(0, dtype=_RECORD)
+        self._header = np.memmap(self.index_path, dtype=np.uint8, mode="r+", shape=(_HEADER_SIZE,))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, combo) -> bool:
+        return combo_key(combo) in self._slots
+
+    def append(self, combo: Union[Combo, Dict[str, int]], clip: np.ndarray) -> None:
+        """Grava o clipe (int16) de uma combinação; regravar substitui o anterior no índice"""
+        pcm = np.asarray(clip, dtype="<i2").tobytes()
+        key = combo_key(combo)
+        with self._lock:
+            offset = os.lseek(self._data_fd, 0, os.SEEK_END)
+            os.write(self._data_fd, pcm)
+            if self.count >= self._capacity:
+                self._map(max(1024, 2 * self._capacity))
+            self._records[self.count] = (key, len(pcm) // 2, offset)
+            self.count += 1
+            self._header[16:24] = np.frombuffer(struct.pack("<Q", self.count), dtype=np.uint8)
+            self._slots[key] = self.count - 1
+
+    def _locate(self, combo) -> Optional[Tuple[int, int]]:
+        slot = self._slots.get(combo_key(combo))
+        if slot is None:
+            return None
+        record = self._records[slot]
+        return int(record["offset"]), int(record["samples"])
+
+    def read(self, combo: Union[Combo, Dict[str, int]]) -> Optional[np.ndarray]:
+        """Clipe int16 da combinação (None se não houver)"""
+        found = self._locate(combo)
+        if found is None:
+            return None
+        offset, samples = found
+        return np.frombuffer(os.pread(self._data_fd, samples * 2, offset), dtype="<i2")
+
+    def iter_wav(self, combo: Union[Combo, Dict[str, int]], chunk_bytes: int = 32768) -> Optional[Iterator[bytes]]:
+        """Gerador de bytes WAV (header + PCM em pedaços) para streaming; None se não houver clipe"""
+        found = self._locate(combo)
+        if found is None:
+            return None
+        offset, samples = found
+
+        def chunks() -> Iterator[bytes]:
+            yield wav_header(samples, self.rate)
+            end = offset + samples * 2
+            pos = offset
+            while pos < end:
+                data = os.pread(self._data_fd, min(chunk_bytes, end - pos), pos)
+                if not data:
+                    break
+                pos += len(data)
+                yield data
+
+        return chunks()
+
+    def flush(self) -> None:
+        if self._capacity:
+            self._records.flush()
+        self._header.flush()
+
+    def close(self) -> None:
+        self.flush()
+        os.close(self._data_fd)
+
+    def info(self) -> Dict[str, int]:
+        return {
+            "clips": len(self._slots),
+            "records": self.count,
+            "dataBytes": os.path.getsize(self.data_path),
+            "indexBytes": os.path.getsize(self.index_path),
+            "sampleRate": self.rate,
+        }
@@ -0,0 +1,287 @@
+"""
+Índice compacto (memory-mapped) do espaço de combinações de ação do Furby.
+
+Cada combinação (input, index, subindex, specific) ocupa 4 bits com o seu
+status (não testada, testada, silenciosa, audível, erro...). O arquivo tem
+layout fixo:
+
+    [header 64 bytes][tabela de blocos: 65536 x uint32][blocos de 32 KiB]
+
+Um bloco cobre todas as 256 x 256 combinações (subindex, specific) de um par
+(input, index) e só é alocado quando alguma combinação dele é gravada. Assim,
+mesmo o espaço completo 0–255 em todas as dimensões cabe num Raspberry Pi:
+só os pares realmente varridos ocupam disco/memória.
+
+As contagens por status de uma faixa são calculadas uma vez e depois mantidas
+em memória: cada `set()` ajusta os contadores das faixas já consultadas, e o
+status do scanner (consultado a cada poll da UI) não percorre o índice.
+Leituras e remapeamentos (quando um bloco novo é alocado) usam o mesmo lock.
+"""
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+UNTESTED = 0
+TESTED = 1  # executada sem classificação de áudio
+SILENT = 2
+AUDIBLE = 3
+ERROR = 4
+SKIPPED = 5  # pulada pelo modo adaptativo (não executada)
+
+STATUS_NAMES = {
+    UNTESTED: "untested",
+    TESTED: "tested",
+    SILENT: "silent",
+    AUDIBLE: "audible",
+    ERROR: "error",
+    SKIPPED: "skipped",
+}
+
+Combo = Tuple[int, int, int, int]
+Ranges = Dict[str, Tuple[int, int]]
+
+_MAGIC = b"FURBYIDX"
+_VERSION = 1
+_HEADER_SIZE = 64
+_TABLE_ENTRIES = 256 * 256
+_TABLE_BYTES = _TABLE_ENTRIES * 4
+_DATA_OFFSET = _HEADER_SIZE + _TABLE_BYTES
+_BLOCK_COMBOS = 256 * 256
+_BLOCK_BYTES = _BLOCK_COMBOS // 2  # 4 bits por combinação
+_MAX_WATCHED = 8  # faixas com contadores mantidos em memória
+
+FULL_RANGES: Ranges = {
+    "input": (0, 255),
+    "index": (0, 255),
+    "subindex": (0, 255),
+    "specific": (0, 255),
+}
+
+
+def as_combo(combo: Union[Combo, Dict[str, int]]) -> Combo:
+    """Aceita tupla ou dict {"input", "index", "subindex", "specific"}"""
+    if isinstance(combo, dict):
+        return (combo["input"], combo["index"], combo["subindex"], combo["specific"])
+    return tuple(combo)  # type: ignore[return-value]
+
+
+def _check(combo: Combo) -> None:
+    for value in combo:
+        if not 0 <= value <= 255:
+            raise ValueError(f"Combinação fora de 0–255: {combo}")
+
+
+def _unpack_block(block: np.ndarray) -> np.ndarray:
+    """Converte um bloco de 32 KiB numa matriz [subindex, specific] de status"""
+    values = np.empty(_BLOCK_COMBOS, dtype=np.uint8)
+    values[0::2] = block & 0x0F
+    values[1::2] = block >> 4
+    return values.reshape(256, 256)
+
+
+class ComboIndex:
+    """Mapa de status por combinação, persistido num arquivo memory-mapped"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._mm: Optional[np.memmap] = None
+        self._watched: Dict[Tuple[Tuple[int, int], ...], np.ndarray] = {}  # faixa -> contagem por status
+        if not self.path.exists() or self.path.stat().st_size < _DATA_OFFSET:
+            self._create()
+        self._map()
+
+    # ----------------- arquivo -----------------
+
+    def _create(self) -> None:
+        with open(self.path, "wb") as f:
+            f.write(struct.pack("<8sII", _MAGIC, _VERSION, 4).ljust(_HEADER_SIZE, b"\x00"))
+            f.truncate(_DATA_OFFSET)  # tabela zerada (arquivo esparso)
+
+    def _map(self) -> None:
+        with open(self.path, "rb") as f:
+            magic, version, _bits = struct.unpack("<8sII", f.read(16))
+        if magic != _MAGIC or version != _VERSION:
+            raise RuntimeError(f"Arquivo de índice inválido: {self.path}")
+        if self._mm is not None:
+            self._mm.flush()
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="r+")
+        self._table = self._mm[_HEADER_SIZE:_DATA_OFFSET].view("<u4")
+        data = self._mm[_DATA_OFFSET:]
+        self._blocks = data[: len(data) // _BLOCK_BYTES * _BLOCK_BYTES].reshape(-1, _BLOCK_BYTES)
+
+    def _block(self, inp: int, idx: int, create: bool = False) -> Optional[np.ndarray]:
+        slot = int(self._table[(inp << 8) | idx])
+        if slot:
+            return self._blocks[slot - 1]
+        if not create:
+            return None
+        new_slot = len(self._blocks) + 1
+        with open(self.path, "r+b") as f:
+            f.truncate(_DATA_OFFSET + new_slot * _BLOCK_BYTES)
+        self._map()
+        self._table[(inp << 8) | idx] = new_slot
+        return self._blocks[new_slot - 1]
+
+    def flush(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._mm = None
+
+    # ----------------- acesso O(1) -----------------
+
+    def get(self, combo: Union[Combo, Dict[str, int]]) -> int:
+        inp, idx, sub, spec = as_combo(combo)
+        _check((inp, idx, sub, spec))
+        local = (sub << 8) | spec
+        with self._lock:
+            block = self._block(inp, idx)
+            if block is None:
+                return UNTESTED
+            return int(block[local >> 1] >> ((local & 1) * 4)) & 0x0F
+
+    def set(self, combo: Union[Combo, Dict[str, int]], status: int) -> None:
+        inp, idx, sub, spec = as_combo(combo)
+        _check((inp, idx, sub, spec))
+        if not 0 <= status <= 0x0F:
+            raise ValueError(f"Status inválido: {status}")
+        local = (sub << 8) | spec
+        shift = (local & 1) * 4
+        with self._lock:
+            block = self._block(inp, idx, create=True)
+            byte = int(block[local >> 1])
+            block[local >> 1] = (byte & ~(0x0F << shift) & 0xFF) | (status << shift)
+            old = (byte >> shift) & 0x0F
+            if old != status:
+                for key, totals in self._watched.items():
+                    if all(lo <= v <= hi for (lo, hi), v in zip(key, (inp, idx, sub, spec))):
+                        totals[old] -= 1
+                        totals[status] += 1
+
+    # ----------------- consultas em faixa -----------------
+
+    def _statuses(self, inp: int, idx: int, ranges: Ranges) -> np.ndarray:
+        """Matriz [subindex, specific] de status recortada pelas faixas"""
+        s0, s1 = ranges["subindex"]
+        p0, p1 = ranges["specific"]
+        with self._lock:
+            block = self._block(inp, idx)
+            if block is None:
+                return np.zeros((s1 - s0 + 1, p1 - p0 + 1), dtype=np.uint8)
+            return _unpack_block(block)[s0:s1 + 1, p0:p1 + 1]
+
+    def _count(self, ranges: Ranges) -> np.ndarray:
+        """Contagem completa de uma faixa (só os blocos alocados são lidos)"""
+        totals = np.zeros(16, dtype=np.int64)
+        (i0, i1), (x0, x1) = ranges["input"], ranges["index"]
+        per_block = (ranges["subindex"][1] - ranges["subindex"][0] + 1) * (
+            ranges["specific"][1] - ranges["specific"][0] + 1
+        )
+        table = self._table.reshape(256, 256)[i0:i1 + 1, x0:x1 + 1]
+        inputs, indexes = np.nonzero(table)
+        totals[UNTESTED] += per_block * (table.size - len(inputs))
+        for inp, idx in zip((inputs + i0).tolist(), (indexes + x0).tolist()):
+            totals += np.bincount(self._statuses(inp, idx, ranges).ravel(), minlength=16)
+        return totals
+
+    def counts(self, ranges: Optional[Ranges] = None) -> Dict[str, int]:
+        """Conta combinações por status dentro das faixas (padrão: espaço completo)"""
+        ranges = ranges or FULL_RANGES
+        key = tuple(tuple(ranges[dim]) for dim in ("input", "index", "subindex", "specific"))
+        with self._lock:
+            totals = self._watched.get(key)
+            if totals is None:
+                if len(self._watched) >= _MAX_WATCHED:
+                    self._watched.pop(next(iter(self._watched)))
+                totals = self._watched[key] = self._count(ranges)
+            totals = totals.copy()
+        result = {name: int(totals[code]) for code, name in STATUS_NAMES.items()}
+        result["total"] = int(totals.sum())
+        return result
+
+    def iter_untested(self, ranges: Ranges, start: Optional[Combo] = None) -> Iterator[Combo]:
+        """Percorre (em ordem lexicográfica) as combinações ainda não testadas"""
+        start = start or (ranges["input"][0], ranges["index"][0], ranges["subindex"][0], ranges["specific"][0])
+        (i0, i1), (x0, x1) = ranges["input"], ranges["index"]
+        s0, p0 = ranges["subindex"][0], ranges["specific"][0]
+        for inp in range(i0, i1 + 1):
+            for idx in range(x0, x1 + 1):
+                if (inp, idx) < start[:2]:
+                    continue
+                subs, specs = np.nonzero(self._statuses(inp, idx, ranges) == UNTESTED)
+                for sub, spec in zip((subs + s0).tolist(), (specs + p0).tolist()):
+                    combo = (inp, idx, sub, spec)
+                    if combo >= start:
+                        yield combo
+
+    def next_untested(self, ranges: Ranges, start: Optional[Combo] = None) -> Optional[Combo]:
+        return next(self.iter_untested(ranges, start), None)
+
+    # ----------------- operações de conjunto entre varreduras -----------------
+
+    def select(self, other: "ComboIndex", op: str, status: int, ranges: Optional[Ranges] = None) -> Iterator[Combo]:
+        """
+        Compara duas varreduras pelo conjunto de combinações com um status.
+
+        op: "and" (nas duas), "or" (em alguma), "sub" (nesta e não na outra),
+        "xor" (em exatamente uma).
+        """
+        ops = {
+            "and": np.logical_and,
+            "or": np.logical_or,
+            "sub": lambda a, b: a & ~b,
+            "xor": np.logical_xor,
+        }
+        if op not in ops:
+            raise ValueError(f"Operação inválida: {op}")
+        ranges = ranges or FULL_RANGES
+        s0, p0 = ranges["subindex"][0], ranges["specific"][0]
+        for inp in range(ranges["input"][0], ranges["input"][1] + 1):
+            for idx in range(ranges["index"][0], ranges["index"][1] + 1):
+                key = (inp << 8) | idx
+                if not self._table[key] and not other._table[key]:
+                    continue
+                mask = ops[op](
+                    self._statuses(inp, idx, ranges) == status,
+                    other._statuses(inp, idx, ranges) == status,
+                )
+                subs, specs = np.nonzero(mask)
+                for sub, spec in zip((subs + s0).tolist(), (specs + p0).tolist()):
+                    yield (inp, idx, sub, spec)
+
+    def merge_from(self, other: "ComboIndex") -> int:
+        """Copia os status da outra varredura para combinações ainda não testadas aqui"""
+        merged = 0
+        for key in np.nonzero(other._table)[0].tolist():
+            inp, idx = key >> 8, key & 0xFF
+            with other._lock:
+                theirs = other._block(inp, idx).copy()
+            with self._lock:
+                mine = self._block(inp, idx, create=True)
+                lo_m, hi_m = mine & 0x0F, mine >> 4
+                lo_t, hi_t = theirs & 0x0F, theirs >> 4
+                lo = np.where(lo_m == UNTESTED, lo_t, lo_m)
+                hi = np.where(hi_m == UNTESTED, hi_t, hi_m)
+                merged += int(np.count_nonzero(lo != lo_m) + np.count_nonzero(hi != hi_m))
+                mine[:] = lo | (hi << 4)
+        with self._lock:
+            self._watched.clear()  # contadores recalculados na próxima consulta
+        return merged
+
+    # ----------------- informações -----------------
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            allocated = int(np.count_nonzero(self._table))
+        return {
+            "allocatedBlocks": allocated,
+            "fileBytes": os.path.getsize(self.path),
+            "bytesPerBlock": _BLOCK_BYTES,
+        }
@@ -0,0 +1,153 @@
+"""
+Escalonador de comandos com classes de prioridade na frente do Controller.
+
+Antes, todos os métodos do Controller disputavam o mesmo asyncio.Lock por
+ordem de chegada. Uma varredura longa, cliques na UI e as reações da conversa
+competiam de igual para igual, e uma criança conversando com o Furby podia
+esperar atrás de combos do scanner.
+
+Agora cada comando pede a vez informando a sua classe:
+
+    conversation (0)  >  manual (1)  >  random (2)  >  scanner (3)
+
+O dispositivo continua executando um comando por vez. Quando ele termina, a
+vez vai para o comando de maior prioridade na fila (empate: ordem de chegada).
+Esse é o ponto de preempção entre comandos. Tarefas longas, feitas de vários
+comandos, podem chamar `checkpoint()` para ceder a vez no meio, quando houver
+alguém mais prioritário esperando.
+
+Tudo roda no loop do dispositivo (device_loop), então não há locks de thread.
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+PRIORITIES = {"conversation": 0, "manual": 1, "random": 2, "scanner": 3}
+
+
+def priority_of(cls: str) -> int:
+    try:
+        return PRIORITIES[cls]
+    except KeyError:
+        raise ValueError(f"Classe de prioridade inválida: {cls}") from None
+
+
+class _ClassStats:
+    def __init__(self):
+        self.waiting = 0
+        self.served = 0
+        self.preempted = 0  # vezes em que um comando desta classe passou na frente de outro já na fila
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent: Deque[float] = deque(maxlen=200)
+
+    def record(self, wait: float) -> None:
+        self.served += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent.append(wait)
+
+    def info(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        p95 = recent[min(int(len(recent) * 0.95), len(recent) - 1)] if recent else 0.0
+        return {
+            "queued": self.waiting,
+            "served": self.served,
+            "preempted": self.preempted,
+            "avgWaitMs": round(1000 * self.total_wait / self.served, 2) if self.served else 0.0,
+            "p95WaitMs": round(1000 * p95, 2),
+            "maxWaitMs": round(1000 * self.max_wait, 2),
+        }
+
+
+class CommandScheduler:
+    """Exclusão mútua por dispositivo com fila de prioridade (substitui o asyncio.Lock)"""
+
+    def __init__(self):
+        self._busy = False
+        self._holder: str = ""
+        self._waiters: List[Tuple[int, int, asyncio.Future, str, float]] = []
+        self._seq = itertools.count()
+        self.stats: Dict[str, _ClassStats] = {cls: _ClassStats() for cls in PRIORITIES}
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def acquire(self, cls: str) -> None:
+        prio = priority_of(cls)
+        stats = self.stats[cls]
+        if not self._busy and not self._waiters:
+            self._busy, self._holder = True, cls
+            stats.record(0.0)
+            return
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (prio, next(self._seq), future, cls, enqueued)
+        heapq.heappush(self._waiters, entry)
+        stats.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A vez já tinha sido concedida: repassa para o próximo
+                self.release()
+            else:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        finally:
+            stats.waiting -= 1
+        self._holder = cls
+        stats.record(time.monotonic() - enqueued)
+
+    def release(self) -> None:
+        while self._waiters:
+            prio, seq, future, cls, _ = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            # Passou na frente de alguém que chegou antes?
+            if any(s < seq for _, s, f, _, _ in self._waiters if not f.done()):
+                self.stats[cls].preempted += 1
+            future.set_result(None)
+            return
+        self._busy, self._holder = False, ""
+
+    @contextlib.asynccontextmanager
+    async def slot(self, cls: str = "manual") -> AsyncIterator[None]:
+        """`async with scheduler.slot("scanner"):` executa um comando com a vez garantida"""
+        await self.acquire(cls)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def should_yield(self, cls: str) -> bool:
+        """True se há um comando de prioridade maior que `cls` esperando"""
+        prio = priority_of(cls)
+        return any(p < prio and not f.done() for p, _, f, _, _ in self._waiters)
+
+    def served_above(self, cls: str) -> int:
+        """Total de comandos já atendidos nas classes de prioridade maior que `cls`"""
+        prio = priority_of(cls)
+        return sum(stats.served for other, stats in self.stats.items() if PRIORITIES[other] < prio)
+
+    async def checkpoint(self, cls: str) -> bool:
+        """Ponto de preempção para tarefas longas: cede a vez se alguém mais prioritário espera"""
+        if not self.should_yield(cls):
+            return False
+        self.release()
+        await self.acquire(cls)
+        return True
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "busy": self._busy,
+            "running": self._holder or None,
+            "queued": sum(1 for w in self._waiters if not w[2].done()),
+            "classes": {cls: stats.info() for cls, stats in self.stats.items()},
+        }
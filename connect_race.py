@@ -0,0 +1,123 @@
+"""
+Conexão com vários Furbies candidatos ao mesmo tempo, ordenados por RSSI e histórico.
+
+Sem FURBY_ADDRESS e com vários Furbies por perto, o auto-connect pegava
+`devices[0]`, na ordem em que o Bleak devolvia. Se esse estivesse longe ou
+ocupado, perdia um timeout de conexão inteiro. Agora:
+
+  - os candidatos são ordenados por uma pontuação: RSSI (sinal mais forte
+    primeiro) + taxa de sucesso das conexões anteriores, menos as falhas
+    seguidas mais recentes;
+  - os `width` melhores são tentados em paralelo, cada um com seu próprio
+    objeto de dispositivo;
+  - o primeiro que conecta vence. Os outros são cancelados, e quem chegou a
+    conectar no meio do cancelamento é desconectado.
+
+O histórico (sucessos, falhas, tempo de conexão por endereço) fica em
+connect_history.json.
+"""
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+UNKNOWN_RSSI = -100
+
+
+class ConnectHistory:
+    """Sucessos/falhas de conexão por endereço, persistidos em JSON"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.table: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.table = json.loads(self.path.read_text()).get("devices", {})
+            except Exception:
+                self.table = {}
+
+    def record(self, address: str, ok: bool, seconds: Optional[float] = None) -> None:
+        with self._lock:
+            entry = self.table.setdefault(address, {"ok": 0, "failed": 0, "streak": 0, "connectSec": None})
+            if ok:
+                entry["ok"] += 1
+                entry["streak"] = 0
+                entry["lastOk"] = time.time()
+                if seconds is not None:
+                    previous = entry["connectSec"]
+                    entry["connectSec"] = seconds if previous is None else previous + 0.3 * (seconds - previous)
+            else:
+                entry["failed"] += 1
+                entry["streak"] += 1  # falhas seguidas
+            data = json.dumps({"devices": self.table})
+        self.path.write_text(data)
+
+    def score(self, address: str, rssi: Optional[int]) -> float:
+        """Maior é melhor: RSSI em dBm + até 15 pela taxa de sucesso - 10 por falha seguida (até 3)"""
+        entry = self.table.get(address)
+        score = float(rssi if rssi is not None else UNKNOWN_RSSI)
+        if entry:
+            total = entry["ok"] + entry["failed"]
+            if total:
+                score += 15.0 * entry["ok"] / total
+            score -= 10.0 * min(entry["streak"], 3)
+        return score
+
+    def rank(self, devices: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ranked = [dict(d, score=round(self.score(d["address"], d.get("rssi")), 1)) for d in devices]
+        return sorted(ranked, key=lambda d: -d["score"])
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"file": str(self.path), "devices": {a: dict(e) for a, e in self.table.items()}}
+
+
+async def race_connect(addresses: Sequence[str], factory: Callable[[], Any],
+                       timeout: Optional[float] = None,
+                       on_result: Optional[Callable[[str, bool, float], None]] = None,
+                       ) -> Tuple[Optional[Any], Optional[str], List[Dict[str, Any]]]:
+    """
+    Conecta em paralelo a cada endereço, com um dispositivo novo (`factory()`)
+    para cada um. Retorna (dispositivo vencedor, endereço, resultados).
+    Os perdedores são cancelados ou desconectados.
+    """
+    started = time.monotonic()
+    devices = {address: factory() for address in addresses}
+    tasks = {asyncio.ensure_future(asyncio.wait_for(device.connect(address), timeout)): address
+             for address, device in devices.items()}
+    results: Dict[str, Dict[str, Any]] = {}
+    winner: Optional[str] = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Terminaram juntos: vence o melhor colocado na ordem dos candidatos
+            for task in sorted(done, key=lambda t: addresses.index(tasks[t])):
+                address = tasks[task]
+                took = time.monotonic() - started
+                error = task.exception()
+                results[address] = {"address": address, "ok": error is None, "seconds": round(took, 3),
+                                    **({"error": str(error) or type(error).__name__} if error else {})}
+                if on_result:
+                    on_result(address, error is None, took)
+                if error is None and winner is None:
+                    winner = address
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in pending:
+            results[tasks[task]] = {"address": tasks[task], "ok": False, "cancelled": True}
+        # Quem conectou mas perdeu (chegou junto, ou conectou durante o cancelamento) é desconectado
+        for address, device in devices.items():
+            if address != winner and getattr(device, "connected", False):
+                try:
+                    await device.disconnect()
+                except Exception:
+                    pass
+    ordered = [results[a] for a in addresses if a in results]
+    return (devices[winner] if winner else None), winner, ordered
@@ -0,0 +1,138 @@
+"""
+Event loop único e persistente para todo o trabalho com o Furby.
+
+O Controller guarda um asyncio.Lock e o cliente BLE (Bleak), e os dois ficam
+presos ao loop em que foram usados pela primeira vez. Antes, cada thread de
+fundo (scanner, wake word, conversa) criava e destruía o seu próprio loop a
+cada ação. Isso custava a montagem do loop toda vez e arriscava erros de lock
+e de BLE entre loops diferentes.
+
+Agora existe um só loop, rodando numa thread dedicada:
+  - threads comuns submetem corrotinas com `run()` (bloqueia) ou `submit()`
+    (retorna um Future);
+  - código que já roda em outro loop (endpoints do uvicorn) usa `await call()`;
+  - métodos decorados com `@on_device_loop` mudam sozinhos para esse loop, então
+    `await CTRL.action(...)` funciona de qualquer lugar;
+  - trabalho bloqueante (microfone, HTTP, reprodução de áudio) vai para um
+    executor limitado com `await run_blocking()`, sem travar o loop.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeviceLoop:
+    """Thread com um event loop de vida longa + executor limitado para chamadas bloqueantes"""
+
+    def __init__(self, max_blocking: int = 4):
+        self.max_blocking = max_blocking
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.thread: Optional[threading.Thread] = None
+        self.submitted = 0
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Inicia o loop (idempotente); chamado sob demanda na primeira submissão"""
+        with self._lock:
+            if self.loop is not None and not self.loop.is_closed():
+                return self.loop
+            loop = asyncio.new_event_loop()
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_blocking, thread_name_prefix="furby-blocking"
+            )
+            loop.set_default_executor(self.executor)
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self.thread = threading.Thread(target=run, name="furby-loop", daemon=True)
+            self.thread.start()
+            ready.wait()
+            self.loop = loop
+            return loop
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+    def in_loop(self) -> bool:
+        """True se o chamador está rodando dentro do próprio loop do dispositivo"""
+        return self.thread is threading.current_thread()
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """Agenda a corrotina no loop (thread-safe) e retorna um Future"""
+        loop = self.loop if self.running else self.start()
+        self.submitted += 1
+        future = asyncio.run_coroutine_threadsafe(coro, loop)  # type: ignore[arg-type]
+        self._inflight.add(future)
+        future.add_done_callback(self._inflight.discard)
+        return future
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Executa a corrotina no loop e espera o resultado (só fora do loop)"""
+        if self.in_loop():
+            coro.close()  # type: ignore[attr-defined]
+            raise RuntimeError("run() chamado de dentro do loop do dispositivo; use await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def call(self, coro: Awaitable[T]) -> T:
+        """Aguarda a corrotina no loop do dispositivo a partir de qualquer outro loop"""
+        if self.in_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    async def run_blocking(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Roda uma função bloqueante no executor limitado, sem travar o loop atual"""
+        if self.executor is None:
+            self.start()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "submitted": self.submitted,
+            "maxBlocking": self.max_blocking,
+            "inflight": len(self._inflight),
+        }
+
+
+DEVICE_LOOP = DeviceLoop()
+
+
+def on_device_loop(method: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Decorador: a corrotina sempre executa no loop do dispositivo, de onde quer que seja aguardada"""
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        if DEVICE_LOOP.in_loop():
+            return await method(*args, **kwargs)
+        return await DEVICE_LOOP.call(method(*args, **kwargs))
+    return wrapper
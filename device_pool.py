@@ -0,0 +1,133 @@
+"""
+Pool de Furbies: vários Controllers conectados ao mesmo tempo, endereçados
+por id, por grupo ou todos de uma vez.
+
+Cada Controller continua com seu escalonador, fila de admissão e sombra de
+estado. O pool só escolhe os alvos e dispara o mesmo comando em todos ao
+mesmo tempo (asyncio.gather no loop do dispositivo). Ele devolve o resultado
+de cada Furby e quanto eles ficaram fora de sincronia (skew): a diferença
+entre o primeiro e o último a concluir o comando.
+
+Com `align=True`, cada Furby espera a diferença entre a maior latência de
+escrita medida no grupo e a sua própria antes de enviar. Assim os mais
+rápidos não chegam antes dos mais lentos.
+
+Alvos aceitos:
+    "all" (ou "*")   todos
+    "group:palco"    membros do grupo
+    "sala,group:x"   lista separada por vírgulas (ids e grupos)
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class DevicePool:
+    """Controllers por id, com grupos e comandos em paralelo"""
+
+    def __init__(self):
+        self.members: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"fanouts": 0, "commands": 0, "failed": 0}
+        self.last_fanout: Optional[Dict[str, Any]] = None
+
+    def add(self, device_id: str, ctrl: Any, groups: Iterable[str] = (), **meta: Any) -> Dict[str, Any]:
+        if device_id in self.members:
+            raise ValueError(f"Furby '{device_id}' já está no pool")
+        if not device_id or "," in device_id or device_id in ("all", "*") or device_id.startswith("group:"):
+            raise ValueError(f"Id de Furby inválido: '{device_id}'")
+        member = self.members[device_id] = {"ctrl": ctrl, "groups": sorted(set(groups)), **meta}
+        return member
+
+    def remove(self, device_id: str) -> Any:
+        return self.members.pop(device_id)["ctrl"]
+
+    def get(self, device_id: str) -> Any:
+        return self.members[device_id]["ctrl"]
+
+    def groups(self) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for device_id, member in self.members.items():
+            for group in member["groups"]:
+                groups.setdefault(group, []).append(device_id)
+        return groups
+
+    def select(self, target: str = "all") -> List[str]:
+        """Ids dos alvos (na ordem do pool); KeyError para id ou grupo desconhecido"""
+        wanted: List[str] = []
+        for part in (p.strip() for p in (target or "all").split(",")):
+            if not part:
+                continue
+            if part in ("all", "*"):
+                wanted += list(self.members)
+            elif part.startswith("group:"):
+                members = self.groups().get(part[len("group:"):])
+                if not members:
+                    raise KeyError(f"Grupo desconhecido: {part[len('group:'):]}")
+                wanted += members
+            elif part in self.members:
+                wanted.append(part)
+            else:
+                raise KeyError(f"Furby desconhecido: {part}")
+        chosen = set(wanted)
+        return [device_id for device_id in self.members if device_id in chosen]
+
+    async def fanout(self, ids: List[str], command: Callable[[Any], Awaitable[Any]],
+                     kind: Optional[str] = None, align: bool = False,
+                     timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Roda `command(ctrl)` em todos os alvos ao mesmo tempo. `kind` ("color",
+        "action") indica qual latência medida usar no alinhamento.
+        """
+        ctrls = {device_id: self.members[device_id]["ctrl"] for device_id in ids}
+        latency = {device_id: ctrl.write_latency.get(kind, 0.0) if kind else 0.0 for device_id, ctrl in ctrls.items()}
+        slowest = max(latency.values(), default=0.0)
+        origin = time.monotonic()
+
+        async def one(device_id: str) -> Dict[str, Any]:
+            lead = slowest - latency[device_id] if align else 0.0
+            if lead > 0:
+                await asyncio.sleep(lead)
+            started = time.monotonic()
+            result: Dict[str, Any] = {"id": device_id}
+            try:
+                value = await asyncio.wait_for(command(ctrls[device_id]), timeout)
+                result.update(ok=True, **({"result": value} if value is not None else {}))
+            except Exception as e:
+                result.update(ok=False, error=str(e) or type(e).__name__)
+            finished = time.monotonic()
+            result.update(startedMs=round((started - origin) * 1000, 2), finishedMs=round((finished - origin) * 1000, 2))
+            return result
+
+        results = await asyncio.gather(*(one(device_id) for device_id in ids))
+        done = np.array([r["finishedMs"] for r in results if r["ok"]])
+        started = np.array([r["startedMs"] for r in results])
+        summary = {
+            "targets": len(ids),
+            "ok": int(len(done)),
+            "failed": len(ids) - int(len(done)),
+            "align": align,
+            "totalMs": round((time.monotonic() - origin) * 1000, 2),
+            "startSkewMs": round(float(started.max() - started.min()), 2) if len(started) else None,
+            "skewMs": round(float(done.max() - done.min()), 2) if len(done) else None,
+            "results": results,
+        }
+        self.stats["fanouts"] += 1
+        self.stats["commands"] += len(ids)
+        self.stats["failed"] += summary["failed"]
+        self.last_fanout = {k: v for k, v in summary.items() if k != "results"}
+        return summary
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "devices": [
+                {"id": device_id, "groups": member["groups"],
+                 "connected": bool(member["ctrl"].device.connected), "address": member["ctrl"].device.address,
+                 **{k: v for k, v in member.items() if k not in ("ctrl", "groups")}}
+                for device_id, member in self.members.items()
+            ],
+            "groups": self.groups(),
+            "lastFanout": self.last_fanout,
+            **self.stats,
+        }
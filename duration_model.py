@@ -0,0 +1,128 @@
+"""
+Modelo aprendido da duração de cada ação (quanto tempo o Furby fica ocupado).
+
+`trigger_action` retorna assim que a escrita BLE termina, mas o Furby ainda
+se mexe e fala por alguns segundos. Antes, quem vinha depois adivinhava com
+sleeps fixos (o `cooldown` do scanner). Agora a duração é medida no clipe
+gravado logo após o disparo: é o fim do último frame acima do nível de
+atividade. Uma tabela persistente por combinação guarda a média móvel.
+
+Um clipe que termina com som ainda ativo é um limite inferior ("truncado").
+Ele só pode aumentar a estimativa, nunca reduzi-la.
+
+Para uma combinação ainda sem medida, a estimativa é, em ordem: a duração
+informada no catálogo de ações, a mediana das medidas da mesma categoria e o
+padrão global.
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from noise_floor import FRAME, frame_levels
+
+
+def combo_key(combo: Sequence[int]) -> str:
+    return ",".join(str(int(x)) for x in combo)
+
+
+def sound_duration(clip: np.ndarray, activity_level: float, rate: int = 16000,
+                   frame: int = FRAME) -> Tuple[float, bool]:
+    """
+    Segundos do início do clipe até o fim do último frame acima de
+    `activity_level` (RMS), e se o som ainda estava ativo no fim do clipe
+    """
+    levels = frame_levels(clip, frame)
+    active = np.flatnonzero(levels >= activity_level)
+    if not len(active):
+        return 0.0, False
+    last = int(active[-1])
+    return (last + 1) * frame / rate, last == len(levels) - 1
+
+
+class DurationModel:
+    """Tabela persistente combo -> duração (s), com estimativa para combos não medidos"""
+
+    def __init__(self, path: Path, default: float = 2.0, alpha: float = 0.3,
+                 prior: Optional[Callable[[Sequence[int]], Tuple[Optional[str], Optional[float]]]] = None):
+        self.path = Path(path)
+        self.default = default
+        self.alpha = alpha
+        self.prior = prior  # combo -> (categoria, duração do catálogo)
+        self.table: Dict[str, Dict[str, Any]] = {}
+        self.dirty = 0
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.table = json.loads(self.path.read_text()).get("durations", {})
+            except Exception:
+                self.table = {}
+
+    def observe(self, combo: Sequence[int], seconds: float, truncated: bool = False,
+                category: Optional[str] = None) -> float:
+        """Registra uma medida; retorna a nova estimativa da combinação"""
+        key = combo_key(combo)
+        with self._lock:
+            entry = self.table.get(key)
+            if entry is None:
+                entry = self.table[key] = {"seconds": seconds, "samples": 0, "truncated": truncated}
+            elif truncated:
+                entry["seconds"] = max(entry["seconds"], seconds)
+            else:
+                base = seconds if entry.get("truncated") and seconds > entry["seconds"] else entry["seconds"]
+                entry["seconds"] = base + self.alpha * (seconds - base)
+                entry["truncated"] = False
+            entry["samples"] += 1
+            if category:
+                entry["category"] = category
+            self.dirty += 1
+            return entry["seconds"]
+
+    def measured(self, combo: Sequence[int]) -> Optional[float]:
+        entry = self.table.get(combo_key(combo))
+        return entry["seconds"] if entry else None
+
+    def _category_median(self, category: str) -> Optional[float]:
+        values = [e["seconds"] for e in self.table.values() if e.get("category") == category and not e.get("truncated")]
+        return float(np.median(values)) if values else None
+
+    def estimate(self, combo: Sequence[int]) -> float:
+        """Duração esperada: medida > catálogo > mediana da categoria > padrão"""
+        entry = self.table.get(combo_key(combo))
+        if entry is None:
+            return self._fallback(combo)
+        if entry.get("truncated"):
+            # Só sabemos que dura pelo menos isso: não confia na mediana de sons curtos da categoria
+            return max(entry["seconds"], self._fallback(combo, use_category=False))
+        return entry["seconds"]
+
+    def _fallback(self, combo: Sequence[int], use_category: bool = True) -> float:
+        category, listed = self.prior(combo) if self.prior else (None, None)
+        if listed is not None:
+            return float(listed)
+        if category and use_category:
+            median = self._category_median(category)
+            if median is not None:
+                return median
+        return self.default
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps({"durations": self.table})
+            self.dirty = 0
+        self.path.write_text(data)
+
+    def info(self, limit: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            entries = sorted(self.table.items(), key=lambda kv: -kv[1]["seconds"])
+            seconds = [e["seconds"] for e in self.table.values()]
+        return {
+            "file": str(self.path),
+            "measured": len(seconds),
+            "truncated": sum(1 for _, e in entries if e.get("truncated")),
+            "defaultSeconds": self.default,
+            "meanSeconds": round(float(np.mean(seconds)), 3) if seconds else None,
+            "longest": [{"combo": key, **entry} for key, entry in entries[:limit]],
+        }
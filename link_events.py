@@ -0,0 +1,93 @@
+"""
+Eventos de conexão do Furby (conectado / desconectado), publicados na hora.
+
+Antes, o auto-connect olhava `CTRL.device.connected` a cada 2 s. Esse campo
+só muda quando nós mesmos conectamos ou desconectamos. Uma queda real do link
+BLE só era notada tarde, ou quando algum comando falhava. Agora o callback de
+desconexão do BleakClient (ou do Furby simulado) publica um evento aqui, e
+quem espera (`wait()`) acorda em milissegundos, em qualquer loop ou thread.
+
+Cada evento recebe um número de sequência. Quem chama `wait(since=seq)` não
+perde um evento publicado entre a última verificação e o início da espera.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class LinkEvents:
+    """Fan-out thread-safe de eventos de conexão para callbacks e esperas assíncronas"""
+
+    def __init__(self, keep: int = 200):
+        self.seq = 0
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.counts: Dict[str, int] = {}
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._waiters: List[Tuple[frozenset, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        self._subscribers.append(callback)
+
+    def publish(self, kind: str, **details: Any) -> Dict[str, Any]:
+        with self._lock:
+            self.seq += 1
+            event = {"seq": self.seq, "kind": kind, "at": time.time(), "monotonic": time.monotonic(), **details}
+            self.history.append(event)
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+            waiting, self._waiters = self._waiters, []
+        remaining = []
+        for kinds, loop, future in waiting:
+            if kind in kinds:
+                loop.call_soon_threadsafe(self._resolve, future, event)
+            else:
+                remaining.append((kinds, loop, future))
+        with self._lock:
+            self._waiters.extend(remaining)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                pass
+        return event
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, event: Dict[str, Any]) -> None:
+        if not future.done():
+            future.set_result(event)
+
+    def _since(self, kinds: frozenset, since: int) -> Optional[Dict[str, Any]]:
+        for event in self.history:
+            if event["seq"] > since and event["kind"] in kinds:
+                return event
+        return None
+
+    async def wait(self, kinds: Iterable[str], since: Optional[int] = None,
+                   timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Próximo evento de um dos tipos (depois de `since`, se dado); None no timeout"""
+        wanted = frozenset(kinds)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if since is not None:
+                missed = self._since(wanted, since)
+                if missed is not None:
+                    return missed
+            entry = (wanted, loop, future)
+            self._waiters.append(entry)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+
+    def info(self, limit: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self.history)[-limit:]
+            return {"seq": self.seq, "counts": dict(self.counts), "waiting": len(self._waiters),
+                    "recent": [{k: v for k, v in e.items() if k != "monotonic"} for e in recent]}
@@ -0,0 +1,49 @@
+"""
+Lip-sync da antena: o brilho acompanha o volume da resposta falada.
+
+Antes de tocar o áudio da resposta (Cartesia), calculamos de uma vez, com
+numpy, o envelope de amplitude: RMS por janela de 1/fps segundos,
+normalizado pelo percentil alto e com uma curva perceptual. O envelope vira
+uma lista de keyframes de brilho sobre a cor base. Quem renderiza é o motor
+de animação da antena (antenna_animation), que:
+  - começa junto com a reprodução (mesmo relógio do áudio);
+  - adianta cada frame pela latência medida da escrita de cor
+    (`compensate=True`), para a cor chegar junto com o som;
+  - limita a taxa de atualização e descarta frames quando o link está lento,
+    sem nunca segurar a reprodução.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def amplitude_envelope(samples: np.ndarray, rate: int, channels: int = 1, fps: float = 20.0,
+                       percentile: float = 95.0, gamma: float = 0.6) -> np.ndarray:
+    """Envelope 0..1 com um valor por janela de 1/fps segundos (vetorizado)"""
+    audio = np.asarray(samples, dtype=np.float32)
+    if channels > 1:
+        audio = audio[: len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+    window = max(int(rate / fps), 1)
+    count = -(-len(audio) // window)  # última janela parcial completada com silêncio
+    if not count:
+        return np.zeros(0, dtype=np.float32)
+    padded = np.zeros(count * window, dtype=np.float32)
+    padded[: len(audio)] = audio
+    rms = np.sqrt((padded.reshape(count, window) ** 2).mean(axis=1))
+    peak = float(np.percentile(rms, percentile))
+    if peak <= 0:
+        return np.zeros(count, dtype=np.float32)
+    return np.clip(rms / peak, 0.0, 1.0) ** gamma
+
+
+def lip_sync_keyframes(envelope: np.ndarray, fps: float, color: Sequence[int],
+                       floor: float = 0.15) -> List[Dict[str, Any]]:
+    """Keyframes de brilho (cor * nível) no centro de cada janela; termina na cor base cheia"""
+    base = np.asarray(color, dtype=np.float32)
+    levels = floor + (1.0 - floor) * np.asarray(envelope, dtype=np.float32)
+    colors = np.rint(np.outer(levels, base)).astype(int)
+    times = (np.arange(len(levels)) + 0.5) / fps
+    frames = [{"at": 0.0, "color": colors[0].tolist() if len(colors) else list(color)}]
+    frames += [{"at": float(t), "color": c.tolist()} for t, c in zip(times, colors)]
+    frames.append({"at": (len(levels) + 0.5) / fps, "color": list(color)})
+    return frames
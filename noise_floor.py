@@ -0,0 +1,116 @@
+"""
+Piso de ruído adaptativo para a detecção de silêncio do scanner.
+
+Em vez de comparar o volume médio de cada clipe com um limiar absoluto fixo
+(que deriva com o barulho da sala), o scanner mede o ruído ambiente antes da
+varredura e continua acompanhando-o entre as combinações. Cada clipe é então
+classificado pela relação sinal/ruído (SNR, em dB) contra esse piso.
+
+Os níveis são RMS por frame (unidades de amostra int16):
+  - piso calibrado: mediana dos frames de uma gravação só de ambiente;
+  - acompanhamento: média móvel exponencial do percentil baixo dos frames de
+    cada clipe (a parte "quieta" da janela, que é só ambiente), ignorando
+    amostras que sobem mais que `max_rise_db` de uma vez (som longo da ação);
+  - sinal: percentil alto dos frames do clipe (a parte mais alta da janela).
+"""
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+FRAME = 512
+MIN_LEVEL = 1.0  # evita divisão por zero com microfone mudo / silêncio digital
+
+
+def frame_levels(clip: np.ndarray, frame: int = FRAME) -> np.ndarray:
+    """RMS de cada frame (sem sobreposição) de um clipe int16"""
+    samples = np.asarray(clip, dtype=np.float32)
+    count = len(samples) // frame
+    if not count:
+        if not len(samples):
+            return np.zeros(1, dtype=np.float32)
+        return np.sqrt(np.array([(samples ** 2).mean()], dtype=np.float32))
+    frames = samples[: count * frame].reshape(count, frame)
+    return np.sqrt((frames ** 2).mean(axis=1))
+
+
+def to_db(ratio: float) -> float:
+    return 20.0 * float(np.log10(max(ratio, 1e-6)))
+
+
+class NoiseFloor:
+    """Piso de ruído de um microfone, calibrado e acompanhado entre combinações"""
+
+    def __init__(self, alpha: float = 0.1, max_rise_db: float = 6.0,
+                 quiet_percentile: float = 10.0, signal_percentile: float = 95.0):
+        self.alpha = alpha
+        self.max_rise = 10 ** (max_rise_db / 20.0)
+        self.quiet_percentile = quiet_percentile
+        self.signal_percentile = signal_percentile
+        self.level: Optional[float] = None
+        self.calibrated_level: Optional[float] = None
+        self.updates = 0
+        self.rejected = 0
+        self.last_snr: Optional[float] = None
+        self.since_ambient = 0  # clipes observados desde a última amostra só de ambiente
+        self._lock = threading.Lock()
+
+    @property
+    def calibrated(self) -> bool:
+        return self.level is not None
+
+    def calibrate(self, ambient: np.ndarray) -> float:
+        """Define o piso a partir de uma gravação só de ambiente"""
+        level = max(float(np.median(frame_levels(ambient))), MIN_LEVEL)
+        with self._lock:
+            self.level = self.calibrated_level = level
+            self.updates = self.rejected = self.since_ambient = 0
+        return level
+
+    def observe(self, clip: np.ndarray, ambient: bool = False) -> bool:
+        """
+        Atualiza o piso com a parte quieta de um clipe. Com `ambient=True` o
+        clipe é só ambiente (recalibração periódica) e vale a mediana.
+        Retorna False se a amostra foi descartada por subir demais.
+        """
+        levels = frame_levels(clip)
+        sample = float(np.median(levels) if ambient else np.percentile(levels, self.quiet_percentile))
+        sample = max(sample, MIN_LEVEL)
+        with self._lock:
+            self.since_ambient = 0 if ambient else self.since_ambient + 1
+            if self.level is None:
+                self.level = self.calibrated_level = sample
+                return True
+            if not ambient and sample > self.level * self.max_rise:
+                self.rejected += 1
+                return False
+            self.level += self.alpha * (sample - self.level)
+            self.updates += 1
+            return True
+
+    def due(self, every: int) -> bool:
+        """True quando já passaram `every` clipes sem uma amostra só de ambiente"""
+        return every > 0 and self.since_ambient >= every
+
+    def signal_level(self, clip: np.ndarray) -> float:
+        return float(np.percentile(frame_levels(clip), self.signal_percentile))
+
+    def snr_db(self, clip: np.ndarray) -> float:
+        """SNR (dB) do trecho mais alto do clipe contra o piso atual"""
+        snr = to_db(self.signal_level(clip) / max(self.level or MIN_LEVEL, MIN_LEVEL))
+        self.last_snr = snr
+        return snr
+
+    def threshold_level(self, snr_db: float) -> float:
+        """Nível RMS correspondente a `snr_db` acima do piso"""
+        return (self.level or MIN_LEVEL) * 10 ** (snr_db / 20.0)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "level": round(self.level, 2) if self.level is not None else None,
+            "calibratedLevel": round(self.calibrated_level, 2) if self.calibrated_level is not None else None,
+            "driftDb": round(to_db(self.level / self.calibrated_level), 2) if self.calibrated_level else None,
+            "updates": self.updates,
+            "rejected": self.rejected,
+            "lastSnrDb": round(self.last_snr, 2) if self.last_snr is not None else None,
+        }
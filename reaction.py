@@ -0,0 +1,80 @@
+"""
+Escolha da reação do Furby a partir do texto da resposta (sem rede, sem modelo).
+
+Antes, depois de cada resposta, o Furby disparava uma ação qualquer da lista
+e podia soltar um pum depois de uma frase carinhosa. Agora o texto da
+resposta é pontuado localmente com um léxico pequeno (radicais em português e
+inglês + pistas de pontuação). A categoria de ação mais compatível é escolhida
+enquanto o TTS ainda está sendo gerado e disparada quando o áudio começa.
+
+Sem nenhuma pista, a reação padrão é "conversation", nunca uma aleatória.
+"""
+import re
+import unicodedata
+from typing import Dict, Tuple
+
+# categoria da tabela de ações -> radicais (prefixos) que indicam o clima da resposta
+LEXICON: Dict[str, Tuple[str, ...]] = {
+    "hugs": ("love", "amo", "amor", "ador", "hug", "abrac", "carinh", "sweet", "fof", "friend", "amig",
+             "warm", "quent", "cuddl", "miss", "saudad", "heart", "coraca", "kiss", "beij"),
+    "pets": ("nice", "good", "bom", "boa", "calm", "soft", "maci", "gentl", "gentil", "cozy", "aconcheg",
+             "thank", "obrigad", "safe", "content", "peace", "paz"),
+    "singing": ("sing", "cant", "song", "music", "musica", "danc", "la", "happy", "feliz", "yay", "oba",
+                "fun", "divert", "party", "festa", "celebr"),
+    "tickles": ("haha", "hehe", "hihi", "kkk", "tickl", "cocega", "funny", "engracad", "giggl", "laugh", "ri", "rir"),
+    "conversation": ("hmm", "what", "why", "how", "pergunt", "think", "pens", "wonder", "curious",
+                     "curios", "ooh", "ooo", "tell", "conta", "story", "histor", "maybe", "talvez"),
+    "hiccups": ("hic", "oops", "ops", "whoa", "uau", "surpris", "surpres", "wow", "eita", "silly", "bobo"),
+    "bored": ("sleep", "sono", "dorm", "tired", "cansad", "bored", "entedi", "yawn", "bocej", "zzz",
+              "battery", "bateri", "slow", "devagar", "ugh"),
+    "shaking": ("scar", "medo", "afraid", "dizzy", "tont", "shak", "trem", "cold", "frio", "nervous", "nervos"),
+    "loud_noise": ("loud", "barulh", "noise", "bang", "boom", "grit", "scream"),
+    "farts": ("fart", "pum", "peid", "burp", "arrot", "stink", "fedo", "gross", "nojent", "poop", "coco"),
+}
+
+DEFAULT_CATEGORY = "conversation"
+_WORD = re.compile(r"[a-z]+")
+
+
+def _normalize(text: str) -> str:
+    """Minúsculas e sem acentos ("coração" -> "coracao")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _build_index() -> Dict[str, Tuple[Tuple[str, str], ...]]:
+    """Radicais agrupados pela primeira letra, para testar só os candidatos de cada palavra"""
+    index: Dict[str, list] = {}
+    for category, stems in LEXICON.items():
+        for stem in stems:
+            index.setdefault(stem[0], []).append((stem, category))
+    return {letter: tuple(sorted(entries, key=lambda e: -len(e[0]))) for letter, entries in index.items()}
+
+
+_INDEX = _build_index()
+
+
+def score_text(text: str) -> Dict[str, float]:
+    """Pontuação por categoria: cada palavra conta para o radical mais longo que ela começa"""
+    scores: Dict[str, float] = {}
+    normalized = _normalize(text)
+    for word in _WORD.findall(normalized):
+        for stem, category in _INDEX.get(word[0], ()):
+            # radicais de 2 letras ("la", "ri") só valem como palavra inteira ou repetida ("lalala")
+            if word.startswith(stem) and (len(stem) > 2 or word == stem * (len(word) // len(stem))):
+                scores[category] = scores.get(category, 0.0) + 1.0
+                break
+    if "?" in text:
+        scores["conversation"] = scores.get("conversation", 0.0) + 0.5
+    if text.count("!") >= 2:
+        scores["singing"] = scores.get("singing", 0.0) + 0.5
+    return scores
+
+
+def select_category(text: str, default: str = DEFAULT_CATEGORY) -> Tuple[str, Dict[str, float]]:
+    """Categoria de maior pontuação (empate: ordem do LEXICON); sem pistas, `default`"""
+    scores = score_text(text)
+    if not scores:
+        return default, scores
+    best = max(LEXICON, key=lambda category: scores.get(category, 0.0))
+    return best, scores
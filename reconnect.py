@@ -0,0 +1,122 @@
+"""
+Reconexão rápida ao último Furby conhecido.
+
+Antes, quando o Furby caía, o auto-connect fazia um scan completo (5 s),
+conectava e, se falhasse, dormia mais 5 s fixos. Na prática o brinquedo
+volta em menos de um segundo. Agora:
+
+  - o endereço da última conexão boa fica salvo em last_device.json;
+  - a primeira tentativa é conectar direto nesse endereço, sem scan;
+  - entre tentativas, a espera cresce exponencialmente com jitter
+    (0,25 s, 0,5 s, 1 s, ... até o teto), para não martelar o adaptador
+    nem sincronizar com outros clientes;
+  - só depois de algumas falhas diretas seguidas volta a escanear.
+
+O tempo de cada reconexão (queda -> conectado) vai para uma distribuição
+(média, p50, p90, p99, pior), que é o tempo fora do ar depois de uma falha.
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional
+
+import numpy as np
+
+
+class Backoff:
+    """Espera exponencial com jitter ("equal jitter": metade fixa, metade aleatória)"""
+
+    def __init__(self, base: float = 0.25, cap: float = 8.0, factor: float = 2.0,
+                 rng: Optional[random.Random] = None):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempt = 0
+        self._rng = rng or random.Random()
+
+    def next(self) -> float:
+        delay = min(self.cap, self.base * self.factor ** self.attempt)
+        self.attempt += 1
+        return delay / 2 + self._rng.uniform(0, delay / 2)
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+class LastDevice:
+    """Endereço da última conexão boa, persistido em JSON"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.address: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+                self.address = data.get("address")
+                self.connected_at = data.get("connectedAt")
+            except Exception:
+                pass
+
+    def remember(self, address: Optional[str]) -> None:
+        if not address:
+            return
+        changed = address != self.address
+        self.address = address
+        self.connected_at = time.time()
+        if changed or not self.path.exists():
+            self.path.write_text(json.dumps({"address": self.address, "connectedAt": self.connected_at}))
+
+    def forget(self) -> None:
+        self.address = None
+        if self.path.exists():
+            self.path.unlink()
+
+
+class ReconnectStats:
+    """Distribuição do tempo queda -> reconectado, por caminho (direto ou via scan)"""
+
+    def __init__(self, keep: int = 500):
+        self.samples: Dict[str, Deque[float]] = {}
+        self.attempts: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def record(self, method: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(method, deque(maxlen=self.keep)).append(seconds)
+
+    def attempt(self, method: str, ok: bool) -> None:
+        with self._lock:
+            self.attempts[method] = self.attempts.get(method, 0) + 1
+            if not ok:
+                self.failures[method] = self.failures.get(method, 0) + 1
+
+    @staticmethod
+    def summary(values) -> Dict[str, Any]:
+        data = np.asarray(list(values), dtype=float)
+        if not len(data):
+            return {"count": 0}
+        p50, p90, p99 = np.percentile(data, [50, 90, 99])
+        return {
+            "count": int(len(data)),
+            "meanSec": round(float(data.mean()), 3),
+            "p50Sec": round(float(p50), 3),
+            "p90Sec": round(float(p90), 3),
+            "p99Sec": round(float(p99), 3),
+            "maxSec": round(float(data.max()), 3),
+        }
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            every = [s for values in self.samples.values() for s in values]
+            return {
+                "all": self.summary(every),
+                "byMethod": {method: self.summary(values) for method, values in self.samples.items()},
+                "attempts": dict(self.attempts),
+                "failures": dict(self.failures),
+            }
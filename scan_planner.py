@@ -0,0 +1,149 @@
+"""
+Planejador linear de varreduras de ações do Furby.
+
+Mapeia as combinações de uma varredura (faixas com passo, ou uma lista
+explícita) para posições 0..N-1. Cada posição é convertida em combinação em
+O(1), então retomar uma varredura é só guardar a próxima posição — sem
+recalcular laços aninhados. A ordem pode ser embaralhada de forma
+determinística (permutação afim com semente), mantendo o acesso O(1).
+"""
+import math
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+Combo = Tuple[int, int, int, int]
+
+DIMENSIONS = ("input", "index", "subindex", "specific")
+
+
+def combo_dict(combo: Combo) -> Dict[str, int]:
+    return dict(zip(DIMENSIONS, combo))
+
+
+class ScanPlan:
+    """Sequência indexável de combinações (input, index, subindex, specific)"""
+
+    def __init__(
+        self,
+        ranges: Optional[Dict[str, Tuple[int, int]]] = None,
+        strides: Optional[Dict[str, int]] = None,
+        combos: Optional[Sequence[Sequence[int]]] = None,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+    ):
+        if combos is None and ranges is None:
+            raise ValueError("Informe faixas ou uma lista de combinações")
+        self.ranges = {dim: tuple(ranges[dim]) for dim in DIMENSIONS} if ranges else None
+        self.strides = {dim: int((strides or {}).get(dim) or 1) for dim in DIMENSIONS}
+        self.combos: Optional[List[Combo]] = None
+        if combos is not None:
+            self.combos = [tuple(int(v) for v in c) for c in combos]  # type: ignore[misc]
+            for c in self.combos:
+                if len(c) != 4 or not all(0 <= v <= 255 for v in c):
+                    raise ValueError(f"Combinação inválida: {c}")
+            self._sizes = [len(self.combos)]
+        else:
+            self._sizes = []
+            for dim in DIMENSIONS:
+                start, end = self.ranges[dim]
+                if self.strides[dim] < 1:
+                    raise ValueError(f"Passo inválido para {dim}: {self.strides[dim]}")
+                if not 0 <= start <= end <= 255:
+                    raise ValueError(f"Faixa inválida para {dim}: {start}..{end}")
+                self._sizes.append(len(range(start, end + 1, self.strides[dim])))
+        self.total = math.prod(self._sizes)
+
+        self.shuffle = shuffle
+        self.seed = seed if seed is not None else random.randrange(1 << 31)
+        self._mult, self._offset = 1, 0
+        if shuffle and self.total > 1:
+            rng = random.Random(self.seed)
+            while True:
+                self._mult = rng.randrange(1, self.total)
+                if math.gcd(self._mult, self.total) == 1:
+                    break
+            self._offset = rng.randrange(self.total)
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def subtree_size(self) -> Optional[int]:
+        """
+        Número de posições consecutivas que compartilham (input, index, subindex).
+
+        Só existe para planos por faixas sem embaralhamento, onde `specific` é a
+        dimensão mais interna; caso contrário retorna None.
+        """
+        if self.combos is not None or (self.shuffle and self.total > 1):
+            return None
+        return self._sizes[-1]
+
+    def _decode(self, linear: int) -> Combo:
+        if self.combos is not None:
+            return self.combos[linear]
+        digits = []
+        for size in reversed(self._sizes):
+            linear, digit = divmod(linear, size)
+            digits.append(digit)
+        digits.reverse()
+        return tuple(  # type: ignore[return-value]
+            self.ranges[dim][0] + digit * self.strides[dim]
+            for dim, digit in zip(DIMENSIONS, digits)
+        )
+
+    def combo_at(self, position: int) -> Combo:
+        """Combinação na posição `position` da ordem de varredura (O(1))"""
+        if not 0 <= position < self.total:
+            raise IndexError(position)
+        return self._decode((self._mult * position + self._offset) % self.total)
+
+    def position_of(self, combo: Combo) -> Optional[int]:
+        """Posição de uma combinação no plano (None se ela não pertence ao plano)"""
+        if self.combos is not None:
+            try:
+                linear = self.combos.index(tuple(combo))
+            except ValueError:
+                return None
+        else:
+            linear = 0
+            for dim, size, value in zip(DIMENSIONS, self._sizes, combo):
+                start, end = self.ranges[dim]
+                offset = value - start
+                if value > end or offset < 0 or offset % self.strides[dim]:
+                    return None
+                linear = linear * size + offset // self.strides[dim]
+        if self._mult == 1:
+            return (linear - self._offset) % self.total
+        return ((linear - self._offset) * pow(self._mult, -1, self.total)) % self.total
+
+    def signature(self) -> Dict[str, Any]:
+        """Descrição serializável (JSON) que reconstrói exatamente o mesmo plano"""
+        return {
+            "ranges": self.ranges,
+            "strides": self.strides,
+            "combos": self.combos,
+            "shuffle": self.shuffle,
+            "seed": self.seed,
+        }
+
+    @classmethod
+    def from_signature(cls, sig: Dict[str, Any]) -> "ScanPlan":
+        return cls(
+            ranges=sig.get("ranges"),
+            strides=sig.get("strides"),
+            combos=sig.get("combos"),
+            shuffle=sig.get("shuffle", False),
+            seed=sig.get("seed"),
+        )
+
+    @classmethod
+    def from_settings(cls, params: Dict[str, Any]) -> "ScanPlan":
+        """Monta o plano a partir do corpo de /api/action-scan/start"""
+        return cls(
+            ranges={dim: (params[f"{dim}_start"], params[f"{dim}_end"]) for dim in DIMENSIONS},
+            strides={dim: params.get(f"{dim}_stride", 1) for dim in DIMENSIONS},
+            combos=params.get("combos"),
+            shuffle=params.get("shuffle", False),
+            seed=params.get("seed"),
+        )
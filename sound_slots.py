@@ -0,0 +1,135 @@
+"""
+Cache de sons já enviados ao Furby: hash do conteúdo -> slot no dispositivo.
+
+Antes, cada `/api/play-audio` convertia e reenviava o arquivo, mesmo sendo o
+mesmo clipe tocado um minuto antes. Agora cada dispositivo (por endereço) tem
+uma tabela `sha256 do arquivo -> slot`:
+
+  - repetição: o hash já está num slot completo, então vira um único comando
+    "tocar slot N", sem conversão e sem upload;
+  - upload interrompido (link caiu no meio): a entrada fica marcada como
+    parcial com o último byte confirmado, e a próxima tentativa do mesmo
+    conteúdo retoma dali;
+  - espaço: o número de slots e os bytes do dispositivo são limitados. Para
+    caber um som novo, saem os menos usados recentemente (LRU), nunca o que
+    está sendo enviado.
+
+A tabela é persistida em sound_slots.json.
+"""
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class SlotCache:
+    """Slots de som por dispositivo, com retomada de uploads e despejo LRU"""
+
+    def __init__(self, path: Path, slots: int = 10, capacity: int = 512 * 1024):
+        self.path = Path(path)
+        self.slots = slots
+        self.capacity = capacity  # bytes de armazenamento de som no dispositivo
+        self.devices: Dict[str, Dict[str, Dict[str, Any]]] = {}  # endereço -> hash -> entrada
+        self.stats = {"hits": 0, "misses": 0, "resumed": 0, "evicted": 0, "bytesSaved": 0}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.devices = json.loads(self.path.read_text()).get("devices", {})
+            except Exception:
+                self.devices = {}
+
+    def _save(self) -> None:
+        data = json.dumps({"devices": self.devices})
+        self.path.write_text(data)
+
+    def lookup(self, device: str, digest: str) -> Optional[int]:
+        """Slot do conteúdo, se já está completo no dispositivo (marca como usado agora)"""
+        with self._lock:
+            entry = self.devices.get(device, {}).get(digest)
+            if entry is None or not entry["complete"]:
+                self.stats["misses"] += 1
+                return None
+            entry["lastUsed"] = time.time()
+            entry["uses"] += 1
+            self.stats["hits"] += 1
+            self.stats["bytesSaved"] += entry["size"]
+            self._save()
+            return entry["slot"]
+
+    def reserve(self, device: str, digest: str, size: int) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """
+        Slot para enviar o conteúdo: (slot, byte de onde retomar, entradas despejadas).
+        Um upload parcial do mesmo conteúdo é retomado no mesmo slot.
+        """
+        if size > self.capacity:
+            raise ValueError(f"Som de {size} bytes não cabe no armazenamento do Furby ({self.capacity} bytes)")
+        with self._lock:
+            table = self.devices.setdefault(device, {})
+            entry = table.get(digest)
+            if entry is not None and entry["size"] == size:
+                if entry["confirmed"]:
+                    self.stats["resumed"] += 1
+                entry["lastUsed"] = time.time()
+                self._save()
+                return entry["slot"], entry["confirmed"], []
+            evicted = []
+            # LRU: despeja até sobrar slot e espaço
+            while table and (len(table) >= self.slots or sum(e["size"] for e in table.values()) + size > self.capacity):
+                victim = min(table, key=lambda d: table[d]["lastUsed"])
+                evicted.append({"hash": victim, **table.pop(victim)})
+            self.stats["evicted"] += len(evicted)
+            used = {e["slot"] for e in table.values()}
+            slot = next(i for i in range(self.slots) if i not in used)
+            table[digest] = {"slot": slot, "size": size, "confirmed": 0, "complete": False,
+                             "lastUsed": time.time(), "uses": 0}
+            self._save()
+            return slot, 0, evicted
+
+    def progress(self, device: str, digest: str, confirmed: int) -> None:
+        """Último byte confirmado de um upload em andamento (para retomar se cair)"""
+        with self._lock:
+            entry = self.devices.get(device, {}).get(digest)
+            if entry is not None and confirmed > entry["confirmed"]:
+                entry["confirmed"] = confirmed
+                self._save()
+
+    def complete(self, device: str, digest: str) -> None:
+        with self._lock:
+            entry = self.devices.get(device, {}).get(digest)
+            if entry is not None:
+                entry.update(complete=True, confirmed=entry["size"], lastUsed=time.time(), uses=entry["uses"] + 1)
+                self._save()
+
+    def invalidate(self, device: str, digest: Optional[str] = None) -> int:
+        """Esquece um conteúdo (ou tudo) do dispositivo, p.ex. se o Furby perdeu os arquivos"""
+        with self._lock:
+            table = self.devices.get(device, {})
+            if digest is None:
+                count = len(table)
+                self.devices.pop(device, None)
+            else:
+                count = 1 if table.pop(digest, None) is not None else 0
+            self._save()
+            return count
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "file": str(self.path),
+                "slots": self.slots,
+                "capacity": self.capacity,
+                "devices": {
+                    device: {
+                        "used": sum(e["size"] for e in table.values()),
+                        "entries": sorted(({"hash": d[:12], **e} for d, e in table.items()), key=lambda e: e["slot"]),
+                    }
+                    for device, table in self.devices.items()
+                },
+                **self.stats,
+            }